@@ -1,13 +1,68 @@
-from django.contrib import admin
-from .models import Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+from . import busca
+from .models import (
+    Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback, Reserva, Lembrete,
+    AgendamentoArquivado
+)
+
+class ContagemLimitadaPaginator(Paginator):
+    """
+    Paginador para changelists de tabelas grandes. Em vez de um COUNT(*) do
+    resultado inteiro, conta no máximo ``limite`` + 1 linhas. Passando disso,
+    a listagem sem filtros estima o total pelo maior id e as filtradas param
+    no limite; as páginas continuam exatas, só o total é aproximado.
+    """
+    limite = 10_000
+
+    @cached_property
+    def count(self):
+        contadas = self.object_list.order_by().values('pk')[:self.limite + 1].count()
+        if contadas <= self.limite:
+            return contadas
+        if not self.object_list.query.has_filters():
+            return max(self.object_list.aggregate(maior=Max('pk'))['maior'], contadas)
+        return self.limite
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+    """
+    Changelist sem COUNT(*) da tabela inteira (ver ``ContagemLimitadaPaginator``).
+    """
+    paginator = ContagemLimitadaPaginator
+    show_full_result_count = False
+
+
+class FaixaEtariaFilter(admin.SimpleListFilter):
+    title = "faixa etária"
+    parameter_name = 'faixa'
+
+    def lookups(self, request, model_admin):
+        return Usuario.FAIXAS_ETARIAS
+
+    def queryset(self, request, queryset):
+        if self.value() in Usuario.LIMITES_DAS_FAIXAS:
+            return queryset.faixa_etaria(self.value())
+        return queryset
+
 
 @admin.register(Usuario)
 class UsuarioAdmin(admin.ModelAdmin):
     list_display = ('nome', 'email', 'telefone', 'cpf', 'idade')
     search_fields = ('nome', 'email', 'cpf')
-    list_filter = ('data_nasc',)
+    list_filter = (FaixaEtariaFilter, 'data_nasc')
     ordering = ('nome',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_idade()
+
+    # Ordenar pela idade é ordenar pela data de nascimento (ao contrário), que tem índice.
+    @admin.display(description="Idade", ordering='-data_nasc')
+    def idade(self, obj):
+        return obj.idade
+
 
 @admin.register(Disponibilidade)
 class DisponibilidadeAdmin(admin.ModelAdmin):
@@ -18,12 +73,18 @@ class DisponibilidadeAdmin(admin.ModelAdmin):
 
 @admin.register(ProfissionalDePodologia)
 class ProfissionalDePodologiaAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'especializacao', 'email', 'telefone_whatsapp', 'aprovado')
+    list_display = ('nome', 'especializacao', 'email', 'telefone_whatsapp', 'aprovado', 'avaliacao_media', 'avaliacoes_total')
     search_fields = ('nome', 'email', 'telefone_whatsapp', 'especializacao')
     list_filter = ('aprovado',)
     ordering = ('nome',)
     filter_horizontal = ('disponibilidade',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Texto livre vai para o índice FTS5; e-mail e telefone seguem pelo search_fields.
+        if not search_term or '@' in search_term or search_term.replace(' ', '').isdigit():
+            return super().get_search_results(request, queryset, search_term)
+        return busca.filtrar(queryset, search_term), False
+
 
 @admin.register(TratamentoPodologico)
 class TratamentoPodologicoAdmin(admin.ModelAdmin):
@@ -33,18 +94,83 @@ class TratamentoPodologicoAdmin(admin.ModelAdmin):
     ordering = ('nome',)
 
 
+def _acao_de_transicao(status, descricao):
+    @admin.action(description=descricao)
+    def acao(modeladmin, request, queryset):
+        resultados = queryset.transicionar(status).values()
+        alterados = sum(1 for resultado in resultados if resultado == 'alterado')
+        invalidos = sum(1 for resultado in resultados if resultado == 'invalido')
+        modeladmin.message_user(request, f"{alterados} agendamento(s) atualizado(s).", messages.SUCCESS)
+        if invalidos:
+            modeladmin.message_user(
+                request, f"{invalidos} agendamento(s) ignorado(s): transição não permitida.", messages.WARNING
+            )
+    acao.__name__ = f'transicionar_para_{status}'
+    return acao
+
+
 @admin.register(Agendamento)
-class AgendamentoAdmin(admin.ModelAdmin):
-    list_display = ('data', 'usuario', 'profissional', 'status')
+class AgendamentoAdmin(TabelaGrandeAdmin):
+    list_display = ('data', 'horario_inicio', 'usuario', 'profissional', 'status')
+    list_select_related = ('usuario', 'profissional')
     search_fields = ('usuario__nome', 'profissional__nome')
     list_filter = ('status', 'data')
-    ordering = ('data',)
+    date_hierarchy = 'data'
+    ordering = ('data', 'id')
+    autocomplete_fields = ('usuario', 'profissional')
     filter_horizontal = ('servicos',)
+    actions = [
+        _acao_de_transicao('confirmado', "Confirmar agendamentos selecionados"),
+        _acao_de_transicao('concluido', "Marcar selecionados como concluídos"),
+        _acao_de_transicao('cancelado', "Cancelar agendamentos selecionados"),
+    ]
 
 
 @admin.register(Feedback)
-class FeedbackAdmin(admin.ModelAdmin):
+class FeedbackAdmin(TabelaGrandeAdmin):
     list_display = ('usuario', 'agendamento', 'nota', 'data')
+    # O __str__ do agendamento usa o nome do cliente.
+    list_select_related = ('usuario', 'agendamento__usuario')
     search_fields = ('usuario__nome', 'agendamento__usuario__nome')
     list_filter = ('nota', 'data')
-    ordering = ('-data',)
+    date_hierarchy = 'data'
+    ordering = ('-data', '-id')
+    autocomplete_fields = ('usuario', 'agendamento')
+
+
+@admin.register(AgendamentoArquivado)
+class AgendamentoArquivadoAdmin(TabelaGrandeAdmin):
+    """
+    Histórico somente leitura; quem escreve aqui é ``core.arquivamento``.
+    """
+    list_display = ('data', 'horario_inicio', 'usuario', 'profissional', 'status', 'preco_total', 'arquivado_em')
+    list_select_related = ('usuario', 'profissional')
+    search_fields = ('usuario__nome', 'profissional__nome')
+    list_filter = ('status', 'data')
+    date_hierarchy = 'data'
+    ordering = ('data', 'id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = ('data', 'horario_inicio', 'profissional', 'usuario', 'status', 'expira_em', 'agendamento')
+    list_select_related = ('profissional', 'usuario', 'agendamento__usuario')
+    autocomplete_fields = ('profissional', 'usuario')
+    list_filter = ('status', 'data')
+    readonly_fields = ('duracao', 'expira_em', 'criada_em', 'agendamento')
+
+
+@admin.register(Lembrete)
+class LembreteAdmin(TabelaGrandeAdmin):
+    list_display = ('agendamento', 'tipo', 'status', 'executar_em', 'tentativas', 'enviado_em')
+    list_select_related = ('agendamento__usuario',)
+    list_filter = ('status', 'tipo')
+    ordering = ('status', 'executar_em')
+    autocomplete_fields = ('agendamento',)
+    readonly_fields = ('chave', 'tentativas', 'ultimo_erro', 'enviado_em', 'criado_em')
@@ -0,0 +1,265 @@
+"""
+Motor de horários livres dos profissionais de podologia.
+
+Cruza as janelas semanais de ``Disponibilidade`` de cada profissional com os
+agendamentos ativos do período e devolve os próximos horários em que cabe a
+soma das durações dos serviços escolhidos.
+
+As janelas são lidas em uma consulta. Os agendamentos e as reservas retidas
+são lidos em blocos de ``BLOCO_DE_DIAS`` dias (duas consultas por bloco), só
+quando a busca chega ao bloco: os próximos horários de um horizonte de 60 dias
+costumam sair da primeira semana. Os intervalos livres de cada
+profissional/dia são calculados sob demanda e guardados no índice.
+"""
+import heapq
+from collections import defaultdict, namedtuple
+from datetime import time, timedelta
+from itertools import islice
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Agendamento, Disponibilidade, ProfissionalDePodologia, Reserva, TratamentoPodologico
+
+# A ordem de DIAS_DA_SEMANA coincide com date.weekday() (segunda = 0).
+DIAS_POR_INDICE = {dia: indice for indice, (dia, _) in enumerate(Disponibilidade.DIAS_DA_SEMANA)}
+
+INTERVALO_PADRAO = 15  # minutos entre inícios de horários oferecidos
+HORIZONTE_PADRAO = 60  # dias
+BLOCO_DE_DIAS = 7  # dias de agendamentos e reservas lidos de cada vez
+
+HorarioLivre = namedtuple('HorarioLivre', ['profissional_id', 'data', 'horario_inicio', 'horario_fim'])
+
+
+def _minutos(horario):
+    return horario.hour * 60 + horario.minute
+
+
+def _horario(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def _mesclar(intervalos):
+    """
+    Ordena e une intervalos sobrepostos ou encostados.
+    """
+    mesclados = []
+    for inicio, fim in sorted(intervalos):
+        if mesclados and inicio <= mesclados[-1][1]:
+            if fim > mesclados[-1][1]:
+                mesclados[-1][1] = fim
+        else:
+            mesclados.append([inicio, fim])
+    return [(inicio, fim) for inicio, fim in mesclados]
+
+
+def _subtrair(janelas, ocupados):
+    """
+    Remove de ``janelas`` os trechos ``ocupados``. Ambas as listas já devem
+    estar ordenadas e mescladas.
+    """
+    livres = []
+    i = 0
+    for inicio, fim in janelas:
+        while i < len(ocupados) and ocupados[i][1] <= inicio:
+            i += 1
+        cursor = inicio
+        j = i
+        while j < len(ocupados) and ocupados[j][0] < fim:
+            if ocupados[j][0] > cursor:
+                livres.append((cursor, ocupados[j][0]))
+            cursor = max(cursor, ocupados[j][1])
+            j += 1
+        if cursor < fim:
+            livres.append((cursor, fim))
+    return livres
+
+
+def duracao_dos_servicos(servicos_ids):
+    """
+    Soma a duração (em minutos) dos tratamentos informados.
+    Retorna ``None`` se algum id não existir.
+    """
+    ids = set(servicos_ids)
+    resultado = TratamentoPodologico.objects.filter(pk__in=ids).aggregate(
+        total=Coalesce(Sum('duracao'), 0),
+        encontrados=Count('pk'),
+    )
+    if resultado['encontrados'] != len(ids):
+        return None
+    return resultado['total']
+
+
+def agendamentos_do_periodo(inicio, dias, profissionais=None):
+    """
+    Agendamentos ativos com horário no período, como tuplas
+    ``(id, profissional_id, data, horario_inicio, duracao)``.
+
+    Agendamentos sem ``horario_inicio`` (o campo é opcional) não têm onde
+    ser encaixados na grade e, por isso, não bloqueiam nenhum horário.
+    """
+    agendamentos = Agendamento.objects.ativos().filter(
+        profissional__aprovado=True,
+        data__gte=inicio,
+        data__lt=inicio + timedelta(days=dias),
+        horario_inicio__isnull=False,
+    )
+    if profissionais is not None:
+        agendamentos = agendamentos.filter(profissional_id__in=profissionais)
+    return agendamentos.order_by().values_list(
+        'id', 'profissional_id', 'data', 'horario_inicio'
+    ).annotate(duracao=Coalesce(Sum('servicos__duracao'), 0))
+
+
+def reservas_retidas(inicio, dias, profissionais=None):
+    """
+    Reservas retidas e ainda válidas no período, como tuplas
+    ``(profissional_id, data, horario_inicio, duracao)``.
+    """
+    reservas = Reserva.objects.filter(
+        status='retida',
+        expira_em__gte=timezone.now(),
+        profissional__aprovado=True,
+        data__gte=inicio,
+        data__lt=inicio + timedelta(days=dias),
+    )
+    if profissionais is not None:
+        reservas = reservas.filter(profissional_id__in=profissionais)
+    return reservas.values_list('profissional_id', 'data', 'horario_inicio', 'duracao')
+
+
+class IndiceDeHorarios:
+    """
+    Índice de intervalos livres por profissional/dia para um período.
+
+    As janelas semanais são lidas em uma consulta; os agendamentos e as
+    reservas retidas, em duas consultas por bloco de ``BLOCO_DE_DIAS`` dias
+    consultado, independentemente do número de profissionais.
+    """
+
+    def __init__(self, inicio, dias=HORIZONTE_PADRAO, profissionais=None, intervalo=INTERVALO_PADRAO):
+        self.inicio = inicio
+        self.dias = dias
+        self.intervalo = intervalo
+        self.profissionais = profissionais
+        # {profissional_id: {dia_da_semana: [(inicio, fim), ...]}}
+        self.janelas = defaultdict(lambda: defaultdict(list))
+        # {(profissional_id, data): [(inicio, fim), ...]}
+        self.ocupados = defaultdict(list)
+        self._blocos = set()
+        self._livres = {}
+        self._carregar(profissionais)
+
+    def _carregar(self, profissionais):
+        Janela = ProfissionalDePodologia.disponibilidade.through
+        janelas = Janela.objects.filter(profissionaldepodologia__aprovado=True)
+        if profissionais is not None:
+            janelas = janelas.filter(profissionaldepodologia_id__in=profissionais)
+
+        linhas = janelas.values_list(
+            'profissionaldepodologia_id',
+            'disponibilidade__dia',
+            'disponibilidade__horario_inicio',
+            'disponibilidade__horario_fim',
+        )
+        for profissional_id, dia, horario_inicio, horario_fim in linhas:
+            self.janelas[profissional_id][DIAS_POR_INDICE[dia]].append(
+                (_minutos(horario_inicio), _minutos(horario_fim))
+            )
+        for por_dia in self.janelas.values():
+            for dia, intervalos in por_dia.items():
+                por_dia[dia] = _mesclar(intervalos)
+
+        # Profissionais com janela em cada dia da semana, para não varrer todos.
+        self._por_dia_da_semana = defaultdict(list)
+        for profissional_id, por_dia in self.janelas.items():
+            for dia in por_dia:
+                self._por_dia_da_semana[dia].append(profissional_id)
+
+    def _carregar_bloco(self, data):
+        """
+        Lê os agendamentos e as reservas retidas do bloco de dias que contém
+        ``data``, se ainda não foram lidos. Datas fora do período não têm ocupação.
+        """
+        deslocamento = (data - self.inicio).days
+        bloco = deslocamento // BLOCO_DE_DIAS
+        if bloco in self._blocos or not 0 <= deslocamento < self.dias:
+            return
+        self._blocos.add(bloco)
+        inicio = self.inicio + timedelta(days=bloco * BLOCO_DE_DIAS)
+        dias = min(BLOCO_DE_DIAS, self.dias - bloco * BLOCO_DE_DIAS)
+
+        for _, profissional_id, data, horario_inicio, duracao in agendamentos_do_periodo(
+            inicio, dias, self.profissionais
+        ):
+            inicio_em_minutos = _minutos(horario_inicio)
+            # Agendamento sem serviços ainda ocupa ao menos um intervalo.
+            self.ocupados[(profissional_id, data)].append(
+                (inicio_em_minutos, inicio_em_minutos + max(duracao, self.intervalo))
+            )
+
+        # Horários retidos por reservas ainda não confirmadas (ver core.reservas).
+        for profissional_id, data, horario_inicio, duracao in reservas_retidas(inicio, dias, self.profissionais):
+            inicio_em_minutos = _minutos(horario_inicio)
+            self.ocupados[(profissional_id, data)].append(
+                (inicio_em_minutos, inicio_em_minutos + max(duracao, self.intervalo))
+            )
+
+    def livres(self, profissional_id, data):
+        """
+        Intervalos livres (em minutos desde a meia-noite) do profissional na data.
+        """
+        chave = (profissional_id, data)
+        if chave not in self._livres:
+            self._carregar_bloco(data)
+            janelas = self.janelas.get(profissional_id, {}).get(data.weekday(), [])
+            self._livres[chave] = _subtrair(janelas, _mesclar(self.ocupados.get(chave, [])))
+        return self._livres[chave]
+
+    def _inicios(self, profissional_id, data, duracao, minimo):
+        for inicio, fim in self.livres(profissional_id, data):
+            inicio = max(inicio, minimo)
+            # Alinha o início à grade de intervalos do dia.
+            inicio += -inicio % self.intervalo
+            while inicio + duracao <= fim:
+                yield inicio, profissional_id
+                inicio += self.intervalo
+
+    def proximos(self, duracao, quantidade, agora=None):
+        """
+        Retorna os ``quantidade`` próximos horários livres, em ordem
+        cronológica, em que cabe um atendimento de ``duracao`` minutos.
+        """
+        agora = agora or timezone.localtime()
+        resultado = []
+        for deslocamento in range(self.dias):
+            data = self.inicio + timedelta(days=deslocamento)
+            if data < agora.date():
+                continue
+            minimo = _minutos(agora) + 1 if data == agora.date() else 0
+            candidatos = heapq.merge(*(
+                self._inicios(profissional_id, data, duracao, minimo)
+                for profissional_id in self._por_dia_da_semana.get(data.weekday(), [])
+            ))
+            for inicio, profissional_id in islice(candidatos, quantidade - len(resultado)):
+                resultado.append(HorarioLivre(
+                    profissional_id, data, _horario(inicio), _horario(inicio + duracao)
+                ))
+            if len(resultado) >= quantidade:
+                break
+        return resultado
+
+
+def proximos_horarios_livres(servicos_ids, quantidade=10, inicio=None, dias=HORIZONTE_PADRAO,
+                             profissionais=None, intervalo=INTERVALO_PADRAO, agora=None):
+    """
+    Atalho que soma a duração dos serviços e consulta o índice do período.
+    Retorna ``None`` se algum serviço não existir.
+    """
+    duracao = duracao_dos_servicos(servicos_ids)
+    if duracao is None:
+        return None
+    agora = agora or timezone.localtime()
+    indice = IndiceDeHorarios(inicio or agora.date(), dias, profissionais, intervalo)
+    return indice.proximos(max(duracao, intervalo), quantidade, agora)
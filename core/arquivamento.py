@@ -0,0 +1,176 @@
+"""
+Arquivamento dos agendamentos antigos (tabelas quente e fria).
+
+Agendamentos concluídos ou cancelados há mais de ``ARQUIVAMENTO_IDADE_DIAS``
+dias, com seus serviços e feedback, saem de ``Agendamento``/``Feedback`` e vão
+para ``AgendamentoArquivado``/``FeedbackArquivado``, com os mesmos ids. A
+agenda, as listagens e os índices da tabela quente passam a cobrir só o
+período recente; o histórico é lido em ``/api/agendamentos-arquivados/``,
+apenas quando pedido.
+
+``arquivar()`` move ``LOTE`` agendamentos por transação, pela fila de escrita,
+com uma pausa entre os lotes para não segurar o banco. Roda pelo comando
+``arquivar_agendamentos``, agendado no cron em um único processo: vários
+arquivadores ao mesmo tempo só disputariam a trava de escrita do SQLite com as
+requisições. ``ARQUIVAMENTO_EM_PROCESSO`` (desligado por padrão) inicia uma
+thread do servidor, a cada ``INTERVALO`` segundos, para servidores de
+processo único.
+
+O histórico continua valendo para o estado derivado: estatísticas diárias e
+resumo das avaliações não mudam ao arquivar (e ``calcular()`` de
+``core.estatisticas`` e ``core.avaliacoes`` soma as tabelas arquivadas). Por
+isso os originais são apagados sem os sinais que descontariam esses totais.
+"""
+import logging
+import threading
+import time as relogio
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import escrita
+from .models import (
+    Agendamento, AgendamentoArquivado, Feedback, FeedbackArquivado, Lembrete, Reserva
+)
+
+logger = logging.getLogger(__name__)
+
+FINALIZADOS = ('concluido', 'cancelado')
+IDADE_PADRAO = 365  # dias
+LOTE = 1000
+PAUSA_ENTRE_LOTES = 0.2  # segundos
+INTERVALO = 6 * 60 * 60  # segundos
+
+
+def data_de_corte(hoje=None, idade=None):
+    """
+    Agendamentos anteriores a esta data podem ser arquivados.
+    """
+    idade = getattr(settings, 'ARQUIVAMENTO_IDADE_DIAS', IDADE_PADRAO) if idade is None else idade
+    return (hoje or timezone.localdate()) - timedelta(days=idade)
+
+
+def arquivaveis(corte):
+    return Agendamento.objects.filter(status__in=FINALIZADOS, data__lt=corte)
+
+
+def _mover(ids, corte, agora):
+    """
+    Copia um lote para as tabelas arquivadas e apaga os originais, em uma
+    transação. Retorna quantos agendamentos foram arquivados.
+    """
+    Relacao = Agendamento.servicos.through
+    RelacaoArquivada = AgendamentoArquivado.servicos.through
+    with transaction.atomic():
+        # Relido na transação: o agendamento pode ter mudado desde a seleção do lote.
+        agendamentos = list(arquivaveis(corte).filter(pk__in=ids).com_totais().values_list(
+            'pk', 'usuario_id', 'profissional_id', 'data', 'horario_inicio', 'status', 'preco_total', 'duracao_total'
+        ))
+        ids = [agendamento[0] for agendamento in agendamentos]
+        if not ids:
+            return 0
+        AgendamentoArquivado.objects.bulk_create([
+            AgendamentoArquivado(
+                id=pk, usuario_id=usuario, profissional_id=profissional, data=data, horario_inicio=horario_inicio,
+                status=status, preco_total=preco_total, duracao_total=duracao_total, arquivado_em=agora,
+            )
+            for pk, usuario, profissional, data, horario_inicio, status, preco_total, duracao_total in agendamentos
+        ])
+        RelacaoArquivada.objects.bulk_create([
+            RelacaoArquivada(agendamentoarquivado_id=agendamento, tratamentopodologico_id=servico)
+            for agendamento, servico in Relacao.objects.filter(agendamento_id__in=ids).values_list(
+                'agendamento_id', 'tratamentopodologico_id'
+            )
+        ])
+        feedbacks = Feedback.objects.filter(agendamento_id__in=ids)
+        FeedbackArquivado.objects.bulk_create([
+            FeedbackArquivado(
+                id=pk, usuario_id=usuario, agendamento_id=agendamento, nota=nota, comentario=comentario, data=data
+            )
+            for pk, usuario, agendamento, nota, comentario, data in feedbacks.values_list(
+                'pk', 'usuario_id', 'agendamento_id', 'nota', 'comentario', 'data'
+            )
+        ])
+
+        Lembrete.objects.filter(agendamento_id__in=ids).delete()
+        Reserva.objects.filter(agendamento_id__in=ids).delete()
+        Relacao.objects.filter(agendamento_id__in=ids).delete()
+        # Sem sinais (que descontariam avaliações e estatísticas): os totais
+        # continuam valendo, agora a partir das tabelas arquivadas.
+        feedbacks._raw_delete(feedbacks.db)
+        originais = Agendamento.objects.filter(pk__in=ids)
+        originais._raw_delete(originais.db)
+    return len(ids)
+
+
+def arquivar(hoje=None, idade=None, lote=LOTE, pausa=PAUSA_ENTRE_LOTES, agora=None, limite=None):
+    """
+    Arquiva, em lotes, os agendamentos finalizados anteriores à data de
+    corte. ``limite`` interrompe depois de tantos agendamentos. Retorna
+    quantos foram arquivados.
+    """
+    corte = data_de_corte(hoje, idade)
+    agora = agora or timezone.now()
+    arquivados = 0
+    while limite is None or arquivados < limite:
+        tamanho = lote if limite is None else min(lote, limite - arquivados)
+        ids = list(arquivaveis(corte).order_by('data', 'id').values_list('pk', flat=True)[:tamanho])
+        if not ids:
+            break
+        arquivados += escrita.executar(_mover, ids, corte, agora)
+        if pausa:
+            # Deixa as escritas da aplicação passarem entre um lote e outro.
+            relogio.sleep(pausa)
+    return arquivados
+
+
+class Arquivador:
+    """
+    Laço do arquivamento. ``iniciar()`` o roda em uma thread daemon;
+    ``executar()`` o roda na thread atual até ``encerrar()``.
+    """
+    def __init__(self, intervalo=INTERVALO):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self.executar, name='arquivamento', daemon=True)
+                self._thread.start()
+
+    def encerrar(self):
+        self._parar.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def executar(self):
+        try:
+            while not self._parar.is_set():
+                try:
+                    # Um lote por vez, para que encerrar() não espere o arquivamento inteiro.
+                    while not self._parar.is_set() and arquivar(limite=LOTE):
+                        pass
+                except Exception:
+                    logger.exception("Falha no arquivamento dos agendamentos.")
+                self._parar.wait(self.intervalo)
+        finally:
+            connections.close_all()
+
+
+arquivador = Arquivador()
+
+
+def iniciar():
+    """
+    Inicia a thread do arquivamento se ``settings.ARQUIVAMENTO_EM_PROCESSO`` estiver ligado.
+    """
+    if getattr(settings, 'ARQUIVAMENTO_EM_PROCESSO', False):
+        arquivador.iniciar()
@@ -0,0 +1,114 @@
+"""
+Resumo das avaliações (Feedback.nota) de cada profissional.
+
+O resumo fica em colunas do próprio ``ProfissionalDePodologia`` (total, soma,
+histograma de 1 a 5 e média), para que as listagens possam ordenar e filtrar
+por avaliação sem joins. Ele é atualizado de forma incremental, com ``UPDATE``
+atômico, na mesma transação em que o Feedback é salvo ou excluído (ver
+``core.signals``), e pode ser reconstruído com ``manage.py recalcular_avaliacoes``.
+Os feedbacks arquivados (``core.arquivamento``) continuam contando.
+Como esses ``UPDATE`` não disparam sinais, o cache do catálogo de
+profissionais é invalidado aqui mesmo.
+"""
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+
+from . import catalogo
+from .models import Feedback, FeedbackArquivado, ProfissionalDePodologia
+
+NOTAS = [nota for nota, _ in Feedback.NOTA_CHOICES]
+
+CAMPOS = ['avaliacoes_total', 'avaliacoes_soma'] + [f'avaliacoes_nota_{nota}' for nota in NOTAS] + ['avaliacao_media']
+
+
+def _media(soma, total):
+    return Case(
+        When(GreaterThan(total, 0), then=Cast(soma, FloatField()) / total),
+        default=None,
+        output_field=FloatField(),
+    )
+
+
+def registrar(profissional_id, nota, sinal=1):
+    """
+    Soma (``sinal=1``) ou remove (``sinal=-1``) uma nota do resumo do profissional.
+    """
+    total = F('avaliacoes_total') + sinal
+    soma = F('avaliacoes_soma') + sinal * nota
+    ProfissionalDePodologia.objects.filter(pk=profissional_id).update(**{
+        'avaliacoes_total': total,
+        'avaliacoes_soma': soma,
+        f'avaliacoes_nota_{nota}': F(f'avaliacoes_nota_{nota}') + sinal,
+        'avaliacao_media': _media(soma, total),
+    })
+    catalogo.invalidar('profissionais')
+
+
+def calcular():
+    """
+    Calcula o resumo de todos os profissionais a partir das tabelas de
+    feedbacks (a atual e a arquivada). Retorna ``{profissional_id: {campo:
+    valor}}``; profissionais sem feedback ficam de fora.
+    """
+    agregados = {
+        'avaliacoes_total': Count('id'),
+        'avaliacoes_soma': Sum('nota'),
+        **{f'avaliacoes_nota_{nota}': Count('id', filter=Q(nota=nota)) for nota in NOTAS},
+    }
+    resumos = {}
+    for modelo in (Feedback, FeedbackArquivado):
+        linhas = modelo.objects.order_by().values('agendamento__profissional_id').annotate(**agregados)
+        for linha in linhas:
+            resumo = resumos.setdefault(linha['agendamento__profissional_id'], dict.fromkeys(agregados, 0))
+            for campo in agregados:
+                resumo[campo] += linha[campo]
+    for resumo in resumos.values():
+        resumo['avaliacao_media'] = resumo['avaliacoes_soma'] / resumo['avaliacoes_total']
+    return resumos
+
+
+def vazio():
+    return {campo: 0 for campo in CAMPOS[:-1]} | {'avaliacao_media': None}
+
+
+def divergencias(resumos=None):
+    """
+    Compara o resumo gravado com o recalculado e retorna
+    ``[(profissional, {campo: (gravado, esperado)}), ...]``.
+    """
+    resumos = calcular() if resumos is None else resumos
+    resultado = []
+    for profissional in ProfissionalDePodologia.objects.only('id', *CAMPOS).iterator(chunk_size=2000):
+        esperado = resumos.get(profissional.pk, vazio())
+        diferencas = {}
+        for campo in CAMPOS:
+            gravado = getattr(profissional, campo)
+            if campo == 'avaliacao_media':
+                iguais = (gravado is None) == (esperado[campo] is None) and (
+                    gravado is None or abs(gravado - esperado[campo]) < 1e-9
+                )
+            else:
+                iguais = gravado == esperado[campo]
+            if not iguais:
+                diferencas[campo] = (gravado, esperado[campo])
+        if diferencas:
+            resultado.append((profissional, diferencas))
+    return resultado
+
+
+def reconstruir(lote=2000):
+    """
+    Regrava o resumo de todos os profissionais a partir dos feedbacks.
+    Retorna quantos profissionais foram atualizados.
+    """
+    resumos = calcular()
+    corrigidos = []
+    for profissional, diferencas in divergencias(resumos):
+        for campo in CAMPOS:
+            setattr(profissional, campo, resumos.get(profissional.pk, vazio())[campo])
+        corrigidos.append(profissional)
+    ProfissionalDePodologia.objects.bulk_update(corrigidos, CAMPOS, batch_size=lote)
+    if corrigidos:
+        catalogo.invalidar('profissionais')
+    return len(corrigidos)
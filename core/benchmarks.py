@@ -0,0 +1,1252 @@
+"""
+Cenários de benchmark executados por ``python manage.py benchmark <cenario>``.
+
+Cada cenário recebe o ``stdout`` do comando e os parâmetros informados na
+linha de comando, popula o banco de testes e imprime suas medições.
+"""
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time as time_, timedelta
+from io import BytesIO
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Q
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import escrita, estatisticas, imagens, lembretes, reservas
+from .busca import buscar_ids
+from .exportacao import agendamentos_para_exportar, exportar
+from .models import (
+    Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, EstatisticaDiaria, Lembrete
+)
+from .paginacao import AgendamentoPagination
+
+CENARIOS = {}
+
+LOTE = 10_000
+
+
+def cenario(nome):
+    def registrar(funcao):
+        CENARIOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def cronometrar(funcao, repeticoes):
+    """
+    Mediana, em milissegundos, de ``repeticoes`` execuções de ``funcao``.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def popular_agendamentos(linhas, inicio=date(2015, 1, 1), por_dia=300):
+    """
+    Insere ``linhas`` agendamentos (``por_dia`` por dia a partir de ``inicio``)
+    para um único cliente e profissional, em lotes de ``bulk_create``.
+    """
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    profissional = ProfissionalDePodologia.objects.create(
+        nome='Profissional', especializacao='-', email='prof@example.com', especialidade='-', aprovado=True
+    )
+    for deslocamento in range(0, linhas, LOTE):
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                usuario=usuario, profissional=profissional,
+                data=inicio + timedelta(days=indice // por_dia), status='concluido'
+            )
+            for indice in range(deslocamento, min(deslocamento + LOTE, linhas))
+        ], batch_size=LOTE)
+    return usuario, profissional
+
+
+@cenario('paginacao')
+def paginacao(saida, linhas=1_000_000, repeticoes=5):
+    """
+    Compara o custo de buscar uma página em profundidades crescentes com
+    paginação por cursor (keyset) e com ``OFFSET``.
+    """
+    saida.write(f"Populando {linhas} agendamentos...")
+    popular_agendamentos(linhas)
+
+    fabrica = APIRequestFactory()
+    paginador = AgendamentoPagination()
+    paginador.base_url = 'http://testserver/api/agendamentos/'
+    tamanho = paginador.page_size
+    ordenados = Agendamento.objects.order_by('data', 'id')
+    profundidades = sorted({p for p in (0, 1_000, 10_000, 100_000, linhas // 2, linhas - tamanho) if 0 <= p < linhas})
+
+    saida.write(f"{'profundidade':>12}  {'keyset (ms)':>11}  {'offset (ms)':>11}")
+    for profundidade in profundidades:
+        url = paginador.base_url
+        if profundidade:
+            data, pk = ordenados.values_list('data', 'id')[profundidade - 1]
+            url = paginador.encode_cursor(Agendamento(id=pk, data=data), reverso=False)
+        requisicao = Request(fabrica.get(url))
+
+        keyset = cronometrar(
+            lambda: AgendamentoPagination().paginate_queryset(Agendamento.objects.all(), requisicao),
+            repeticoes,
+        )
+        offset = cronometrar(lambda: list(ordenados[profundidade:profundidade + tamanho]), repeticoes)
+        saida.write(f"{profundidade:>12}  {keyset:>11.2f}  {offset:>11.2f}")
+
+
+@cenario('exportacao')
+def exportacao(saida, linhas=200_000, repeticoes=1):
+    """
+    Pico de memória e vazão da exportação em streaming para frações crescentes
+    do histórico; o pico deve ficar estável enquanto o volume cresce. A vazão
+    é medida com o tracemalloc ativo e fica abaixo da real.
+    """
+    saida.write(f"Populando {linhas} agendamentos com 2 serviços cada...")
+    popular_agendamentos(linhas)
+    servicos = [
+        TratamentoPodologico.objects.create(nome=nome, descricao='-', duracao=30, preco=preco, tipo='Clínico')
+        for nome, preco in (('Avaliação', 80), ('Órtese', 150))
+    ]
+    Relacao = Agendamento.servicos.through
+    ids = list(Agendamento.objects.values_list('id', flat=True))
+    for deslocamento in range(0, len(ids), LOTE):
+        Relacao.objects.bulk_create([
+            Relacao(agendamento_id=agendamento_id, tratamentopodologico_id=servico.id)
+            for agendamento_id in ids[deslocamento:deslocamento + LOTE]
+            for servico in servicos
+        ])
+    del ids
+
+    saida.write(f"{'linhas':>10}  {'formato':>7}  {'pico (MiB)':>10}  {'linhas/s':>10}")
+    for fracao in (0.1, 0.5, 1.0):
+        limite = Agendamento.objects.order_by('data', 'id').values_list('data', flat=True)[int(linhas * fracao) - 1]
+        for formato in ('csv', 'jsonl'):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            exportadas = sum(1 for _ in exportar(agendamentos_para_exportar(fim=limite), formato))
+            duracao = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+            saida.write(f"{exportadas:>10}  {formato:>7}  {pico:>10.1f}  {exportadas / duracao:>10.0f}")
+
+
+@cenario('transicoes')
+def transicoes(saida, linhas=10_000, repeticoes=1):
+    """
+    Fechamento do dia: concluir ``linhas`` agendamentos com ``save()`` por
+    linha e com uma transição em lote.
+    """
+    popular_agendamentos(linhas)
+    Agendamento.objects.update(status='confirmado')
+
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        for agendamento in Agendamento.objects.all():
+            agendamento.status = 'concluido'
+            agendamento.save()
+    por_linha = (time.perf_counter() - inicio) * 1000
+
+    Agendamento.objects.update(status='confirmado')
+    inicio = time.perf_counter()
+    resultados = Agendamento.objects.all().transicionar('concluido')
+    em_lote = (time.perf_counter() - inicio) * 1000
+
+    alterados = sum(1 for resultado in resultados.values() if resultado == 'alterado')
+    saida.write(f"{linhas} agendamentos")
+    saida.write(f"save() por linha:   {por_linha:10.1f} ms")
+    saida.write(f"transição em lote: {em_lote:10.1f} ms ({alterados} alterados)")
+
+
+@cenario('estatisticas')
+def estatisticas_(saida, linhas=200_000, repeticoes=5):
+    """
+    Série de um ano do dashboard: agregação sobre os agendamentos contra a
+    leitura da tabela de estatísticas diárias.
+    """
+    popular_agendamentos(linhas, inicio=date(2024, 1, 1), por_dia=linhas // 366 + 1)
+    servico = TratamentoPodologico.objects.create(nome='Consulta', descricao='-', duracao=30, preco=80, tipo='Clínico')
+    Relacao = Agendamento.servicos.through
+    for deslocamento in range(0, linhas, LOTE):
+        Relacao.objects.bulk_create([
+            Relacao(agendamento_id=pk, tratamentopodologico_id=servico.pk)
+            for pk in Agendamento.objects.order_by('pk').values_list('pk', flat=True)[deslocamento:deslocamento + LOTE]
+        ], batch_size=LOTE)
+    gravadas = estatisticas.reconstruir()
+
+    inicio, fim = date(2024, 1, 1), date(2024, 12, 31)
+    agregado = cronometrar(lambda: estatisticas.calcular(inicio, fim), repeticoes)
+    tabela = cronometrar(
+        lambda: list(EstatisticaDiaria.objects.filter(data__range=(inicio, fim), profissional_id=None).order_by('data')),
+        repeticoes,
+    )
+    saida.write(f"{linhas} agendamentos, {gravadas} linhas de estatística")
+    saida.write(f"agregação sobre agendamentos: {agregado:10.2f} ms")
+    saida.write(f"tabela de estatísticas:       {tabela:10.2f} ms")
+
+
+@cenario('totais')
+def totais(saida, linhas=100_000, repeticoes=3):
+    """
+    "Agendamentos acima de R$ 300 no mês": soma dos serviços em Python, com
+    prefetch, contra ``com_totais()`` filtrado no SQL.
+    """
+    popular_agendamentos(linhas, inicio=date(2024, 1, 1), por_dia=linhas // 366 + 1)
+    servicos = TratamentoPodologico.objects.bulk_create([
+        TratamentoPodologico(nome=f'Tratamento {indice}', descricao='-', duracao=30, preco=60 * indice, tipo='Clínico')
+        for indice in range(1, 6)
+    ])
+    Relacao = Agendamento.servicos.through
+    for deslocamento in range(0, linhas, LOTE):
+        Relacao.objects.bulk_create([
+            Relacao(agendamento_id=pk, tratamentopodologico_id=servicos[(pk + indice) % 5].pk)
+            for pk in Agendamento.objects.order_by('pk').values_list('pk', flat=True)[deslocamento:deslocamento + LOTE]
+            for indice in range(pk % 3)
+        ], batch_size=LOTE)
+
+    do_mes = Agendamento.objects.filter(data__range=(date(2024, 6, 1), date(2024, 6, 30)))
+
+    def em_python():
+        return [
+            agendamento.pk for agendamento in do_mes.prefetch_related('servicos')
+            if sum(servico.preco for servico in agendamento.servicos.all()) > 300
+        ]
+
+    def no_banco():
+        return list(do_mes.com_totais().filter(preco_total__gt=300).values_list('pk', flat=True))
+
+    assert sorted(em_python()) == sorted(no_banco())
+    saida.write(f"{linhas} agendamentos, {do_mes.count()} no mês, {len(no_banco())} acima de R$ 300")
+    saida.write(f"soma em Python:   {cronometrar(em_python, repeticoes):10.2f} ms")
+    saida.write(f"com_totais():     {cronometrar(no_banco, repeticoes):10.2f} ms")
+
+
+@cenario('idades')
+def idades(saida, linhas=1_000_000, repeticoes=3):
+    """
+    Faixa etária e distribuição por idade: ``idade`` em Python sobre todos os
+    pacientes contra os filtros e agregados no SQL.
+    """
+    hoje = date.today()
+    aleatorio = random.Random(0)
+    for deslocamento in range(0, linhas, LOTE):
+        Usuario.objects.bulk_create([
+            Usuario(nome='Paciente', email='paciente@example.com',
+                    data_nasc=hoje - timedelta(days=aleatorio.randrange(90 * 365)))
+            for _ in range(deslocamento, min(deslocamento + LOTE, linhas))
+        ], batch_size=LOTE)
+
+    def em_python():
+        return sum(1 for usuario in Usuario.objects.only('data_nasc').iterator(chunk_size=LOTE) if usuario.idade >= 60)
+
+    def no_banco():
+        return Usuario.objects.faixa_etaria('idoso').count()
+
+    assert em_python() == no_banco()
+    saida.write(f"{linhas} pacientes, {no_banco()} idosos")
+    saida.write(f"idosos em Python:                {cronometrar(em_python, 1):10.2f} ms")
+    saida.write(f"idosos por faixa de data_nasc:   {cronometrar(no_banco, repeticoes):10.2f} ms")
+    saida.write(f"distribuição por faixa:          "
+                f"{cronometrar(Usuario.objects.distribuicao_por_faixa, repeticoes):10.2f} ms")
+    mais_velhos = Usuario.objects.com_idade().filter(data_nasc__isnull=False)
+    saida.write(f"20 mais velhos, pela idade:      "
+                f"{cronometrar(lambda: list(mais_velhos.order_by('-idade')[:20]), repeticoes):10.2f} ms")
+    saida.write(f"20 mais velhos, pela data_nasc:  "
+                f"{cronometrar(lambda: list(mais_velhos.order_by('data_nasc')[:20]), repeticoes):10.2f} ms")
+
+
+@cenario('admin')
+def admin_(saida, linhas=1_000_000, repeticoes=5):
+    """
+    Changelist de agendamentos no admin: paginador, contagem e hierarquia de
+    datas padrão do Django contra os de ``core.admin``.
+    """
+    from unittest import mock
+
+    from django.contrib.auth.models import User
+    from django.core.paginator import Paginator
+
+    from .admin import AgendamentoAdmin
+
+    popular_agendamentos(linhas)
+    cliente = Client()
+    cliente.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark'))
+    url = '/admin/core/agendamento/'
+
+    saida.write(f"{linhas} agendamentos")
+    saida.write(f"{'página':<10}  {'padrão (ms)':>11}  {'core.admin (ms)':>15}")
+    for descricao, parametros in (('primeira', {}), ('ano', {'data__year': 2016}), ('status', {'status__exact': 'concluido'})):
+        with mock.patch.multiple(AgendamentoAdmin, paginator=Paginator, show_full_result_count=True), \
+                mock.patch('core.templatetags.admin_datas._ChangeListPeloIndice', lambda cl: cl):
+            padrao = cronometrar(lambda: cliente.get(url, parametros), repeticoes)
+        novo = cronometrar(lambda: cliente.get(url, parametros), repeticoes)
+        saida.write(f"{descricao:<10}  {padrao:>11.2f}  {novo:>15.2f}")
+
+
+@cenario('instrumentacao')
+def instrumentacao(saida, linhas=200, repeticoes=200):
+    """
+    Custo do ``InstrumentacaoMiddleware`` em uma listagem de agendamentos
+    (várias consultas por requisição), ligado e desligado.
+    """
+    popular_agendamentos(linhas)
+    url = f'/api/agendamentos/?tamanho={linhas}'
+    clientes = {}
+    for ligada in (False, True):
+        with override_settings(INSTRUMENTACAO=ligada):
+            clientes[ligada] = Client()
+            clientes[ligada].get(url)  # monta a cadeia de middlewares com a configuração
+    # Alterna as medições para que aquecimento e ruído se distribuam igualmente.
+    tempos = {False: [], True: []}
+    for _ in range(repeticoes):
+        for ligada, cliente in clientes.items():
+            tempos[ligada].append(cronometrar(lambda: cliente.get(url), 1))
+    saida.write(f"{linhas} agendamentos por página, {repeticoes} requisições alternadas em cada modo")
+    for ligada, medidas in tempos.items():
+        saida.write(f"instrumentação {'ligada' if ligada else 'desligada':<9}: {statistics.median(medidas):8.2f} ms")
+
+
+def percentil(valores, p):
+    """
+    Percentil ``p`` (0 a 100) pelo método do posto mais próximo.
+    """
+    ordenados = sorted(valores)
+    return ordenados[max(0, -(-len(ordenados) * p // 100) - 1)]
+
+
+def _endpoints(referencias):
+    hoje = date.today()
+    ano = (hoje - timedelta(days=365)).isoformat()
+    mes = (hoje - timedelta(days=30)).isoformat()
+    agendamento, feedback, profissional, servico = referencias
+    return [
+        ('api: agendamentos', '/api/agendamentos/'),
+        ('api: agendamentos acima de R$ 300', f'/api/agendamentos/?inicio={mes}&preco_total_min=300&ordenacao=-preco_total'),
+        ('api: agendamento', f'/api/agendamentos/{agendamento}/'),
+        ('api: exportar um mês', f'/api/agendamentos/exportar/?formato=jsonl&inicio={mes}'),
+        ('api: feedbacks', '/api/feedbacks/'),
+        ('api: feedback', f'/api/feedbacks/{feedback}/'),
+        ('api: profissionais', '/api/profissionais/'),
+        ('api: profissionais por avaliação', '/api/profissionais/?ordering=-avaliacao_media&avaliacao_minima=4'),
+        ('api: profissional', f'/api/profissionais/{profissional}/'),
+        ('api: buscar profissionais', '/api/profissionais/buscar/?q=podologia'),
+        ('api: horários livres', f'/api/profissionais/horarios-livres/?servicos={servico}&quantidade=10'),
+        ('api: tratamentos', '/api/tratamentos/'),
+        ('api: usuários idosos', '/api/usuarios/?faixa=idoso&ordering=-idade'),
+        ('api: distribuição de idades', '/api/usuarios/idades/'),
+        ('api: estatísticas do ano', f'/api/estatisticas/?inicio={ano}&fim={hoje.isoformat()}'),
+        ('async: agendamentos', '/api/async/agendamentos/'),
+        ('async: feedbacks', '/api/async/feedbacks/'),
+        ('async: profissionais', '/api/async/profissionais/'),
+        ('html: início', '/'),
+        ('html: dashboard', '/dashboard/'),
+        ('html: meus agendamentos', '/agendamentos/'),
+        ('html: novo agendamento', '/agendamentos/adicionar/'),
+        ('html: feedbacks', '/feedbacks/'),
+        ('html: novo feedback', '/feedbacks/adicionar/'),
+        ('html: editar feedback', f'/feedbacks/editar/{feedback}/'),
+        ('admin: agendamentos', '/admin/core/agendamento/'),
+        ('admin: feedbacks', '/admin/core/feedback/'),
+        ('admin: usuários idosos', '/admin/core/usuario/?faixa=idoso'),
+    ]
+
+
+@cenario('endpoints')
+def endpoints(saida, linhas=20_000, repeticoes=20, arquivo_json=None):
+    """
+    Percorre as views da API, HTML e admin com o cliente de testes sobre a
+    base de ``core.dados_sinteticos`` (``linhas`` agendamentos) e registra
+    p50/p95 da latência e o número de consultas de cada uma. Com
+    ``--json`` o resultado é gravado para comparar execuções.
+    """
+    import json
+    import platform
+    import sqlite3
+
+    import django
+    from django.contrib.auth.models import User
+
+    from . import dados_sinteticos
+    from .instrumentacao import Medicao
+    from .models import Feedback
+
+    base = dados_sinteticos.gerar(
+        usuarios=max(linhas // 10, 10), profissionais=max(linhas // 400, 5), agendamentos=linhas,
+    )
+    administrador = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+    Usuario.objects.filter(pk=Agendamento.objects.values('usuario_id')[:1]).update(user=administrador)
+    # Views quebradas entram no relatório com o status 500, sem interromper a execução.
+    cliente = Client(raise_request_exception=False)
+    cliente.force_login(administrador)
+    referencias = (
+        Agendamento.objects.values_list('pk', flat=True).first(),
+        Feedback.objects.values_list('pk', flat=True).first(),
+        ProfissionalDePodologia.objects.filter(aprovado=True).values_list('pk', flat=True).first(),
+        TratamentoPodologico.objects.values_list('pk', flat=True).first(),
+    )
+
+    def requisitar(url):
+        resposta = cliente.get(url)
+        corpo = b''.join(resposta.streaming_content) if resposta.streaming else resposta.content
+        return resposta, len(corpo)
+
+    resultados = []
+    saida.write(
+        f"{base['agendamentos']} agendamentos, {base['usuarios']} clientes, {base['feedbacks']} feedbacks; "
+        f"{repeticoes} amostras por endpoint"
+    )
+    saida.write(f"{'endpoint':<36}  {'status':>6}  {'p50 (ms)':>9}  {'p95 (ms)':>9}  {'consultas':>9}  {'bytes':>9}")
+    for nome, url in _endpoints(referencias):
+        resposta, _ = requisitar(url)  # aquecimento (conexão, caches, templates compilados)
+        if resposta.status_code >= 500:
+            resultados.append({'nome': nome, 'url': url, 'status': resposta.status_code})
+            saida.write(f"{nome:<36}  {resposta.status_code:>6}")
+            continue
+        tempos, consultas = [], []
+        for _ in range(repeticoes):
+            # O execute_wrapper conta tudo; o log do CaptureQueriesContext para em 9000 consultas.
+            with connection.execute_wrapper(medicao := Medicao()):
+                inicio = time.perf_counter()
+                resposta, tamanho = requisitar(url)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(medicao.consultas))
+        resultado = {
+            'nome': nome, 'url': url, 'status': resposta.status_code,
+            'p50_ms': round(percentil(tempos, 50), 2), 'p95_ms': round(percentil(tempos, 95), 2),
+            'consultas': max(consultas), 'bytes': tamanho,
+        }
+        resultados.append(resultado)
+        saida.write(
+            f"{nome:<36}  {resultado['status']:>6}  {resultado['p50_ms']:>9.2f}  {resultado['p95_ms']:>9.2f}  "
+            f"{resultado['consultas']:>9}  {tamanho:>9}"
+        )
+
+    if arquivo_json:
+        with open(arquivo_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'cenario': 'endpoints',
+                'quando': timezone.now().isoformat(),
+                'repeticoes': repeticoes,
+                'ambiente': {
+                    'python': platform.python_version(), 'django': django.get_version(),
+                    'sqlite': sqlite3.sqlite_version, 'cpus': os.cpu_count(),
+                },
+                'base': base,
+                'endpoints': resultados,
+            }, arquivo, ensure_ascii=False, indent=2)
+        saida.write(f"Resultados gravados em {arquivo_json}")
+    return resultados
+
+
+@cenario('campos')
+def campos(saida, linhas=20_000, repeticoes=20):
+    """
+    Listagem de agendamentos (página de 50) completa contra a representação
+    esparsa de uma agenda no celular (?fields=/?expand=): tempo, consultas e
+    bytes por página.
+    """
+    from . import dados_sinteticos
+    from .instrumentacao import Medicao
+
+    dados_sinteticos.gerar(usuarios=linhas // 10, agendamentos=linhas)
+    cliente = Client()
+    variantes = [
+        ('completa', '/api/agendamentos/?tamanho=50'),
+        ('só ids', '/api/agendamentos/?tamanho=50&expand='),
+        ('agenda', '/api/agendamentos/?tamanho=50&fields=id,data,horario_inicio,status,usuario.nome'),
+        ('feedbacks completos', '/api/feedbacks/?tamanho=50'),
+        ('feedbacks esparsos', '/api/feedbacks/?tamanho=50&fields=id,nota,data,agendamento.profissional.nome'),
+    ]
+    saida.write(f"{linhas} agendamentos")
+    saida.write(f"{'representação':<20}  {'ms':>8}  {'consultas':>9}  {'bytes':>8}")
+    for nome, url in variantes:
+        resposta = cliente.get(url)
+        with connection.execute_wrapper(medicao := Medicao()):
+            cliente.get(url)
+        tempo = cronometrar(lambda: cliente.get(url), repeticoes)
+        saida.write(f"{nome:<20}  {tempo:>8.2f}  {len(medicao.consultas):>9}  {len(resposta.content):>8}")
+
+
+@cenario('lote')
+def lote(saida, linhas=10_000, repeticoes=1):
+    """
+    Importação de ``linhas`` agendamentos com dois serviços cada: item a item
+    pelo ORM (``create`` + ``servicos.add``, com os sinais) contra
+    ``POST /api/agendamentos/em-lote/``. Confere as estatísticas no final.
+    """
+    from .instrumentacao import Medicao
+
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    profissionais = [
+        ProfissionalDePodologia.objects.create(
+            nome=f'Profissional {indice}', especializacao='-', email='prof@example.com', especialidade='-'
+        ).pk
+        for indice in range(10)
+    ]
+    servicos = [
+        TratamentoPodologico.objects.create(nome=nome, descricao='-', duracao=15, preco=80, tipo='Clínico').pk
+        for nome in ('Avaliação', 'Podoprofilaxia')
+    ]
+    horarios = [time_(8 + minutos // 60, minutos % 60) for minutos in range(0, 600, 30)]
+
+    def itens(inicio):
+        # Sem conflitos: cada profissional atende 20 horários por dia.
+        return [
+            {
+                'usuario': usuario.pk, 'profissional': profissionais[indice % 10], 'servicos': servicos,
+                'data': (inicio + timedelta(days=indice // 200)).isoformat(),
+                'horario_inicio': horarios[indice // 10 % 20].isoformat(),
+            }
+            for indice in range(linhas)
+        ]
+
+    saida.write(f"{linhas} agendamentos por rodada")
+    saida.write(f"{'caminho':<10}  {'s':>8}  {'agend./s':>9}  {'consultas':>9}")
+    resultados = {}
+    for nome, inicio in (('item', date(2030, 1, 1)), ('em lote', date(2040, 1, 1))):
+        lote_de_itens = itens(inicio)
+        with connection.execute_wrapper(medicao := Medicao()):
+            comeco = time.perf_counter()
+            if nome == 'item':
+                with transaction.atomic():
+                    for item in lote_de_itens:
+                        Agendamento.objects.create(
+                            usuario_id=item['usuario'], profissional_id=item['profissional'], data=item['data'],
+                            horario_inicio=item['horario_inicio'],
+                        ).servicos.add(*item['servicos'])
+            else:
+                # Sem a fila de escrita, as consultas do lote rodam nesta thread e entram na contagem.
+                with override_settings(SQLITE_FILA_DE_ESCRITA=False):
+                    resposta = Client().post(
+                        '/api/agendamentos/em-lote/', {'agendamentos': lote_de_itens},
+                        content_type='application/json',
+                    )
+                assert resposta.json()['criados'] == linhas, resposta.json()['recusados']
+            segundos = time.perf_counter() - comeco
+        resultados[nome] = segundos
+        saida.write(f"{nome:<10}  {segundos:>8.2f}  {linhas / segundos:>9.0f}  {len(medicao.consultas):>9}")
+    saida.write(f"em lote {resultados['item'] / resultados['em lote']:.1f}x mais rápido")
+    saida.write(f"divergências nas estatísticas: {len(estatisticas.divergencias())}")
+
+
+@cenario('arquivamento')
+def arquivamento_(saida, linhas=100_000, repeticoes=20):
+    """
+    Base de ``core.dados_sinteticos`` com ``linhas`` agendamentos em três
+    anos: consultas da agenda antes e depois de arquivar o que passou de um
+    ano, e a vazão do arquivamento.
+    """
+    from . import arquivamento, avaliacoes, dados_sinteticos
+    from .models import AgendamentoArquivado
+
+    dados_sinteticos.gerar(usuarios=max(linhas // 10, 10), agendamentos=linhas)
+    hoje = date.today()
+    servico = TratamentoPodologico.objects.values_list('pk', flat=True).first()
+    cliente = Client()
+    consultas = [
+        ('pendentes', '/api/agendamentos/?status=pendente&tamanho=50&expand='),
+        ('próximos 7 dias', f'/api/agendamentos/?inicio={hoje}&fim={hoje + timedelta(days=7)}&tamanho=50&expand='),
+        ('horários livres', f'/api/profissionais/horarios-livres/?servicos={servico}&quantidade=20'),
+        ('mais caros', '/api/agendamentos/?ordenacao=-preco_total&tamanho=50&expand='),
+    ]
+
+    def medir():
+        tempos = {}
+        for nome, url in consultas:
+            cliente.get(url)
+            tempos[nome] = cronometrar(lambda: cliente.get(url), repeticoes)
+        return tempos
+
+    antes = medir()
+    inicio = time.perf_counter()
+    arquivados = arquivamento.arquivar(pausa=0)
+    segundos = time.perf_counter() - inicio
+    saida.write(f"{arquivados} de {linhas} agendamentos arquivados em {segundos:.1f} s ({arquivados / segundos:.0f}/s)")
+    saida.write(
+        f"tabela quente: {Agendamento.objects.count()} linhas; arquivada: {AgendamentoArquivado.objects.count()}; "
+        f"divergências: {len(estatisticas.divergencias())} estatísticas, {len(avaliacoes.divergencias())} avaliações"
+    )
+    depois = medir()
+    saida.write(f"{'consulta':<16}  {'antes ms':>9}  {'depois ms':>9}")
+    for nome, _ in consultas:
+        saida.write(f"{nome:<16}  {antes[nome]:>9.2f}  {depois[nome]:>9.2f}")
+
+
+@cenario('horarios')
+def horarios(saida, linhas=300, repeticoes=20, dias=60, por_dia=6):
+    """
+    ``linhas`` profissionais com expediente de segunda a sexta (8h–12h e
+    14h–18h) e ``por_dia`` agendamentos de 30 minutos em cada dia útil dos
+    próximos ``dias`` dias: montagem do ``IndiceDeHorarios`` do período, busca
+    dos próximos horários livres (os 10 primeiros e todos do período) e
+    ``GET /api/profissionais/horarios-livres/``.
+    """
+    from . import agenda
+
+    aleatorio = random.Random(42)
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    servico = TratamentoPodologico.objects.create(nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico')
+    janelas = [
+        Disponibilidade.objects.create(dia=dia, horario_inicio=time_(inicio), horario_fim=time_(fim))
+        for dia, _ in Disponibilidade.DIAS_DA_SEMANA[:5] for inicio, fim in ((8, 12), (14, 18))
+    ]
+    profissionais = ProfissionalDePodologia.objects.bulk_create([
+        ProfissionalDePodologia(
+            nome=f'Profissional {indice}', especializacao='-', email='prof@example.com', especialidade='-',
+            aprovado=True,
+        )
+        for indice in range(linhas)
+    ])
+    Janela = ProfissionalDePodologia.disponibilidade.through
+    Janela.objects.bulk_create([
+        Janela(profissionaldepodologia_id=profissional.pk, disponibilidade_id=janela.pk)
+        for profissional in profissionais for janela in janelas
+    ])
+
+    hoje = date.today()
+    uteis = [hoje + timedelta(days=deslocamento) for deslocamento in range(dias)]
+    uteis = [data for data in uteis if data.weekday() < 5]
+    # Inícios na grade de 30 minutos dos dois turnos.
+    grade = [time_(hora, minuto) for hora in (8, 9, 10, 11, 14, 15, 16, 17) for minuto in (0, 30)]
+    agendamentos = Agendamento.objects.bulk_create([
+        Agendamento(
+            usuario=usuario, profissional=profissional, data=data, horario_inicio=horario, status='confirmado'
+        )
+        for profissional in profissionais for data in uteis for horario in aleatorio.sample(grade, por_dia)
+    ], batch_size=LOTE)
+    Relacao = Agendamento.servicos.through
+    Relacao.objects.bulk_create([
+        Relacao(agendamento_id=agendamento.pk, tratamentopodologico_id=servico.pk) for agendamento in agendamentos
+    ], batch_size=LOTE)
+    saida.write(f"{linhas} profissionais, {dias} dias, {len(agendamentos)} agendamentos ativos")
+
+    agora = timezone.localtime().replace(hour=7, minute=0)
+    cliente = Client()
+
+    def montar():
+        return agenda.IndiceDeHorarios(hoje, dias)
+
+    indice = montar()
+    todos = len(indice.proximos(servico.duracao, 10 ** 9, agora))
+    saida.write(f"{todos} horários livres de {servico.duracao} minutos no período")
+
+    saida.write(f"{'medição':<28}  {'ms':>8}")
+    for nome, funcao in (
+        ('montar o índice', montar),
+        ('próximos 10', lambda: montar().proximos(servico.duracao, 10, agora)),
+        ('todos do período', lambda: montar().proximos(servico.duracao, 10 ** 9, agora)),
+        ('endpoint, 10 horários', lambda: cliente.get(
+            '/api/profissionais/horarios-livres/', {'servicos': servico.pk, 'quantidade': 10, 'dias': dias}
+        )),
+    ):
+        saida.write(f"{nome:<28}  {cronometrar(funcao, repeticoes):>8.1f}")
+
+
+@cenario('proximos')
+def proximos(saida, linhas=100_000, repeticoes=50, bairros=500):
+    """
+    ``linhas`` profissionais espalhados por ``bairros`` bairros sintéticos de
+    uma região de ~60 km: ``GET /api/profissionais/proximos/`` (grade) contra a
+    força bruta (distância a todos os profissionais aprovados, em Python).
+    """
+    from . import geolocalizacao
+
+    aleatorio = random.Random(42)
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, 'bairros.csv')
+        with open(arquivo, 'w', encoding='utf-8') as tabela:
+            tabela.write('bairro,latitude,longitude\n')
+            for indice in range(bairros):
+                tabela.write(f'Bairro {indice},{-5.1 + aleatorio.uniform(-0.3, 0.3):.5f},'
+                             f'{-42.8 + aleatorio.uniform(-0.3, 0.3):.5f}\n')
+        with override_settings(GEOLOCALIZACAO_BAIRROS=arquivo):
+            geolocalizacao.bairros.cache_clear()
+            try:
+                sabado = Disponibilidade.objects.create(dia='sabado', horario_inicio=time_(8), horario_fim=time_(12))
+                for deslocamento in range(0, linhas, LOTE):
+                    criados = ProfissionalDePodologia.objects.bulk_create([
+                        ProfissionalDePodologia(
+                            nome=f'Profissional {indice}', especializacao='-', email='prof@example.com',
+                            especialidade='-', bairro=f'Bairro {aleatorio.randrange(bairros)}',
+                            aprovado=aleatorio.random() < 0.9, avaliacao_media=aleatorio.uniform(1, 5),
+                        )
+                        for indice in range(deslocamento, min(deslocamento + LOTE, linhas))
+                    ])
+                    Janela = ProfissionalDePodologia.disponibilidade.through
+                    Janela.objects.bulk_create([
+                        Janela(profissionaldepodologia_id=profissional.pk, disponibilidade_id=sabado.pk)
+                        for profissional in criados if aleatorio.random() < 0.2
+                    ])
+                inicio = time.perf_counter()
+                geolocalizacao.preencher()
+                segundos = time.perf_counter() - inicio
+                saida.write(f"{linhas} profissionais em {bairros} bairros, localizados em {segundos:.1f} s")
+
+                origens = [
+                    (-5.1 + aleatorio.uniform(-0.3, 0.3), -42.8 + aleatorio.uniform(-0.3, 0.3)) for _ in range(20)
+                ]
+                cliente = Client()
+
+                def grade(dia=None, k=10):
+                    for latitude, longitude in origens:
+                        parametros = {'latitude': latitude, 'longitude': longitude, 'k': k, 'fields': 'id,distancia_km'}
+                        cliente.get('/api/profissionais/proximos/', parametros | ({'dia': dia} if dia else {}))
+
+                def forca_bruta(k=10):
+                    pontos = list(ProfissionalDePodologia.objects.filter(aprovado=True).values_list(
+                        'pk', 'latitude', 'longitude'
+                    ))
+                    for origem in origens:
+                        sorted(pontos, key=lambda ponto: geolocalizacao.distancia(origem, ponto[1:]))[:k]
+
+                saida.write(f"{'consulta':<22}  {'ms por origem':>13}")
+                for nome, funcao in (
+                    ('grade, k=10', grade), ('grade, k=100', lambda: grade(k=100)),
+                    ('grade, k=10, sábado', lambda: grade('sabado')),
+                    ('força bruta, k=10', forca_bruta),
+                ):
+                    tempo = cronometrar(funcao, max(1, repeticoes // 10) if 'força' in nome else repeticoes)
+                    saida.write(f"{nome:<22}  {tempo / len(origens):>13.2f}")
+            finally:
+                geolocalizacao.bairros.cache_clear()
+
+
+@cenario('recomendacoes')
+def recomendacoes_(saida, linhas=1_000_000, repeticoes=50, grupos=10):
+    """
+    ``linhas`` agendamentos concluídos com feedback, de ``linhas // 5``
+    clientes e ``linhas // 200`` profissionais divididos em ``grupos`` de
+    gosto (metade dos atendimentos dentro do grupo, com nota 5; fora dele,
+    notas de 1 a 3): duração de cada etapa de ``recomendacoes.gerar()``, acerto
+    das recomendações e a leitura pela API.
+    """
+    from . import recomendacoes
+    from .models import Feedback, Recomendacao
+
+    aleatorio = random.Random(42)
+    tipos = [tipo for tipo, _ in TratamentoPodologico.TIPOS_TRATAMENTO]
+    servicos = [
+        TratamentoPodologico.objects.create(nome=tipo, descricao='-', duracao=30, preco=100, tipo=tipo).pk
+        for tipo in tipos
+    ]
+    profissionais = [profissional.pk for profissional in ProfissionalDePodologia.objects.bulk_create([
+        ProfissionalDePodologia(
+            nome=f'Profissional {indice}', especializacao='-', email='prof@example.com', especialidade='-',
+            aprovado=aleatorio.random() < 0.95,
+        )
+        for indice in range(max(linhas // 200, grupos))
+    ], batch_size=LOTE)]
+    clientes = [usuario.pk for usuario in Usuario.objects.bulk_create([
+        Usuario(nome=f'Cliente {indice}', email='cliente@example.com') for indice in range(max(linhas // 5, 1))
+    ], batch_size=LOTE)]
+    por_grupo = [[pk for pk in profissionais if pk % grupos == grupo] for grupo in range(grupos)]
+    Relacao = Agendamento.servicos.through
+    inicio = time.perf_counter()
+    for deslocamento in range(0, linhas, LOTE):
+        pares = []
+        for _ in range(min(LOTE, linhas - deslocamento)):
+            cliente = aleatorio.choice(clientes)
+            grupo = por_grupo[cliente % grupos] if aleatorio.random() < 0.5 else profissionais
+            pares.append((cliente, aleatorio.choice(grupo)))
+        criados = Agendamento.objects.bulk_create([
+            Agendamento(usuario_id=cliente, profissional_id=profissional, data=date(2025, 1, 1), status='concluido')
+            for cliente, profissional in pares
+        ])
+        # O tipo preferido do cliente segue o grupo, na maioria das vezes.
+        Relacao.objects.bulk_create([
+            Relacao(agendamento_id=agendamento.pk, tratamentopodologico_id=servicos[
+                cliente % len(servicos) if aleatorio.random() < 0.7 else aleatorio.randrange(len(servicos))
+            ])
+            for agendamento, (cliente, _) in zip(criados, pares)
+        ])
+        Feedback.objects.bulk_create([
+            Feedback(
+                usuario_id=cliente, agendamento_id=agendamento.pk,
+                nota=5 if cliente % grupos == profissional % grupos else aleatorio.randint(1, 3),
+            )
+            for agendamento, (cliente, profissional) in zip(criados, pares)
+        ])
+    saida.write(
+        f"{linhas} feedbacks de {len(clientes)} clientes para {len(profissionais)} profissionais, "
+        f"gerados em {time.perf_counter() - inicio:.1f} s"
+    )
+
+    etapas = {}
+    inicio = time.perf_counter()
+    dados = (*recomendacoes._notas(), recomendacoes._tipos('usuario'), recomendacoes._tipos('profissional'))
+    etapas['leitura'] = time.perf_counter() - inicio
+    aprovados = np.array(ProfissionalDePodologia.objects.filter(aprovado=True).values_list('pk', flat=True))
+    inicio = time.perf_counter()
+    calculadas = list(recomendacoes.calcular(*dados, aprovados))
+    etapas['cálculo'] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    gravadas = recomendacoes.gerar()
+    etapas['gerar() completo'] = time.perf_counter() - inicio
+    saida.write(f"{'etapa':<18}  {'s':>7}")
+    for nome, segundos in etapas.items():
+        saida.write(f"{nome:<18}  {segundos:>7.1f}")
+
+    acertos = [cliente % grupos == profissional % grupos for cliente, ids, _ in calculadas for profissional in ids]
+    saida.write(
+        f"{gravadas} clientes com recomendações; {sum(acertos) / max(len(acertos), 1):.0%} do grupo do cliente "
+        f"(ao acaso: {1 / grupos:.0%})"
+    )
+    amostra = list(Recomendacao.objects.values_list('usuario_id', flat=True)[:20])
+    cliente = Client()
+
+    def api():
+        for usuario in amostra:
+            cliente.get(f'/api/usuarios/{usuario}/recomendacoes/', {'fields': 'id,nome,pontuacao'})
+
+    saida.write(f"GET /api/usuarios/<id>/recomendacoes/: {cronometrar(api, repeticoes) / len(amostra):.2f} ms")
+
+
+@cenario('busca')
+def busca(saida, linhas=100_000, repeticoes=20):
+    """
+    Latência da busca FTS5 de profissionais comparada ao icontains em cada campo.
+    """
+    aleatorio = random.Random(42)
+    nomes = ['Ana', 'Bruno', 'Carla', 'Diego', 'Érica', 'Fábio', 'Gabriela', 'Heitor', 'Íris', 'João']
+    sobrenomes = ['Silva', 'Souza', 'Oliveira', 'Pereira', 'Lima', 'Gonçalves', 'Araújo', 'Conceição']
+    areas = ['infantil', 'TEA', 'TDAH', 'idosos', 'diabéticos', 'esportiva', 'ortonixia', 'órteses', 'micoses']
+    bairros = ['Centro', 'Jardim América', 'São José', 'Boa Vista', 'Santa Mônica', 'Vila Nova', 'Aeroporto']
+    for deslocamento in range(0, linhas, LOTE):
+        ProfissionalDePodologia.objects.bulk_create([
+            ProfissionalDePodologia(
+                nome=f'{aleatorio.choice(nomes)} {aleatorio.choice(sobrenomes)}',
+                especializacao=', '.join(aleatorio.sample(areas, 2)),
+                especialidade=f'Atendimento {" e ".join(aleatorio.sample(areas, 3))} com experiência clínica.',
+                bairro=aleatorio.choice(bairros),
+                email='prof@example.com',
+                aprovado=aleatorio.random() < 0.8,
+            )
+            for _ in range(deslocamento, min(deslocamento + LOTE, linhas))
+        ])
+
+    def icontains(texto):
+        queryset = ProfissionalDePodologia.objects.filter(aprovado=True)
+        for termo in texto.split():
+            queryset = queryset.filter(
+                Q(nome__icontains=termo) | Q(especialidade__icontains=termo)
+                | Q(especializacao__icontains=termo) | Q(bairro__icontains=termo)
+            )
+        return list(queryset.values_list('id', flat=True)[:20])
+
+    saida.write(f"{linhas} profissionais")
+    saida.write(f"{'consulta':<28}  {'fts5 (ms)':>9}  {'icontains (ms)':>14}")
+    for texto in ('TEA infantil centro', 'sao jose diabeticos', 'orteses', 'Gabriela Araujo idosos'):
+        fts = cronometrar(lambda: buscar_ids(texto), repeticoes)
+        varredura = cronometrar(lambda: icontains(texto), repeticoes)
+        saida.write(f"{texto:<28}  {fts:>9.2f}  {varredura:>14.2f}")
+
+
+@cenario('imagens')
+def imagens_(saida, linhas=40, repeticoes=1):
+    """
+    Vazão da geração de variantes para ``linhas`` fotos de 3000x2000 com pools
+    de tamanhos diferentes, e tamanho da miniatura em relação ao original.
+    """
+    with tempfile.TemporaryDirectory() as pasta, override_settings(MEDIA_ROOT=pasta):
+        aleatorio = random.Random(42)
+        ids = []
+        for indice in range(linhas):
+            imagem = Image.effect_noise((3000, 2000), 40).convert('RGB')
+            imagem.paste(tuple(aleatorio.randrange(256) for _ in range(3)), (0, 0, 1500, 1000))
+            conteudo = BytesIO()
+            imagem.save(conteudo, 'JPEG', quality=90)
+            profissional = ProfissionalDePodologia(nome=f'P{indice}', especializacao='-', especialidade='-', email='p@example.com')
+            profissional.foto.save(f'foto{indice}.jpg', ContentFile(conteudo.getvalue()), save=False)
+            with override_settings(IMAGENS_SINCRONO=True):
+                profissional.save()
+            ids.append(profissional.pk)
+
+        saida.write(f"{linhas} fotos de 3000x2000")
+        saida.write(f"{'workers':>7}  {'fotos/s':>8}")
+        for workers in (1, 2, 4):
+            shutil.rmtree(os.path.join(pasta, imagens.PASTA), ignore_errors=True)
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda pk: imagens.gerar_variantes(ProfissionalDePodologia.objects.get(pk=pk).foto), ids))
+            saida.write(f"{workers:>7}  {linhas / (time.perf_counter() - inicio):>8.1f}")
+
+        profissional = ProfissionalDePodologia.objects.get(pk=ids[0])
+        foto_hash = imagens.gerar_variantes(profissional.foto)
+        original = profissional.foto.size
+        saida.write(f"original: {original / 1024:.0f} KiB")
+        for variante in imagens.VARIANTES:
+            tamanho = default_storage.size(imagens.caminho(foto_hash, variante))
+            saida.write(f"{variante}: {tamanho / 1024:.1f} KiB ({100 * tamanho / original:.1f}% do original)")
+
+
+@cenario('catalogo')
+def catalogo_(saida, linhas=500, repeticoes=50):
+    """
+    Tempo das listagens de catálogo sem cache, com a resposta em cache e com
+    ``If-None-Match`` (304).
+    """
+    disponibilidades = [
+        Disponibilidade.objects.create(dia=dia, horario_inicio=time_(8), horario_fim=time_(18))
+        for dia, _ in Disponibilidade.DIAS_DA_SEMANA[:5]
+    ]
+    ProfissionalDePodologia.objects.bulk_create([
+        ProfissionalDePodologia(nome=f'Profissional {indice}', especializacao='-', especialidade='-',
+                                email='prof@example.com', aprovado=True)
+        for indice in range(linhas)
+    ])
+    Relacao = ProfissionalDePodologia.disponibilidade.through
+    Relacao.objects.bulk_create([
+        Relacao(profissionaldepodologia_id=pk, disponibilidade_id=disponibilidade.pk)
+        for pk in ProfissionalDePodologia.objects.values_list('pk', flat=True)
+        for disponibilidade in disponibilidades[:3]
+    ])
+    TratamentoPodologico.objects.bulk_create([
+        TratamentoPodologico(nome=f'Tratamento {indice}', descricao='-', duracao=30, preco=80, tipo='Clínico')
+        for indice in range(40)
+    ])
+
+    cliente = Client()
+    saida.write(f"{linhas} profissionais, 40 tratamentos")
+    saida.write(f"{'endpoint':<20}  {'sem cache (ms)':>14}  {'em cache (ms)':>13}  {'304 (ms)':>8}")
+    for url in ('/api/profissionais/', '/api/tratamentos/'):
+        def sem_cache():
+            cache.clear()
+            cliente.get(url)
+        frio = cronometrar(sem_cache, repeticoes)
+        etag = cliente.get(url)['ETag']
+        quente = cronometrar(lambda: cliente.get(url), repeticoes)
+        nao_modificado = cronometrar(lambda: cliente.get(url, HTTP_IF_NONE_MATCH=etag), repeticoes)
+        saida.write(f"{url:<20}  {frio:>14.2f}  {quente:>13.2f}  {nao_modificado:>8.2f}")
+
+
+@cenario('concorrencia')
+def concorrencia(saida, linhas=8, repeticoes=3):
+    """
+    Vazão de leituras e escritas simultâneas em um arquivo SQLite com a
+    configuração padrão, com o perfil de ``settings`` (PRAGMAs + IMMEDIATE) e
+    com o perfil mais a fila de escrita. ``linhas`` é o número de threads de
+    cada tipo e ``repeticoes`` a duração de cada rodada, em segundos.
+    """
+    opcoes = dict(connection.settings_dict['OPTIONS'])
+    perfis = [('padrão', {}, False), ('perfil', opcoes, False), ('perfil + fila', opcoes, True)]
+    saida.write(f"{linhas} leitoras + {linhas} escritoras, {repeticoes} s por rodada")
+    saida.write(f"{'configuração':<14}  {'leituras/s':>10}  {'escritas/s':>10}  {'p95 escrita (ms)':>16}  {'locked':>6}")
+    for nome, opcoes, usar_fila in perfis:
+        leituras, escritas, latencias, travados = em_banco_de_arquivo(
+            opcoes, usar_fila, _rodada_concorrente, linhas, repeticoes
+        )
+        p95 = statistics.quantiles(latencias, n=20)[-1] * 1000 if len(latencias) > 1 else 0
+        saida.write(
+            f"{nome:<14}  {leituras / repeticoes:>10.0f}  {escritas / repeticoes:>10.0f}  {p95:>16.1f}  {travados:>6}"
+        )
+
+
+def em_banco_de_arquivo(opcoes, usar_fila, funcao, *args):
+    """
+    Executa ``funcao(*args)`` em um arquivo SQLite temporário e migrado, com
+    as ``OPTIONS`` de conexão e a fila de escrita indicadas.
+    """
+    configuracao = connection.settings_dict
+    original = {chave: configuracao[chave] for chave in ('NAME', 'OPTIONS', 'CONN_MAX_AGE')}
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            configuracao.update(NAME=os.path.join(pasta, 'bench.sqlite3'), OPTIONS=opcoes, CONN_MAX_AGE=None)
+
+            def executar():
+                try:
+                    call_command('migrate', verbosity=0)
+                    return funcao(*args)
+                finally:
+                    connections.close_all()
+
+            # A conexão desta thread é a do banco de testes em memória, que o
+            # Django não fecha; a rodada usa conexões novas, em outra thread.
+            with ThreadPoolExecutor(max_workers=1) as pool, override_settings(SQLITE_FILA_DE_ESCRITA=usar_fila):
+                resultado = pool.submit(executar).result()
+            escrita.fila.encerrar()
+            return resultado
+    finally:
+        configuracao.update(original)
+
+
+def _rodada_concorrente(threads, duracao):
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    profissional = ProfissionalDePodologia.objects.create(
+        nome='Profissional', especializacao='-', email='prof@example.com', especialidade='-', aprovado=True
+    )
+    servico = TratamentoPodologico.objects.create(nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico')
+    popular = [Agendamento(usuario=usuario, profissional=profissional, data=date(2024, 1, 1) + timedelta(days=i % 60))
+               for i in range(5000)]
+    Agendamento.objects.bulk_create(popular)
+    connections.close_all()
+
+    contagem = {'leituras': 0, 'escritas': 0, 'travados': 0}
+    latencias = []
+    trava = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def agendar(indice):
+        with transaction.atomic():
+            agendamento = Agendamento.objects.create(
+                usuario_id=usuario.pk, profissional_id=profissional.pk,
+                data=date(2024, 1, 1) + timedelta(days=indice % 60), status='pendente'
+            )
+            agendamento.servicos.add(servico.pk)
+
+    def escritora(numero):
+        indice = numero
+        try:
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    escrita.executar(agendar, indice)
+                except OperationalError:
+                    with trava:
+                        contagem['travados'] += 1
+                    continue
+                with trava:
+                    contagem['escritas'] += 1
+                    latencias.append(time.perf_counter() - inicio)
+                indice += threads
+        finally:
+            connections.close_all()
+
+    def leitora(numero):
+        dia = 0
+        try:
+            while time.perf_counter() < fim:
+                try:
+                    list(Agendamento.objects.filter(
+                        profissional_id=profissional.pk, data=date(2024, 1, 1) + timedelta(days=dia % 60)
+                    ).values_list('id', 'status'))
+                except OperationalError:
+                    with trava:
+                        contagem['travados'] += 1
+                    continue
+                with trava:
+                    contagem['leituras'] += 1
+                dia += 1
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=2 * threads) as pool:
+        for numero in range(threads):
+            pool.submit(escritora, numero)
+            pool.submit(leitora, numero)
+    return contagem['leituras'], contagem['escritas'], latencias, contagem['travados']
+
+
+@cenario('lembretes')
+def lembretes_(saida, linhas=30_000, repeticoes=5):
+    """
+    Lembretes de ``linhas`` agendamentos dos próximos dias em um arquivo
+    SQLite com a fila de escrita: varredura inicial e repetida, vazão de envio
+    e a latência de uma listagem da API, em ``repeticoes`` segundos, com e sem
+    o envio acontecendo ao mesmo tempo.
+    """
+    resultado = em_banco_de_arquivo(
+        dict(connection.settings_dict['OPTIONS']), True, _rodada_de_lembretes, linhas, repeticoes
+    )
+    saida.write(f"{linhas} agendamentos, {resultado['criados']} lembretes")
+    saida.write(f"primeira varredura:  {resultado['primeira']:10.0f} ms")
+    saida.write(f"varredura repetida:  {resultado['repetida']:10.0f} ms")
+    saida.write(f"envio:               {resultado['vazao']:10.0f} lembretes/s")
+    for nome, tempos in resultado['latencias'].items():
+        saida.write(f"API {nome:<16}: p50 {percentil(tempos, 50):7.2f} ms  p95 {percentil(tempos, 95):7.2f} ms")
+
+
+class _EnviadorNulo:
+    def enviar(self, mensagem):
+        pass
+
+
+def _rodada_de_lembretes(linhas, duracao):
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    profissional = ProfissionalDePodologia.objects.create(
+        nome='Profissional', especializacao='-', email='prof@example.com', especialidade='-', aprovado=True
+    )
+    hoje = date.today()
+    horarios = [time_(hora, minuto) for hora in range(8, 18) for minuto in (0, 30)]
+    for deslocamento in range(0, linhas, LOTE):
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                usuario=usuario, profissional=profissional, data=hoje + timedelta(days=1 + indice % 2),
+                horario_inicio=horarios[indice % len(horarios)],
+            )
+            for indice in range(deslocamento, min(deslocamento + LOTE, linhas))
+        ])
+    resultado = {}
+    inicio = time.perf_counter()
+    resultado['criados'] = lembretes.varrer()
+    resultado['primeira'] = (time.perf_counter() - inicio) * 1000
+    resultado['repetida'] = cronometrar(lembretes.varrer, 1)
+    # Todos vencidos, como depois de uma parada do worker.
+    Lembrete.objects.update(executar_em=timezone.now() - timedelta(minutes=1))
+    connections.close_all()
+
+    def medir_api(fim):
+        cliente, tempos = Client(), []
+        try:
+            while time.perf_counter() < fim:
+                tempos.append(cronometrar(lambda: cliente.get('/api/agendamentos/?tamanho=20'), 1))
+        finally:
+            connections.close_all()
+        return tempos
+
+    resultado['latencias'] = {'sem envio': medir_api(time.perf_counter() + duracao)}
+    # O agendador real, com as pausas entre lotes, esvaziando a fila.
+    agendador = lembretes.Agendador(intervalo_de_varredura=duracao * 10)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        envio = pool.submit(agendador.executar, _EnviadorNulo())
+        resultado['latencias']['durante o envio'] = medir_api(time.perf_counter() + duracao)
+        agendador.encerrar()
+        envio.result()
+    resultado['vazao'] = Lembrete.objects.filter(status='enviado').count() / duracao
+    return resultado
+
+
+@cenario('asgi')
+def asgi(saida, linhas=64, repeticoes=400):
+    """
+    Carga na listagem de agendamentos com ``linhas`` clientes simultâneos e
+    ``repeticoes`` requisições no total: caminho WSGI (view síncrona do DRF,
+    4 threads de worker) contra caminho ASGI (view assíncrona, um único event
+    loop). Os handlers rodam em processo, sem servidor HTTP.
+    """
+    usuario, profissional = popular_agendamentos(20_000)
+    sincrona, assincrona = '/api/agendamentos/?tamanho=50', '/api/async/agendamentos/?tamanho=50'
+
+    def wsgi():
+        cliente = Client()
+
+        def requisitar():
+            try:
+                assert cliente.get(sincrona).status_code == 200
+            finally:
+                connections.close_all()
+
+        def enviar(_):
+            # Cada cliente espera a vez em um dos 4 workers, como num servidor WSGI com 4 threads.
+            inicio = time.perf_counter()
+            workers.submit(requisitar).result()
+            return time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=4) as workers, ThreadPoolExecutor(max_workers=linhas) as clientes:
+            return list(clientes.map(enviar, range(repeticoes)))
+
+    async def asgi_():
+        cliente = AsyncClient()
+        limite = asyncio.Semaphore(linhas)
+
+        async def requisitar():
+            async with limite:
+                inicio = time.perf_counter()
+                assert (await cliente.get(assincrona)).status_code == 200
+                return time.perf_counter() - inicio
+
+        return await asyncio.gather(*(requisitar() for _ in range(repeticoes)))
+
+    saida.write(f"{repeticoes} requisições, {linhas} clientes simultâneos")
+    saida.write(f"{'caminho':<8}  {'req/s':>7}  {'p50 (ms)':>8}  {'p95 (ms)':>8}")
+    for nome, executar in (('wsgi', wsgi), ('asgi', lambda: async_to_sync(asgi_)())):
+        inicio = time.perf_counter()
+        latencias = executar()
+        duracao = time.perf_counter() - inicio
+        quantis = statistics.quantiles(latencias, n=20)
+        saida.write(f"{nome:<8}  {repeticoes / duracao:>7.0f}  {quantis[9] * 1000:>8.1f}  {quantis[18] * 1000:>8.1f}")
+
+
+@cenario('reservas')
+def reservas_(saida, linhas=16, repeticoes=5):
+    """
+    ``linhas`` threads reservam e confirmam, sem parar, horários de um
+    conjunto pequeno de profissionais e dias (os horários "quentes") durante
+    ``repeticoes`` segundos. Verifica que nenhum horário foi agendado em dobro
+    e mede agendamentos confirmados e tentativas por segundo, num arquivo
+    SQLite com o perfil de ``settings``, com e sem a fila de escrita.
+    """
+    opcoes = dict(connection.settings_dict['OPTIONS'])
+    saida.write(f"{linhas} threads, {repeticoes} s por rodada")
+    saida.write(f"{'configuração':<14}  {'agendados/s':>11}  {'tentativas/s':>12}  {'conflitos':>9}  {'em dobro':>8}")
+    for nome, usar_fila in (('perfil', False), ('perfil + fila', True)):
+        agendados, tentativas, conflitos, em_dobro = em_banco_de_arquivo(
+            opcoes, usar_fila, _disputa_de_horarios, linhas, repeticoes
+        )
+        saida.write(
+            f"{nome:<14}  {agendados / repeticoes:>11.1f}  {tentativas / repeticoes:>12.1f}  {conflitos:>9}  {em_dobro:>8}"
+        )
+
+
+def _disputa_de_horarios(threads, duracao):
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    servico = TratamentoPodologico.objects.create(nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico')
+    profissionais = []
+    for indice in range(4):
+        profissional = ProfissionalDePodologia.objects.create(
+            nome=f'Profissional {indice}', especializacao='-', email='prof@example.com', especialidade='-', aprovado=True
+        )
+        profissional.disponibilidade.add(*(
+            Disponibilidade.objects.create(dia=dia, horario_inicio=time_(8), horario_fim=time_(18))
+            for dia, _ in Disponibilidade.DIAS_DA_SEMANA
+        ))
+        profissionais.append(profissional.pk)
+    # Dias próximos a partir de amanhã: 4 profissionais x 30 dias x 40 horários de 15 min.
+    dias = [date.today() + timedelta(days=deslocamento) for deslocamento in range(1, 31)]
+    horarios = [time_(8 + minutos // 60, minutos % 60) for minutos in range(0, 600, 15)]
+    connections.close_all()
+
+    contagem = {'agendados': 0, 'tentativas': 0, 'conflitos': 0}
+    trava = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def recepcionista(numero):
+        aleatorio = random.Random(numero)
+        try:
+            while time.perf_counter() < fim:
+                try:
+                    reserva = escrita.executar(
+                        reservas.reservar, aleatorio.choice(profissionais), usuario.pk,
+                        aleatorio.choice(dias), aleatorio.choice(horarios), [servico.pk],
+                    )
+                    escrita.executar(reservas.confirmar, reserva.pk)
+                    resultado = 'agendados'
+                except reservas.HorarioIndisponivel:
+                    resultado = 'conflitos'
+                with trava:
+                    contagem['tentativas'] += 1
+                    contagem[resultado] += 1
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(recepcionista, range(threads)))
+
+    em_dobro = 0
+    ativos = Agendamento.objects.ativos().order_by('profissional_id', 'data', 'horario_inicio')
+    anterior = None
+    for chave in ativos.values_list('profissional_id', 'data', 'horario_inicio'):
+        minutos = chave[2].hour * 60 + chave[2].minute
+        if anterior and anterior[:2] == chave[:2] and minutos < anterior[2] + servico.duracao:
+            em_dobro += 1
+        anterior = (*chave[:2], minutos)
+    return contagem['agendados'], contagem['tentativas'], contagem['conflitos'], em_dobro
@@ -0,0 +1,74 @@
+"""
+Busca textual de profissionais com SQLite FTS5.
+
+A tabela virtual ``core_profissional_busca`` indexa nome, especialidade,
+especialização e bairro de ``ProfissionalDePodologia`` (conteúdo externo) e é
+mantida em sincronia por triggers criados na migração
+``0006_busca_profissionais``. O tokenizador ``unicode61 remove_diacritics 2``
+torna a busca indiferente a acentos e maiúsculas ("sao jose" encontra
+"São José"), e cada termo casa também como prefixo ("infant" encontra
+"infantil"). Os resultados são ordenados por BM25, com peso maior para o nome.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+TABELA = 'core_profissional_busca'
+
+# Pesos do BM25 na ordem das colunas da tabela virtual.
+PESOS = {'nome': 10.0, 'especialidade': 2.0, 'especializacao': 5.0, 'bairro': 3.0}
+
+LIMITE_PADRAO = 20
+
+_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+
+def consulta_fts(texto):
+    """
+    Converte o texto digitado em uma expressão MATCH em que todos os termos
+    precisam aparecer, cada um como prefixo. Retorna ``''`` se não houver termos.
+    """
+    return ' AND '.join(f'"{termo}"*' for termo in _PALAVRA.findall(texto))
+
+
+def buscar_ids(texto, limite=LIMITE_PADRAO, apenas_aprovados=True):
+    """
+    Ids dos profissionais que casam com ``texto``, do mais ao menos relevante.
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    pesos = ', '.join(str(peso) for peso in PESOS.values())
+    filtro = 'AND p.aprovado' if apenas_aprovados else ''
+    sql = f'''
+        SELECT p.id
+        FROM {TABELA} AS b
+        JOIN core_profissionaldepodologia AS p ON p.id = b.rowid
+        WHERE {TABELA} MATCH %s {filtro}
+        ORDER BY bm25({TABELA}, {pesos})
+        LIMIT %s
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [consulta, limite])
+        return [linha[0] for linha in cursor.fetchall()]
+
+
+def buscar(queryset, texto, limite=LIMITE_PADRAO, apenas_aprovados=True):
+    """
+    Objetos de ``queryset`` que casam com ``texto``, na ordem de relevância.
+    """
+    ids = buscar_ids(texto, limite, apenas_aprovados)
+    por_id = queryset.in_bulk(ids)
+    return [por_id[pk] for pk in ids if pk in por_id]
+
+
+def filtrar(queryset, texto):
+    """
+    Restringe ``queryset`` aos profissionais que casam com ``texto``, sem
+    ordenar por relevância (usado na busca do admin).
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH %s', [consulta]))
@@ -0,0 +1,91 @@
+"""
+Cache das respostas dos endpoints de catálogo (tratamentos e profissionais),
+que mudam pouco e são lidos a cada abertura do aplicativo.
+
+Cada catálogo tem uma versão guardada no cache (``catalogo:versao:<nome>``),
+trocada por ``invalidar()`` sempre que um dado exibido muda (ver
+``core.signals``). A versão entra na chave das respostas e no ETag, então:
+
+- ``If-None-Match`` com o ETag atual recebe 304 sem consultar o banco;
+- uma repetição da mesma URL devolve o corpo já renderizado (com os
+  cabeçalhos ``CABECALHOS`` da resposta original), sem banco e sem
+  serializer. A URL entra na chave com esquema e host, porque o corpo traz
+  URLs absolutas (as fotos dos profissionais);
+- após uma escrita, as entradas antigas simplesmente deixam de ser usadas e
+  expiram sozinhas.
+
+A versão é um token aleatório, e não um contador, para que a perda da chave
+(por expiração ou descarte do cache) nunca faça uma versão antiga voltar.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags
+
+CATALOGOS = ('tratamentos', 'profissionais')
+
+# As entradas só deixam de valer pela troca de versão; o prazo só limita o lixo.
+TEMPO = 24 * 60 * 60
+
+# Cabeçalhos definidos pelo DRF que acompanham o corpo guardado.
+CABECALHOS = ('Content-Type', 'Vary', 'Allow')
+
+
+def _chave_da_versao(nome):
+    return f'catalogo:versao:{nome}'
+
+
+def versao(nome):
+    chave = _chave_da_versao(nome)
+    atual = cache.get(chave)
+    if atual is None:
+        cache.add(chave, uuid.uuid4().hex, None)
+        atual = cache.get(chave)
+    return atual
+
+
+def invalidar(nome):
+    """
+    Troca a versão do catálogo agora e de novo após o commit, para que uma
+    leitura feita durante a transação não fique em cache com a versão nova.
+    """
+    def trocar():
+        cache.set(_chave_da_versao(nome), uuid.uuid4().hex, None)
+    trocar()
+    transaction.on_commit(trocar)
+
+
+def responder(nome, request, gerar):
+    """
+    Responde ``request`` a partir do cache do catálogo ``nome``; em caso de
+    falta, chama ``gerar()`` (que devolve a ``Response`` do DRF) e guarda o
+    corpo renderizado com os seus cabeçalhos.
+    """
+    atual = versao(nome)
+    variacao = f"{request.build_absolute_uri()}|{request.META.get('HTTP_ACCEPT', '')}"
+    resumo = hashlib.sha256(variacao.encode()).hexdigest()[:32]
+    etag = f'"{atual}.{resumo}"'
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        resposta = HttpResponseNotModified()
+        resposta['ETag'] = etag
+        return resposta
+
+    chave = f'catalogo:{nome}:{atual}:{resumo}'
+    em_cache = cache.get(chave)
+    if em_cache is not None:
+        conteudo, cabecalhos = em_cache
+        resposta = HttpResponse(conteudo, headers=cabecalhos)
+        resposta['ETag'] = etag
+        return resposta
+
+    resposta = gerar()
+    if resposta.status_code == 200:
+        resposta['ETag'] = etag
+        resposta.add_post_render_callback(lambda renderizada: cache.set(chave, (
+            renderizada.content,
+            {cabecalho: renderizada[cabecalho] for cabecalho in CABECALHOS if renderizada.has_header(cabecalho)},
+        ), TEMPO))
+    return resposta
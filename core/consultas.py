@@ -0,0 +1,63 @@
+"""
+Montagem de querysets a partir da árvore de serializers.
+
+Percorre os campos do serializer e aplica ``select_related`` nas relações
+aninhadas de valor único e ``prefetch_related`` (com ``Prefetch`` já
+otimizado) nas relações ``many=True``, de modo que a serialização de uma
+listagem custe um número fixo de consultas. Com um serializer instanciado com
+a requisição, vale a seleção de ``?fields=``/``?expand=`` (ver
+``CamposDinamicosMixin``): relações que voltam só como id não geram JOIN.
+
+Um campo calculado a partir de uma relação declara ``prefetch_necessario``
+com o caminho dela. Na raiz esses valores vêm anotados pela view, então o
+prefetch só é feito nos níveis aninhados.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _serializer(serializer_class_ou_instancia):
+    if isinstance(serializer_class_ou_instancia, serializers.BaseSerializer):
+        return serializer_class_ou_instancia
+    return serializer_class_ou_instancia()
+
+
+def _relacoes(serializer, model, prefixo, select, prefetch):
+    for campo in serializer.fields.values():
+        if campo.write_only or campo.source == '*' or '.' in campo.source:
+            continue
+        dependencia = getattr(campo, 'prefetch_necessario', None)
+        if dependencia and prefixo:
+            prefetch.setdefault(prefixo + dependencia, prefixo + dependencia)
+        try:
+            campo_modelo = model._meta.get_field(campo.source)
+        except FieldDoesNotExist:
+            continue
+        if not campo_modelo.is_relation:
+            continue
+        caminho = prefixo + campo.source
+
+        if isinstance(campo, serializers.ListSerializer) and isinstance(campo.child, serializers.ModelSerializer):
+            filho = campo.child
+            queryset = otimizar_queryset(filho.Meta.model._default_manager.all(), filho)
+            prefetch[caminho] = Prefetch(caminho, queryset=queryset)
+        elif isinstance(campo, serializers.ManyRelatedField):
+            prefetch.setdefault(caminho, caminho)
+        elif isinstance(campo, serializers.ModelSerializer):
+            select.append(caminho)
+            _relacoes(campo, campo.Meta.model, caminho + '__', select, prefetch)
+
+
+def otimizar_queryset(queryset, serializer):
+    """
+    Retorna ``queryset`` com os ``select_related``/``prefetch_related``
+    necessários para serializar seus objetos com ``serializer``.
+    """
+    select, prefetch = [], {}
+    _relacoes(_serializer(serializer), queryset.model, '', select, prefetch)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch.values())
+    return queryset
@@ -0,0 +1,194 @@
+"""
+Gerador de uma base sintética e reproduzível para testes de escala.
+
+``gerar()`` cria clientes, profissionais com janelas de ``Disponibilidade``,
+tratamentos, anos de agendamentos com seus serviços e feedbacks de parte dos
+atendimentos concluídos. A mesma ``semente`` produz sempre os mesmos dados.
+
+Tudo é inserido com ``bulk_create`` em lotes de ``lote`` linhas, uma
+transação por lote, sem passar por ``save()`` nem pelos sinais. Por isso, no
+final, o estado derivado é refeito de uma vez: coordenadas dos profissionais
+(``core.geolocalizacao``), resumo das avaliações (``core.avaliacoes``),
+estatísticas diárias (``core.estatisticas``) e versões do cache do catálogo
+(``core.catalogo``). O índice de busca (FTS5) é mantido pelos triggers do
+próprio banco.
+"""
+import random
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import avaliacoes, catalogo, estatisticas, geolocalizacao
+from .models import (
+    Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback
+)
+
+LOTE = 5_000
+
+NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+    'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória', 'Yuri',
+]
+SOBRENOMES = [
+    'Almeida', 'Barbosa', 'Cardoso', 'Costa', 'Ferreira', 'Gomes', 'Lima', 'Martins', 'Oliveira', 'Pereira',
+    'Ribeiro', 'Rocha', 'Santos', 'Silva', 'Souza',
+]
+BAIRROS = [
+    'Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Santa Cruz', 'São José', 'Planalto', 'Industrial',
+    'Cidade Alta', 'Morada do Sol',
+]
+ESPECIALIZACOES = ['Podologia clínica', 'Podologia esportiva', 'Podologia infantil', 'Podogeriatria', 'Pé diabético']
+TRATAMENTOS = [
+    ('Avaliação podológica', 'Preventivo'), ('Onicocriptose', 'Clínico'), ('Órtese ungueal', 'Clínico'),
+    ('Tratamento de calosidades', 'Clínico'), ('Podoprofilaxia', 'Preventivo'), ('Laserterapia', 'Reabilitação'),
+    ('Spa dos pés', 'Estético'), ('Reflexologia', 'Reabilitação'), ('Micose de unhas', 'Clínico'),
+    ('Verruga plantar', 'Clínico'),
+]
+COMENTARIOS = ['Ótimo atendimento.', 'Muito atenciosa.', 'Pontual e cuidadoso.', 'Resolveu meu problema.', None, None]
+
+# Janelas semanais da clínica; cada profissional atende em algumas delas.
+JANELAS = [(time(8), time(12)), (time(13), time(18))]
+DIAS_UTEIS = [dia for dia, _ in Disponibilidade.DIAS_DA_SEMANA if dia != 'domingo']
+HORARIOS = [time(hora, minuto) for hora in range(8, 18) if hora != 12 for minuto in (0, 30)]
+NOTAS = [1, 2, 3, 4, 5]
+PESOS_DAS_NOTAS = [2, 3, 10, 35, 50]
+
+
+@contextmanager
+def _sem_auto_now_add(modelo, campo):
+    """
+    Permite gravar datas passadas em um campo ``auto_now_add`` (o
+    ``bulk_create`` sobrescreveria o valor com o instante atual).
+    """
+    field = modelo._meta.get_field(campo)
+    original, field.auto_now_add = field.auto_now_add, False
+    try:
+        yield
+    finally:
+        field.auto_now_add = original
+
+
+def _nome(aleatorio):
+    return f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}'
+
+
+def _em_lotes(total, lote):
+    for inicio in range(0, total, lote):
+        yield range(inicio, min(inicio + lote, total))
+
+
+def _status(data, hoje, aleatorio):
+    if data < hoje:
+        return aleatorio.choices(['concluido', 'cancelado', 'confirmado'], weights=[80, 15, 5])[0]
+    return aleatorio.choices(['pendente', 'confirmado', 'cancelado'], weights=[55, 40, 5])[0]
+
+
+def gerar(usuarios=10_000, profissionais=50, tratamentos=20, agendamentos=100_000, anos=3,
+          proporcao_de_feedbacks=0.4, semente=42, lote=LOTE, hoje=None, saida=None):
+    """
+    Gera a base e retorna quantas linhas de cada modelo foram criadas. Os
+    agendamentos se espalham pelos ``anos`` anteriores a ``hoje`` e pelos 30
+    dias seguintes.
+    """
+    aleatorio = random.Random(semente)
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=365 * anos)
+    dias = (hoje + timedelta(days=30) - inicio).days
+
+    def informar(mensagem):
+        if saida is not None:
+            saida.write(mensagem)
+
+    with transaction.atomic():
+        disponibilidades = Disponibilidade.objects.bulk_create([
+            Disponibilidade(dia=dia, horario_inicio=horario_inicio, horario_fim=horario_fim)
+            for dia in DIAS_UTEIS for horario_inicio, horario_fim in JANELAS
+        ])
+        servicos = TratamentoPodologico.objects.bulk_create([
+            TratamentoPodologico(
+                nome=f'{TRATAMENTOS[indice % len(TRATAMENTOS)][0]} {indice // len(TRATAMENTOS) + 1}',
+                descricao='Tratamento gerado para testes de escala.',
+                duracao=aleatorio.choice([15, 30, 45, 60, 90]),
+                preco=Decimal(aleatorio.randrange(50, 400)),
+                tipo=TRATAMENTOS[indice % len(TRATAMENTOS)][1],
+            )
+            for indice in range(tratamentos)
+        ])
+        equipe = ProfissionalDePodologia.objects.bulk_create([
+            ProfissionalDePodologia(
+                nome=_nome(aleatorio), especializacao=aleatorio.choice(ESPECIALIZACOES),
+                email=f'profissional{indice}@example.com', especialidade=aleatorio.choice(ESPECIALIZACOES),
+                bairro=aleatorio.choice(BAIRROS), aprovado=aleatorio.random() < 0.9,
+            )
+            for indice in range(profissionais)
+        ], batch_size=lote)
+        Janela = ProfissionalDePodologia.disponibilidade.through
+        Janela.objects.bulk_create([
+            Janela(profissionaldepodologia_id=profissional.pk, disponibilidade_id=disponibilidade.pk)
+            for profissional in equipe
+            for disponibilidade in aleatorio.sample(disponibilidades, aleatorio.randint(4, len(disponibilidades)))
+        ], batch_size=lote)
+    informar(f"{len(disponibilidades)} disponibilidades, {len(servicos)} tratamentos, {len(equipe)} profissionais")
+
+    clientes = []
+    for faixa in _em_lotes(usuarios, lote):
+        clientes += Usuario.objects.bulk_create([
+            Usuario(
+                nome=_nome(aleatorio), email=f'cliente{indice}@example.com',
+                data_nasc=hoje - timedelta(days=aleatorio.randrange(2 * 365, 95 * 365)),
+                telefone=f'119{aleatorio.randrange(10**7, 10**8)}',
+            )
+            for indice in faixa
+        ])
+    informar(f"{len(clientes)} clientes")
+    clientes = [cliente.pk for cliente in clientes]
+    equipe = [profissional.pk for profissional in equipe]
+    servicos = [servico.pk for servico in servicos]
+
+    Relacao = Agendamento.servicos.through
+    criados = {'agendamentos': 0, 'servicos': 0, 'feedbacks': 0}
+    with _sem_auto_now_add(Feedback, 'data'):
+        for faixa in _em_lotes(agendamentos, lote):
+            with transaction.atomic():
+                lote_de_agendamentos = Agendamento.objects.bulk_create([
+                    Agendamento(
+                        usuario_id=aleatorio.choice(clientes), profissional_id=aleatorio.choice(equipe),
+                        data=(data := inicio + timedelta(days=aleatorio.randrange(dias))),
+                        horario_inicio=aleatorio.choice(HORARIOS), status=_status(data, hoje, aleatorio),
+                    )
+                    for _ in faixa
+                ])
+                relacoes = [
+                    Relacao(agendamento_id=agendamento.pk, tratamentopodologico_id=servico)
+                    for agendamento in lote_de_agendamentos
+                    for servico in aleatorio.sample(servicos, min(len(servicos), aleatorio.choice([1, 1, 2, 3])))
+                ]
+                Relacao.objects.bulk_create(relacoes)
+                feedbacks = Feedback.objects.bulk_create([
+                    Feedback(
+                        usuario_id=agendamento.usuario_id, agendamento_id=agendamento.pk,
+                        nota=aleatorio.choices(NOTAS, weights=PESOS_DAS_NOTAS)[0],
+                        comentario=aleatorio.choice(COMENTARIOS),
+                        data=timezone.make_aware(datetime.combine(agendamento.data + timedelta(days=1), time(20))),
+                    )
+                    for agendamento in lote_de_agendamentos
+                    if agendamento.status == 'concluido' and aleatorio.random() < proporcao_de_feedbacks
+                ])
+            criados['agendamentos'] += len(lote_de_agendamentos)
+            criados['servicos'] += len(relacoes)
+            criados['feedbacks'] += len(feedbacks)
+            informar(f"{criados['agendamentos']} agendamentos")
+
+    # bulk_create não dispara sinais: o estado derivado é refeito aqui.
+    geolocalizacao.preencher()
+    avaliacoes.reconstruir()
+    estatisticas.reconstruir()
+    for nome in catalogo.CATALOGOS:
+        catalogo.invalidar(nome)
+    return {
+        'usuarios': len(clientes), 'profissionais': len(equipe), 'tratamentos': len(servicos),
+        'disponibilidades': len(disponibilidades), **criados,
+    }
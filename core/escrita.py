@@ -0,0 +1,112 @@
+"""
+Fila de escrita em processo para o SQLite.
+
+O SQLite aceita um único escritor por vez. Com várias threads gravando, as
+que não conseguem o lock ficam no busy handler, que dorme e tenta de novo em
+intervalos crescentes; sob carga isso vira latência alta e, esgotado o
+``timeout``, "database is locked". Aqui as escritas do processo são enviadas a
+uma única thread escritora, que as executa em ordem de chegada e agrupa as
+que estiverem esperando em uma mesma transação (cada uma em seu savepoint,
+para que o erro de uma não desfaça as outras). Quem chamou espera o commit e
+recebe o resultado ou a exceção da sua função.
+
+Só vale com ``settings.SQLITE_FILA_DE_ESCRITA`` e banco SQLite. Dentro de uma
+transação já aberta (``atomic``) a função roda na própria thread, porque a
+thread escritora usa outra conexão e não enxergaria o que ainda não foi
+gravado.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+LOTE = 64
+
+
+class FilaDeEscrita:
+
+    def __init__(self, lote=LOTE):
+        self.lote = lote
+        self._fila = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submeter(self, funcao, *args, **kwargs):
+        """
+        Enfileira ``funcao(*args, **kwargs)`` e retorna um ``Future`` resolvido
+        após o commit.
+        """
+        futuro = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='fila-de-escrita', daemon=True)
+                self._thread.start()
+            self._fila.put((futuro, funcao, args, kwargs))
+        return futuro
+
+    def encerrar(self):
+        """
+        Processa o que estiver na fila, encerra a thread escritora e fecha sua conexão.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._fila.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _executar(self):
+        try:
+            while True:
+                tarefas = [self._fila.get()]
+                while len(tarefas) < self.lote:
+                    try:
+                        tarefas.append(self._fila.get_nowait())
+                    except queue.Empty:
+                        break
+                self._processar([tarefa for tarefa in tarefas if tarefa is not None])
+                if None in tarefas:
+                    return
+        finally:
+            connections.close_all()
+
+    def _processar(self, tarefas):
+        tarefas = [tarefa for tarefa in tarefas if tarefa[0].set_running_or_notify_cancel()]
+        resultados = []
+        try:
+            with transaction.atomic():
+                for futuro, funcao, args, kwargs in tarefas:
+                    try:
+                        with transaction.atomic():
+                            resultados.append((futuro, funcao(*args, **kwargs), None))
+                    except Exception as erro:
+                        resultados.append((futuro, None, erro))
+        except Exception as erro:
+            # Falha no commit: nada do lote foi gravado.
+            for futuro, *_ in tarefas:
+                futuro.set_exception(erro)
+            return
+        for futuro, resultado, erro in resultados:
+            if erro is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(erro)
+
+
+fila = FilaDeEscrita()
+
+
+def ativa():
+    return connection.vendor == 'sqlite' and getattr(settings, 'SQLITE_FILA_DE_ESCRITA', False)
+
+
+def executar(funcao, *args, **kwargs):
+    """
+    Executa ``funcao`` pela fila de escrita (ou diretamente, se a fila não se
+    aplica) e retorna o seu resultado depois de gravado.
+    """
+    if not ativa() or connection.in_atomic_block:
+        return funcao(*args, **kwargs)
+    return fila.submeter(funcao, *args, **kwargs).result()
@@ -0,0 +1,205 @@
+"""
+Estatísticas diárias da clínica (tabela ``EstatisticaDiaria``).
+
+Para cada dia há uma linha por profissional e uma linha da clínica toda
+(``profissional`` nulo), com a quantidade de agendamentos e a receita (soma
+do preço dos serviços) por status. O dashboard lê só essa tabela, então um
+gráfico de um ano custa no máximo 365 linhas.
+
+As linhas são atualizadas de forma incremental, com ``UPDATE ... SET x = x +
+delta`` na mesma transação da alteração do agendamento:
+
+- criação, edição e exclusão de agendamentos e mudanças em ``servicos``
+  chegam pelos sinais de ``core.signals``;
+- ``AgendamentoQuerySet.transicionar`` (UPDATE em lote, sem sinais) chama
+  ``mover_em_lote`` antes do UPDATE;
+- a criação em lote de ``core.importacao`` (``bulk_create``, sem sinais)
+  chama ``registrar_em_lote`` com os totais agrupados;
+- mudar o preço de um tratamento recalcula os dias em que ele aparece.
+
+Os agendamentos arquivados (``core.arquivamento``) continuam contando, com a
+receita congelada no arquivamento; arquivar não altera a tabela.
+
+``manage.py recalcular_estatisticas`` reconstrói a tabela a partir dos
+agendamentos (carga inicial e correção de divergências).
+"""
+from collections import defaultdict
+from decimal import Decimal
+from itertools import chain
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Agendamento, AgendamentoArquivado, EstatisticaDiaria
+
+STATUS = [status for status, _ in Agendamento.STATUS_CHOICES]
+
+CAMPOS = [f'total_{status}' for status in STATUS] + [f'receita_{status}' for status in STATUS]
+
+ZERO = Decimal('0.00')
+
+
+def receita_dos_agendamentos(ids):
+    """
+    ``{agendamento_id: receita}`` pela soma atual do preço dos serviços.
+    """
+    Relacao = Agendamento.servicos.through
+    linhas = Relacao.objects.filter(agendamento_id__in=ids).values('agendamento_id').annotate(
+        receita=Sum('tratamentopodologico__preco')
+    ).order_by().values_list('agendamento_id', 'receita')
+    return dict(linhas)
+
+
+def _somar(data, profissional_id, deltas):
+    """
+    Soma ``deltas`` (``{campo: delta}``) à linha do dia, criando-a se não existir.
+    """
+    linhas = EstatisticaDiaria.objects.filter(data=data, profissional_id=profissional_id)
+    incrementos = {campo: F(campo) + delta for campo, delta in deltas.items()}
+    if linhas.update(**incrementos):
+        return
+    try:
+        with transaction.atomic():
+            EstatisticaDiaria.objects.create(data=data, profissional_id=profissional_id, **deltas)
+    except IntegrityError:
+        # Outra transação criou a linha entre o UPDATE e o INSERT.
+        linhas.update(**incrementos)
+
+
+def registrar(data, profissional_id, status, quantidade, receita):
+    """
+    Soma ``quantidade`` agendamentos e ``receita`` ao status do dia, na linha
+    do profissional e na da clínica.
+    """
+    if not quantidade and not receita:
+        return
+    for profissional in (profissional_id, None):
+        _somar(data, profissional, {f'total_{status}': quantidade, f'receita_{status}': receita})
+
+
+def registrar_em_lote(grupos):
+    """
+    ``registrar()`` para muitos grupos de uma vez, com
+    ``grupos = {(data, profissional_id, status): (quantidade, receita)}``:
+    as linhas que faltam entram em um único INSERT e as existentes recebem um
+    UPDATE cada, com todos os status do dia juntos. Se outra transação criar
+    alguma das linhas que faltavam, o INSERT é desfeito e cada uma delas passa
+    pelo caminho linha a linha de ``registrar()``.
+    """
+    deltas = defaultdict(dict)
+    for (data, profissional_id, status), (quantidade, receita) in grupos.items():
+        for profissional in (profissional_id, None):
+            linha = deltas[(data, profissional)]
+            linha[f'total_{status}'] = linha.get(f'total_{status}', 0) + quantidade
+            linha[f'receita_{status}'] = linha.get(f'receita_{status}', ZERO) + receita
+    if not deltas:
+        return
+    datas = {data for data, _ in deltas}
+    existentes = set(EstatisticaDiaria.objects.filter(data__range=(min(datas), max(datas))).values_list(
+        'data', 'profissional_id'
+    ))
+    novas = [chave for chave in deltas if chave not in existentes]
+    try:
+        with transaction.atomic():
+            EstatisticaDiaria.objects.bulk_create([
+                EstatisticaDiaria(data=data, profissional_id=profissional, **deltas[(data, profissional)])
+                for data, profissional in novas
+            ])
+    except IntegrityError:
+        # Outra transação criou alguma das linhas e o INSERT inteiro foi desfeito.
+        for chave in novas:
+            _somar(*chave, deltas[chave])
+    for chave in existentes & deltas.keys():
+        EstatisticaDiaria.objects.filter(data=chave[0], profissional_id=chave[1]).update(**{
+            campo: F(campo) + delta for campo, delta in deltas[chave].items()
+        })
+
+
+def mover_em_lote(queryset, status):
+    """
+    Move, nas estatísticas, os agendamentos de ``queryset`` do status atual
+    para ``status``. Deve rodar na transação do UPDATE, antes dele.
+    """
+    grupos = queryset.exclude(status=status).order_by().values('data', 'profissional_id', 'status').annotate(
+        quantidade=Count('id', distinct=True),
+        receita=Coalesce(Sum('servicos__preco'), ZERO),
+    )
+    for grupo in grupos:
+        registrar(grupo['data'], grupo['profissional_id'], grupo['status'], -grupo['quantidade'], -grupo['receita'])
+        registrar(grupo['data'], grupo['profissional_id'], status, grupo['quantidade'], grupo['receita'])
+
+
+def calcular(inicio=None, fim=None):
+    """
+    Calcula as estatísticas a partir dos agendamentos. Retorna
+    ``{(data, profissional_id ou None): {campo: valor}}``.
+    """
+    periodo = {}
+    if inicio:
+        periodo['data__gte'] = inicio
+    if fim:
+        periodo['data__lte'] = fim
+    grupos = Agendamento.objects.filter(**periodo).order_by().values('data', 'profissional_id', 'status').annotate(
+        quantidade=Count('id', distinct=True),
+        receita=Coalesce(Sum('servicos__preco'), ZERO),
+    )
+    # Os arquivados entram com a receita congelada no arquivamento.
+    arquivados = AgendamentoArquivado.objects.filter(**periodo).order_by().values(
+        'data', 'profissional_id', 'status'
+    ).annotate(quantidade=Count('id'), receita=Coalesce(Sum('preco_total'), ZERO))
+    resultado = defaultdict(vazia)
+    for grupo in chain(grupos, arquivados):
+        for profissional in (grupo['profissional_id'], None):
+            linha = resultado[(grupo['data'], profissional)]
+            linha[f'total_{grupo["status"]}'] += grupo['quantidade']
+            linha[f'receita_{grupo["status"]}'] += grupo['receita']
+    return dict(resultado)
+
+
+def vazia():
+    return {f'total_{status}': 0 for status in STATUS} | {f'receita_{status}': ZERO for status in STATUS}
+
+
+def _gravadas(inicio=None, fim=None):
+    linhas = EstatisticaDiaria.objects.all()
+    if inicio:
+        linhas = linhas.filter(data__gte=inicio)
+    if fim:
+        linhas = linhas.filter(data__lte=fim)
+    return linhas
+
+
+def divergencias(inicio=None, fim=None):
+    """
+    Compara a tabela com o recalculado e retorna
+    ``[((data, profissional_id), {campo: (gravado, esperado)}), ...]``.
+    Linhas zeradas equivalem a linhas ausentes.
+    """
+    esperadas = calcular(inicio, fim)
+    gravadas = {
+        (linha['data'], linha['profissional_id']): {campo: linha[campo] for campo in CAMPOS}
+        for linha in _gravadas(inicio, fim).values('data', 'profissional_id', *CAMPOS)
+    }
+    resultado = []
+    for chave in sorted(esperadas.keys() | gravadas.keys(), key=lambda chave: (chave[0], chave[1] or 0)):
+        gravada, esperada = gravadas.get(chave, vazia()), esperadas.get(chave, vazia())
+        diferencas = {campo: (gravada[campo], esperada[campo]) for campo in CAMPOS if gravada[campo] != esperada[campo]}
+        if diferencas:
+            resultado.append((chave, diferencas))
+    return resultado
+
+
+def reconstruir(inicio=None, fim=None, lote=2000):
+    """
+    Regrava as estatísticas do período a partir dos agendamentos.
+    Retorna quantas linhas foram gravadas.
+    """
+    linhas = [
+        EstatisticaDiaria(data=data, profissional_id=profissional, **valores)
+        for (data, profissional), valores in calcular(inicio, fim).items()
+    ]
+    with transaction.atomic():
+        _gravadas(inicio, fim).delete()
+        EstatisticaDiaria.objects.bulk_create(linhas, batch_size=lote)
+    return len(linhas)
@@ -0,0 +1,134 @@
+"""
+Exportação do histórico de agendamentos em CSV ou JSONL.
+
+Os agendamentos são lidos de um único cursor com ``iterator(chunk_size=...)``,
+os serviços (M2M) de cada lote são buscados em uma consulta e as linhas são
+geradas uma a uma. Assim o consumo de memória não depende do tamanho do
+histórico, tanto no endpoint (``StreamingHttpResponse``) quanto no comando
+``exportar_agendamentos``.
+
+Os agendamentos arquivados (``core.arquivamento``) do período entram na mesma
+exportação, intercalados na ordem ``(data, id)``, com o ``preco_total``
+congelado no arquivamento e os serviços da tabela arquivada.
+"""
+import csv
+import json
+from collections import defaultdict
+from decimal import Decimal
+from heapq import merge
+from itertools import islice
+
+from .models import Agendamento, AgendamentoArquivado
+
+FORMATOS = ('csv', 'jsonl')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+COLUNAS = [
+    'id', 'data', 'horario_inicio', 'status', 'cliente_id', 'cliente_nome', 'cliente_cpf',
+    'profissional_id', 'profissional_nome', 'servicos', 'preco_total',
+]
+
+# Campos lidos do banco, na ordem das primeiras colunas acima.
+CAMPOS = [
+    'id', 'data', 'horario_inicio', 'status', 'usuario_id', 'usuario__nome', 'usuario__cpf',
+    'profissional_id', 'profissional__nome',
+]
+
+LOTE = 2000
+
+
+def agendamentos_para_exportar(inicio=None, fim=None, status=None, modelo=Agendamento):
+    """
+    Queryset dos agendamentos do período, na ordem da exportação. Com
+    ``modelo=AgendamentoArquivado``, os arquivados.
+    """
+    queryset = modelo.objects.order_by('data', 'id')
+    if inicio:
+        queryset = queryset.filter(data__gte=inicio)
+    if fim:
+        queryset = queryset.filter(data__lte=fim)
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def _servicos_do_lote(modelo, ids):
+    """
+    Serviços de um lote de agendamentos, em uma única consulta à tabela M2M.
+    """
+    servicos = defaultdict(list)
+    chave = f'{modelo._meta.model_name}_id'
+    linhas = modelo.servicos.through.objects.filter(**{f'{chave}__in': ids}).values_list(
+        chave, 'tratamentopodologico_id', 'tratamentopodologico__nome', 'tratamentopodologico__preco'
+    )
+    for agendamento_id, servico_id, nome, preco in linhas:
+        servicos[agendamento_id].append({'id': servico_id, 'nome': nome, 'preco': preco})
+    return servicos
+
+
+def registros(queryset, lote=LOTE):
+    """
+    Gera um dicionário por agendamento. As linhas vêm de um único cursor,
+    lidas em lotes de ``lote``, e os serviços são buscados uma vez por lote.
+    """
+    arquivado = queryset.model is AgendamentoArquivado
+    # O arquivado guarda o total do momento do arquivamento; o atual soma os preços dos serviços.
+    linhas = queryset.values_list(*CAMPOS, *(['preco_total'] if arquivado else [])).iterator(chunk_size=lote)
+    for bloco in iter(lambda: list(islice(linhas, lote)), []):
+        servicos = _servicos_do_lote(queryset.model, [linha[0] for linha in bloco])
+        for linha in bloco:
+            registro = dict(zip(COLUNAS, linha))
+            itens = servicos.get(registro['id'], [])
+            registro['data'] = registro['data'].isoformat()
+            if registro['horario_inicio'] is not None:
+                registro['horario_inicio'] = registro['horario_inicio'].isoformat()
+            preco_total = linha[-1] if arquivado else sum((item['preco'] for item in itens), Decimal('0.00'))
+            registro['preco_total'] = str(preco_total)
+            registro['servicos'] = [dict(item, preco=str(item['preco'])) for item in itens]
+            yield registro
+
+
+def historico(queryset, arquivados=None, lote=LOTE):
+    """
+    ``registros()`` de ``queryset`` e dos ``arquivados``, intercalados na ordem ``(data, id)``.
+    """
+    if arquivados is None:
+        return registros(queryset, lote)
+    return merge(registros(arquivados, lote), registros(queryset, lote), key=lambda registro: (
+        registro['data'], registro['id']
+    ))
+
+
+class _Eco:
+    """
+    Pseudo-arquivo que devolve o que recebe, para o csv.writer gerar strings.
+    """
+    def write(self, valor):
+        return valor
+
+
+def linhas_csv(queryset, lote=LOTE, arquivados=None):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUNAS)
+    for registro in historico(queryset, arquivados, lote):
+        registro['servicos'] = '; '.join(servico['nome'] for servico in registro['servicos'])
+        yield escritor.writerow([registro[coluna] for coluna in COLUNAS])
+
+
+def linhas_jsonl(queryset, lote=LOTE, arquivados=None):
+    for registro in historico(queryset, arquivados, lote):
+        yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+def exportar(queryset, formato, lote=LOTE, arquivados=None):
+    """
+    Gerador das linhas (``str``) da exportação no ``formato`` pedido, com os
+    agendamentos de ``queryset`` e, se informados, os ``arquivados``.
+    """
+    if formato == 'csv':
+        return linhas_csv(queryset, lote, arquivados)
+    return linhas_jsonl(queryset, lote, arquivados)
@@ -1,17 +1,21 @@
 from django import forms
-from .models import FeedbackResponsavel, RelatorioProgresso, AgendamentoNotificacao
+from .models import Feedback, Agendamento
 
-class FeedbackResponsavelForm(forms.ModelForm):
+class FeedbackForm(forms.ModelForm):
     class Meta:
-        model = FeedbackResponsavel
-        fields = ['usuario', 'conteudo']
+        model = Feedback
+        fields = ['usuario', 'agendamento', 'nota', 'comentario']
 
-class RelatorioProgressoForm(forms.ModelForm):
-    class Meta:
-        model = RelatorioProgresso
-        fields = ['usuario', 'progresso', 'recomendacoes']
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Só agendamentos concluídos ainda sem feedback (além do próprio, na edição), com o
+        # cliente do rótulo na mesma consulta.
+        agendamentos = Agendamento.objects.filter(status='concluido', feedback__isnull=True)
+        if self.instance.agendamento_id:
+            agendamentos = agendamentos | Agendamento.objects.filter(pk=self.instance.agendamento_id)
+        self.fields['agendamento'].queryset = agendamentos.select_related('usuario', 'profissional')
 
-class AgendamentoNotificacaoForm(forms.ModelForm):
+class AgendamentoForm(forms.ModelForm):
     class Meta:
-        model = AgendamentoNotificacao
-        fields = ['usuario', 'data_agendamento', 'data_notificacao']
\ No newline at end of file
+        model = Agendamento
+        fields = ['usuario', 'profissional', 'servicos', 'data', 'horario_inicio']
@@ -0,0 +1,210 @@
+"""
+Localização dos profissionais pelo bairro, sem geocodificação pela rede.
+
+As coordenadas vêm de uma tabela de centróides de bairros distribuída com o
+projeto (``core/dados/bairros.csv``, ou o arquivo de
+``settings.GEOLOCALIZACAO_BAIRROS``). O bairro do profissional é procurado
+pelo nome normalizado (sem acentos, caixa ou espaços extras); sem bairro
+conhecido, vale o primeiro bairro da tabela citado no endereço.
+
+Além de ``latitude``/``longitude``, cada profissional guarda a célula de uma
+grade de ``TAMANHO_DA_CELULA`` graus (``celula_lat``, ``celula_lon``), que é o
+índice espacial: ``proximos()`` lê quadrados crescentes de células ao redor do
+ponto de origem, agrupando os profissionais por ponto (com centróides, muitos
+dividem as mesmas coordenadas), até que os ``k`` mais próximos estejam
+garantidos. Só então lê os ids dos pontos escolhidos, em duas consultas (os
+pontos que entram inteiros e os primeiros do último ponto, o único que pode
+ser cortado), e, de uma vez, os profissionais.
+
+As coordenadas são atualizadas no ``save()`` (ver ``core.signals``); depois de
+``bulk_create``/``update`` ou de trocar a tabela, use ``preencher()`` ou
+``manage.py geolocalizar_profissionais``.
+"""
+import csv
+import math
+import operator
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache, reduce
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .models import ProfissionalDePodologia
+
+ARQUIVO_PADRAO = Path(__file__).resolve().parent / 'dados' / 'bairros.csv'
+TAMANHO_DA_CELULA = 0.02  # graus, cerca de 2,2 km de latitude
+RAIO_DA_TERRA = 6371.0  # km
+KM_POR_GRAU = math.pi * RAIO_DA_TERRA / 180
+RAIO_PADRAO = 50  # km
+LOTE = 5000
+
+
+def normalizar(texto):
+    sem_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(sem_acentos.lower().split())
+
+
+@lru_cache(maxsize=1)
+def bairros():
+    """
+    ``{nome normalizado: (latitude, longitude)}`` da tabela de centróides.
+    """
+    arquivo = getattr(settings, 'GEOLOCALIZACAO_BAIRROS', None) or ARQUIVO_PADRAO
+    with open(arquivo, encoding='utf-8') as entrada:
+        linhas = csv.DictReader(linha for linha in entrada if not linha.startswith('#'))
+        return {normalizar(linha['bairro']): (float(linha['latitude']), float(linha['longitude'])) for linha in linhas}
+
+
+def coordenadas(bairro=None, endereco=None):
+    """
+    ``(latitude, longitude)`` do bairro, ou do bairro citado no endereço; ``None`` se desconhecido.
+    """
+    tabela = bairros()
+    if normalizar(bairro) in tabela:
+        return tabela[normalizar(bairro)]
+    texto = f' {normalizar(endereco)} '
+    # Nomes mais longos primeiro: "Vila Nova" antes de "Nova", se ambos existirem.
+    for nome in sorted(tabela, key=len, reverse=True):
+        if f' {nome} ' in texto:
+            return tabela[nome]
+    return None
+
+
+def celula(latitude, longitude):
+    return math.floor(latitude / TAMANHO_DA_CELULA), math.floor(longitude / TAMANHO_DA_CELULA)
+
+
+def localizacao(bairro=None, endereco=None):
+    """
+    Valores dos campos de localização de um profissional.
+    """
+    ponto = coordenadas(bairro, endereco)
+    if ponto is None:
+        return {'latitude': None, 'longitude': None, 'celula_lat': None, 'celula_lon': None}
+    celula_lat, celula_lon = celula(*ponto)
+    return {'latitude': ponto[0], 'longitude': ponto[1], 'celula_lat': celula_lat, 'celula_lon': celula_lon}
+
+
+def distancia(origem, destino):
+    """
+    Distância em km entre dois pontos ``(latitude, longitude)`` (haversine).
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (*origem, *destino))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_DA_TERRA * math.asin(math.sqrt(min(1.0, a)))
+
+
+def preencher(modelo=ProfissionalDePodologia, lote=LOTE):
+    """
+    Recalcula a localização de todos os profissionais, com um UPDATE por
+    ponto e lote de ids. Retorna quantos ficaram com coordenadas.
+    """
+    por_ponto = defaultdict(list)
+    # Bairro e endereço se repetem muito: cada combinação é resolvida uma vez.
+    resolvidos = {}
+    for pk, bairro, endereco in modelo.objects.order_by().values_list('pk', 'bairro', 'endereco').iterator(LOTE):
+        if (bairro, endereco) not in resolvidos:
+            resolvidos[(bairro, endereco)] = coordenadas(bairro, endereco)
+        por_ponto[resolvidos[(bairro, endereco)]].append(pk)
+    localizados = 0
+    for ponto, ids in por_ponto.items():
+        campos = localizacao() if ponto is None else dict(zip(
+            ('latitude', 'longitude', 'celula_lat', 'celula_lon'), (*ponto, *celula(*ponto))
+        ))
+        for inicio in range(0, len(ids), lote):
+            modelo.objects.filter(pk__in=ids[inicio:inicio + lote]).update(**campos)
+        localizados += len(ids) if ponto is not None else 0
+    return localizados
+
+
+def _pontos(queryset, origem, raio):
+    """
+    ``[(distancia, (latitude, longitude), quantidade)]`` dos profissionais de
+    ``queryset`` nas células a até ``raio`` células da origem.
+    """
+    celula_lat, celula_lon = celula(*origem)
+    linhas = queryset.filter(
+        celula_lat__range=(celula_lat - raio, celula_lat + raio),
+        celula_lon__range=(celula_lon - raio, celula_lon + raio),
+    ).order_by().values_list('latitude', 'longitude').annotate(quantidade=Count('id'))
+    return sorted((distancia(origem, (latitude, longitude)), (latitude, longitude), quantidade)
+                  for latitude, longitude, quantidade in linhas)
+
+
+def _nos_pontos(pontos):
+    """
+    Filtro dos profissionais localizados em algum dos ``pontos``.
+    """
+    # A célula junto com o ponto deixa cada ramo do OR no índice da grade.
+    return reduce(operator.or_, (
+        Q(celula_lat=celula_lat, celula_lon=celula_lon, latitude=latitude, longitude=longitude)
+        for latitude, longitude in pontos for celula_lat, celula_lon in [celula(latitude, longitude)]
+    ))
+
+
+def proximos(queryset, origem, k=10, raio_km=RAIO_PADRAO, dia=None):
+    """
+    Os ``k`` profissionais aprovados de ``queryset`` mais próximos de
+    ``origem`` ``(latitude, longitude)``, a até ``raio_km``, do mais próximo ao
+    mais distante (empates pela avaliação). Com ``dia`` ('segunda', ...), só os
+    que atendem nesse dia da semana. Cada um recebe ``distancia_km``.
+    """
+    candidatos = queryset.filter(aprovado=True, celula_lat__isnull=False)
+    if dia:
+        Janela = ProfissionalDePodologia.disponibilidade.through
+        candidatos = candidatos.filter(Exists(Janela.objects.filter(
+            profissionaldepodologia_id=OuterRef('pk'), disponibilidade__dia=dia
+        )))
+    # Distância mínima até fora do quadrado de r células: r células na direção
+    # mais estreita (a longitude encolhe com o cosseno da latitude).
+    km_por_celula = TAMANHO_DA_CELULA * KM_POR_GRAU * max(math.cos(math.radians(origem[0])), 0.01)
+    limite = math.ceil(raio_km / km_por_celula)
+    # Com raio zero nada fica garantido além da distância zero: começa pela vizinhança.
+    raio = min(1, limite)
+    while True:
+        pontos = [ponto for ponto in _pontos(candidatos, origem, raio) if ponto[0] <= raio_km]
+        garantido = raio * km_por_celula
+        acumulado = 0
+        suficientes = False
+        for posicao, (distancia_km, _, quantidade) in enumerate(pontos):
+            acumulado += quantidade
+            if acumulado >= k:
+                suficientes = distancia_km <= garantido
+                pontos = pontos[:posicao + 1]
+                break
+        if suficientes or raio >= limite:
+            break
+        if acumulado >= k:
+            # Os k já estão no quadrado: o dobro do raio cobre a distância do k-ésimo.
+            raio = min(raio * 2, limite)
+        else:
+            # Poucos por perto: quadruplica o raio (16 vezes a área), ou mais, na proporção da área que falta;
+            # sem ninguém, vai direto ao limite. Assim a expansão leva poucas consultas até o raio máximo.
+            raio = limite if not acumulado else min(max(raio * 4, math.ceil(raio * math.sqrt(k / acumulado))), limite)
+
+    # Só o último ponto pode ter mais profissionais do que as vagas que sobram.
+    ids_por_ponto = defaultdict(list)
+    if pontos:
+        *inteiros, (_, ultimo, _) = pontos
+        if inteiros:
+            linhas = candidatos.filter(_nos_pontos(ponto for _, ponto, _ in inteiros)).order_by(
+                '-avaliacao_media', 'id'
+            ).values_list('latitude', 'longitude', 'pk')
+            for latitude, longitude, pk in linhas:
+                ids_por_ponto[(latitude, longitude)].append(pk)
+        vagas = k - sum(quantidade for _, _, quantidade in inteiros)
+        ids_por_ponto[ultimo] = list(candidatos.filter(_nos_pontos([ultimo])).order_by(
+            '-avaliacao_media', 'id'
+        ).values_list('pk', flat=True)[:vagas])
+    distancias = {}
+    for distancia_km, ponto, _ in pontos:
+        ids = ids_por_ponto[ponto][:k - len(distancias)]
+        distancias.update(dict.fromkeys(ids, round(distancia_km, 2)))
+    por_id = queryset.in_bulk(distancias)
+    resultado = []
+    for pk, distancia_km in distancias.items():
+        por_id[pk].distancia_km = distancia_km
+        resultado.append(por_id[pk])
+    return resultado
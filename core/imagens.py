@@ -0,0 +1,139 @@
+"""
+Variantes reduzidas (miniaturas em WebP) das fotos de usuários e profissionais.
+
+Quando uma foto nova é enviada, ``core.signals`` agenda, após o commit, o
+processamento em um pool de threads, fora da thread da requisição. O worker
+calcula o SHA-256 do arquivo original, gera cada variante de ``VARIANTES``
+(recorte quadrado de tamanho fixo, em WebP) e grava o hash em ``foto_hash``.
+As variantes ficam no storage em ``avatares/variantes/`` com o hash no nome, de
+modo que a mesma imagem enviada duas vezes é processada uma única vez, e o
+serializer monta a URL da variante sem acessar o disco.
+
+O Pillow libera o GIL durante a decodificação, o redimensionamento e a
+codificação, por isso um pool de threads basta. O tamanho do pool vem de
+``settings.IMAGENS_WORKERS``; com ``settings.IMAGENS_SINCRONO`` o processamento
+acontece na própria thread (útil em testes e comandos).
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+
+from . import catalogo
+from .models import ProfissionalDePodologia
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Nome da variante: lado do quadrado, em pixels.
+VARIANTES = {'thumb': 160, 'media': 640}
+
+PASTA = 'avatares/variantes'
+FORMATO = 'WEBP'
+EXTENSAO = 'webp'
+QUALIDADE = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def caminho(foto_hash, variante):
+    return f'{PASTA}/{foto_hash[:2]}/{foto_hash}_{variante}.{EXTENSAO}'
+
+
+def url(foto_hash, variante='thumb'):
+    return default_storage.url(caminho(foto_hash, variante))
+
+
+def hash_do_arquivo(arquivo):
+    sha = hashlib.sha256()
+    for bloco in arquivo.chunks():
+        sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _reduzir(imagem, lado):
+    imagem = ImageOps.exif_transpose(imagem)
+    imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() or 'transparency' in imagem.info else 'RGB')
+    imagem = ImageOps.fit(imagem, (lado, lado), Image.Resampling.LANCZOS)
+    saida = BytesIO()
+    imagem.save(saida, FORMATO, quality=QUALIDADE, method=4)
+    return saida.getvalue()
+
+
+def gerar_variantes(arquivo):
+    """
+    Gera as variantes que ainda não existem no storage para ``arquivo`` (um
+    ``FieldFile``) e retorna o hash do conteúdo.
+    """
+    with arquivo.open('rb'):
+        foto_hash = hash_do_arquivo(arquivo)
+        faltando = [nome for nome in VARIANTES if not default_storage.exists(caminho(foto_hash, nome))]
+        if not faltando:
+            return foto_hash
+        arquivo.seek(0)
+        with Image.open(arquivo) as imagem:
+            # Em JPEG, decodifica já reduzido (1/2, 1/4 ou 1/8), o suficiente para a maior variante.
+            lado = max(VARIANTES[nome] for nome in faltando)
+            imagem.draft('RGB', (lado, lado))
+            imagem.load()
+            for nome in faltando:
+                default_storage.save(caminho(foto_hash, nome), ContentFile(_reduzir(imagem, VARIANTES[nome])))
+    return foto_hash
+
+
+def processar(modelo, pk):
+    """
+    Gera as variantes da foto atual do objeto e grava ``foto_hash``. Se a foto
+    mudou enquanto o processamento acontecia, o resultado é descartado.
+    """
+    objeto = modelo._default_manager.filter(pk=pk).only('foto').first()
+    if objeto is None or not objeto.foto:
+        return None
+    nome = objeto.foto.name
+    try:
+        foto_hash = gerar_variantes(objeto.foto)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception("Não foi possível gerar as variantes de %s %s (%s).", modelo.__name__, pk, nome)
+        return None
+    atualizados = modelo._default_manager.filter(pk=pk, foto=nome).update(foto_hash=foto_hash)
+    if atualizados and modelo is ProfissionalDePodologia:
+        # O UPDATE não dispara sinais; foto_thumb faz parte do catálogo.
+        catalogo.invalidar('profissionais')
+    return foto_hash
+
+
+def _processar_no_worker(modelo, pk):
+    try:
+        processar(modelo, pk)
+    except Exception:
+        logger.exception("Falha ao processar a foto de %s %s.", modelo.__name__, pk)
+    finally:
+        # Cada thread do pool tem a sua conexão; fecha para não deixá-la aberta.
+        connections.close_all()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGENS_WORKERS', 2), thread_name_prefix='imagens'
+            )
+        return _executor
+
+
+def agendar(modelo, pk):
+    """
+    Processa a foto do objeto no pool de workers (ou na hora, com
+    ``settings.IMAGENS_SINCRONO``). Retorna o ``Future`` quando assíncrono.
+    """
+    if getattr(settings, 'IMAGENS_SINCRONO', False):
+        return processar(modelo, pk)
+    return executor().submit(_processar_no_worker, modelo, pk)
@@ -0,0 +1,151 @@
+"""
+Criação de agendamentos em lote (importação da agenda de uma clínica
+parceira, sessões semanais recorrentes).
+
+``criar_agendamentos()`` valida o lote inteiro de uma vez: cada conjunto de
+ids (clientes, profissionais, serviços) é conferido com uma consulta, e os
+conflitos de horário são procurados com uma leitura da agenda dos
+profissionais envolvidos no período do lote (agendamentos ativos e reservas
+retidas), mais os próprios itens do lote entre si. Os itens válidos são
+gravados com um ``bulk_create`` dos agendamentos e outro das linhas da tabela
+de serviços, em uma transação.
+
+O ``bulk_create`` não dispara sinais: as estatísticas diárias recebem os
+totais do lote agrupados por dia, profissional e status, na mesma transação
+(``estatisticas.registrar_em_lote``).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import estatisticas
+from .agenda import INTERVALO_PADRAO, _minutos
+from .models import Agendamento, OcupacaoDeHorario, ProfissionalDePodologia, TratamentoPodologico, Usuario
+
+LIMITE = 10_000
+
+
+def _existentes(modelo, ids):
+    return set(modelo._default_manager.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def _agenda_ocupada(itens, agora):
+    """
+    ``{(profissional_id, data): [(inicio, fim), ...]}`` em minutos, com os
+    agendamentos ativos e as reservas retidas dos profissionais do lote.
+    """
+    pares = {(item['profissional'], item['data']) for item in itens}
+    profissionais = {profissional for profissional, _ in pares}
+    periodo = (min(data for _, data in pares), max(data for _, data in pares))
+    ocupada = defaultdict(list)
+
+    agendamentos = Agendamento.objects.ativos().filter(
+        profissional_id__in=profissionais, data__range=periodo, horario_inicio__isnull=False,
+    ).order_by().values_list('profissional_id', 'data', 'horario_inicio').annotate(
+        duracao=Coalesce(Sum('servicos__duracao'), 0)
+    )
+    for profissional, data, horario_inicio, duracao in agendamentos:
+        if (profissional, data) in pares:
+            inicio = _minutos(horario_inicio)
+            ocupada[(profissional, data)].append((inicio, inicio + max(duracao, INTERVALO_PADRAO)))
+
+    # Reservas retidas ocupam intervalos da grade; as confirmadas já viraram agendamentos.
+    ocupacoes = OcupacaoDeHorario.objects.filter(
+        profissional_id__in=profissionais, data__range=periodo,
+        reserva__status='retida', reserva__expira_em__gte=agora,
+    ).values_list('profissional_id', 'data', 'intervalo')
+    for profissional, data, intervalo in ocupacoes:
+        if (profissional, data) in pares:
+            ocupada[(profissional, data)].append((intervalo * INTERVALO_PADRAO, (intervalo + 1) * INTERVALO_PADRAO))
+    return ocupada
+
+
+def _validar(itens, servicos, verificar_conflitos, agora):
+    """
+    Erros do lote, ``{indice: {campo: [mensagens]}}``. ``servicos`` é
+    ``{id: (duracao, preco)}`` dos serviços existentes.
+    """
+    usuarios = _existentes(Usuario, {item['usuario'] for item in itens})
+    profissionais = _existentes(ProfissionalDePodologia, {item['profissional'] for item in itens})
+
+    erros = defaultdict(dict)
+    for indice, item in enumerate(itens):
+        if item['usuario'] not in usuarios:
+            erros[indice]['usuario'] = [f"Cliente {item['usuario']} inexistente."]
+        if item['profissional'] not in profissionais:
+            erros[indice]['profissional'] = [f"Profissional {item['profissional']} inexistente."]
+        faltando = sorted(set(item['servicos']) - servicos.keys())
+        if faltando:
+            erros[indice]['servicos'] = [f"Serviços inexistentes: {faltando}."]
+
+    if verificar_conflitos:
+        concorrentes = [
+            (indice, item) for indice, item in enumerate(itens)
+            if indice not in erros and item.get('horario_inicio') is not None
+            and item.get('status', 'pendente') in Agendamento.STATUS_ATIVOS
+        ]
+        ocupada = _agenda_ocupada([item for _, item in concorrentes], agora) if concorrentes else {}
+        for indice, item in concorrentes:
+            inicio = _minutos(item['horario_inicio'])
+            duracao = sum(servicos[servico][0] for servico in dict.fromkeys(item['servicos']))
+            fim = inicio + max(duracao, INTERVALO_PADRAO)
+            dia = ocupada.setdefault((item['profissional'], item['data']), [])
+            if any(outro_inicio < fim and inicio < outro_fim for outro_inicio, outro_fim in dia):
+                erros[indice]['horario_inicio'] = ["Horário já ocupado."]
+            else:
+                # Os itens seguintes do lote disputam com este.
+                dia.append((inicio, fim))
+    return dict(erros)
+
+
+def _gravar(itens, servicos):
+    Relacao = Agendamento.servicos.through
+    criados = Agendamento.objects.bulk_create([
+        Agendamento(
+            usuario_id=item['usuario'], profissional_id=item['profissional'], data=item['data'],
+            horario_inicio=item.get('horario_inicio'), status=item.get('status', 'pendente'),
+        )
+        for item in itens
+    ])
+    Relacao.objects.bulk_create([
+        Relacao(agendamento_id=agendamento.pk, tratamentopodologico_id=servico)
+        for agendamento, item in zip(criados, itens)
+        for servico in dict.fromkeys(item['servicos'])
+    ])
+    # Sem sinais: as estatísticas recebem o lote agrupado.
+    grupos = defaultdict(lambda: [0, estatisticas.ZERO])
+    for agendamento, item in zip(criados, itens):
+        grupo = grupos[(agendamento.data, agendamento.profissional_id, agendamento.status)]
+        grupo[0] += 1
+        grupo[1] += sum((servicos[servico][1] for servico in dict.fromkeys(item['servicos'])), estatisticas.ZERO)
+    estatisticas.registrar_em_lote(grupos)
+    return [agendamento.pk for agendamento in criados]
+
+
+def criar_agendamentos(itens, verificar_conflitos=True, tudo_ou_nada=False, agora=None):
+    """
+    Cria os agendamentos de ``itens`` (dicts com ``usuario``, ``profissional``
+    e ``servicos`` por id, ``data`` e, opcionais, ``horario_inicio`` e
+    ``status``). Retorna uma lista, na ordem de ``itens``, com ``(id, None)``
+    para os criados e ``(None, erros)`` para os recusados. Com
+    ``tudo_ou_nada``, um erro em qualquer item recusa o lote inteiro e os
+    itens válidos voltam como ``(None, None)``.
+    """
+    agora = agora or timezone.now()
+    if not itens:
+        return []
+    with transaction.atomic():
+        servicos = {
+            pk: (duracao, preco) for pk, duracao, preco in TratamentoPodologico.objects.filter(
+                pk__in={servico for item in itens for servico in item['servicos']}
+            ).values_list('pk', 'duracao', 'preco')
+        }
+        erros = _validar(itens, servicos, verificar_conflitos, agora)
+        validos = [indice for indice in range(len(itens)) if indice not in erros]
+        ids = {}
+        if validos and not (tudo_ou_nada and erros):
+            ids = dict(zip(validos, _gravar([itens[indice] for indice in validos], servicos)))
+    return [(ids.get(indice), erros.get(indice)) for indice in range(len(itens))]
@@ -0,0 +1,188 @@
+"""
+Instrumentação por requisição: consultas SQL, tempo de banco e de templates.
+
+``InstrumentacaoMiddleware`` mede cada requisição e devolve o resultado no
+cabeçalho ``Server-Timing`` (visível na aba Network do navegador)::
+
+    Server-Timing: db;dur=12.4;desc="23 consultas", tpl;dur=3.1, total;dur=41.0
+
+e registra no logger ``core.instrumentacao``, em JSON:
+
+- ``requisicao_lenta``: requisições acima de ``INSTRUMENTACAO_LIMITE_MS``, com
+  as ``INSTRUMENTACAO_PIORES_CONSULTAS`` consultas mais demoradas;
+- ``consultas_repetidas``: o mesmo SQL (com parâmetros diferentes ou não)
+  executado ``INSTRUMENTACAO_REPETICOES`` vezes ou mais, o padrão N+1.
+
+As consultas são capturadas com ``connection.execute_wrapper`` nas conexões da
+thread da requisição; o que roda em outras threads (fila de escrita, workers
+de imagens) não entra na conta. O tempo de templates é medido envolvendo
+``Template.render`` enquanto há uma medição em curso.
+
+O middleware atende requisições síncronas e assíncronas: sob ASGI, as views
+assíncronas (``/api/async/``) seguem sem passar por ``sync_to_async``. As
+consultas do ORM assíncrono rodam na thread ``thread_sensitive`` da
+requisição, e é nas conexões dessa thread que a medição é ligada.
+
+É uma ferramenta de diagnóstico, desligada por padrão. Com
+``settings.INSTRUMENTACAO`` falso, o middleware se retira da cadeia na
+inicialização (``MiddlewareNotUsed``) e nada é envolvido: o custo é zero.
+"""
+import heapq
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+_render_original = Template.render
+
+
+class Medicao:
+    """
+    Números de uma requisição.
+    """
+    def __init__(self):
+        self.consultas = []  # (duração em ms, sql)
+        self.tempo_banco = 0.0
+        self.tempo_templates = 0.0
+        self.em_template = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # Assinatura de connection.execute_wrapper.
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            self.tempo_banco += duracao
+            self.consultas.append((duracao, sql))
+
+    def piores(self, quantidade):
+        return [
+            {'ms': round(duracao, 2), 'sql': sql}
+            for duracao, sql in heapq.nlargest(quantidade, self.consultas, key=lambda consulta: consulta[0])
+        ]
+
+    def repetidas(self, minimo):
+        contagem = Counter(sql for _, sql in self.consultas)
+        return [{'vezes': vezes, 'sql': sql} for sql, vezes in contagem.most_common() if vezes >= minimo]
+
+
+def _render_medido(self, context):
+    medicao = _medicao_atual.get()
+    if medicao is None or medicao.em_template:
+        # Sem medição ou template aninhado ({% include %}): já está sendo contado.
+        return _render_original(self, context)
+    medicao.em_template = True
+    inicio = time.perf_counter()
+    try:
+        return _render_original(self, context)
+    finally:
+        medicao.tempo_templates += (time.perf_counter() - inicio) * 1000
+        medicao.em_template = False
+
+
+def server_timing(medicao, total):
+    return (
+        f'db;dur={medicao.tempo_banco:.1f};desc="{len(medicao.consultas)} consultas", '
+        f'tpl;dur={medicao.tempo_templates:.1f}, total;dur={total:.1f}'
+    )
+
+
+def _ligar(pilha, medicao):
+    """
+    Liga ``medicao`` às conexões da thread atual; ``pilha.close()`` desliga.
+    """
+    for conexao in connections.all():
+        pilha.enter_context(conexao.execute_wrapper(medicao))
+
+
+@contextmanager
+def _medindo(medicao):
+    """
+    Liga ``medicao`` às conexões da thread atual e aos templates.
+    """
+    token = _medicao_atual.set(medicao)
+    try:
+        with ExitStack() as pilha:
+            _ligar(pilha, medicao)
+            yield
+    finally:
+        _medicao_atual.reset(token)
+
+
+class InstrumentacaoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACAO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        self.limite = getattr(settings, 'INSTRUMENTACAO_LIMITE_MS', 500)
+        self.piores = getattr(settings, 'INSTRUMENTACAO_PIORES_CONSULTAS', 5)
+        self.repeticoes = getattr(settings, 'INSTRUMENTACAO_REPETICOES', 5)
+        Template.render = _render_medido
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        medicao = Medicao()
+        inicio = time.perf_counter()
+        with _medindo(medicao):
+            response = self.get_response(request)
+        return self.concluir(request, response, medicao, inicio)
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        inicio = time.perf_counter()
+        token = _medicao_atual.set(medicao)
+        pilha = ExitStack()
+        try:
+            # As conexões do ORM assíncrono são as da thread de sync_to_async, não as do loop.
+            await sync_to_async(_ligar)(pilha, medicao)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pilha.close)()
+            _medicao_atual.reset(token)
+        return self.concluir(request, response, medicao, inicio)
+
+    def concluir(self, request, response, medicao, inicio):
+        total = (time.perf_counter() - inicio) * 1000
+        response['Server-Timing'] = server_timing(medicao, total)
+        self.registrar(request, response, medicao, total)
+        return response
+
+    def registrar(self, request, response, medicao, total):
+        base = {
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'total_ms': round(total, 1),
+            'banco_ms': round(medicao.tempo_banco, 1),
+            'templates_ms': round(medicao.tempo_templates, 1),
+            'consultas': len(medicao.consultas),
+        }
+        if total >= self.limite:
+            logger.warning(
+                'requisicao_lenta %s', json.dumps(base | {'piores': medicao.piores(self.piores)}, ensure_ascii=False)
+            )
+        repetidas = medicao.repetidas(self.repeticoes)
+        if repetidas:
+            logger.warning(
+                'consultas_repetidas %s', json.dumps(base | {'repetidas': repetidas}, ensure_ascii=False)
+            )
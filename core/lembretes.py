@@ -0,0 +1,323 @@
+"""
+Lembretes dos agendamentos, enviados fora das requisições.
+
+O trabalho fica na tabela ``Lembrete`` e passa por três etapas:
+
+1. ``varrer()`` percorre os agendamentos ativos dos próximos dias, dia a dia e
+   em lotes de ``LOTE`` ids (busca no índice ``(data, id)``), e enfileira um
+   lembrete por item de ``ANTECEDENCIAS``. A ``chave`` de cada um (agendamento,
+   tipo, data e horário) é única: varrer de novo não duplica nada, e um
+   agendamento remarcado ganha lembretes com outra chave.
+2. ``enviar_pendentes()`` reivindica os lembretes vencidos com um UPDATE
+   condicional que marca uma ``trava`` e um prazo (``PRAZO``). Dois workers
+   nunca enviam o mesmo lembrete; se quem reivindicou morrer, o lembrete volta
+   a vencer quando o prazo acabar. Lembretes de agendamentos cancelados,
+   remarcados ou já iniciados são descartados sem envio.
+3. O envio é feito pelo enviador de ``settings.LEMBRETES_ENVIADOR`` (console ou
+   arquivo; um enviador de SMS ou e-mail só precisa de um método
+   ``enviar(mensagem)``). Uma falha é tentada de novo com espera crescente e
+   jitter, até ``TENTATIVAS`` vezes.
+
+Tudo roda em uma thread (``Agendador``) de um processo dedicado, ``manage.py
+processar_lembretes`` (ou ``--uma-vez`` pelo cron). Com
+``settings.LEMBRETES_EM_PROCESSO`` (desligado por padrão), o servidor inicia
+a thread em cada processo: as travas evitam envios duplicados, mas todos os
+workers varrem a agenda, então só vale com um processo. As leituras não bloqueiam as requisições (WAL) e as
+escritas, curtas e em lote, passam pela fila de escrita (``core.escrita``); o
+envio acontece fora de qualquer transação.
+"""
+import json
+import logging
+import random
+import sys
+import threading
+import time as relogio
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import escrita
+from .models import Agendamento, Lembrete
+
+logger = logging.getLogger(__name__)
+
+# Tipo do lembrete: quanto tempo antes do atendimento ele é enviado.
+ANTECEDENCIAS = {
+    'vespera': timedelta(hours=24),
+    'proximo': timedelta(hours=2),
+}
+# Agendamentos sem horário contam a partir da abertura da clínica.
+HORARIO_PADRAO = time(8)
+
+LOTE = 500
+PRAZO = timedelta(minutes=5)
+TENTATIVAS = 6
+ESPERA_INICIAL = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=1)
+RETENCAO = timedelta(days=30)
+
+INTERVALO_DE_ENVIO = 10  # segundos
+INTERVALO_DE_VARREDURA = 120  # segundos
+# Com fila acumulada, pausa entre lotes para não disputar a CPU com as requisições.
+PAUSA_ENTRE_LOTES = 0.5  # segundos
+
+FINALIZADOS = ('enviado', 'descartado', 'falhou')
+
+
+class EnviadorConsole:
+    """
+    Escreve cada mensagem, em JSON, na saída padrão.
+    """
+    def __init__(self, saida=None):
+        self.saida = saida or sys.stdout
+
+    def enviar(self, mensagem):
+        self.saida.write(json.dumps(mensagem, ensure_ascii=False) + '\n')
+
+
+class EnviadorArquivo:
+    """
+    Acrescenta cada mensagem, em JSON, ao arquivo ``settings.LEMBRETES_ARQUIVO``.
+    """
+    def __init__(self, caminho=None):
+        self.caminho = caminho or settings.LEMBRETES_ARQUIVO
+
+    def enviar(self, mensagem):
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(mensagem, ensure_ascii=False) + '\n')
+
+
+def enviador_configurado():
+    return import_string(getattr(settings, 'LEMBRETES_ENVIADOR', 'core.lembretes.EnviadorConsole'))()
+
+
+def inicio_do_atendimento(data, horario_inicio, fuso=None):
+    return timezone.make_aware(datetime.combine(data, horario_inicio or HORARIO_PADRAO), fuso)
+
+
+def chave(agendamento_id, tipo, data, horario_inicio):
+    return f'{agendamento_id}:{tipo}:{data.isoformat()}:{(horario_inicio or HORARIO_PADRAO):%H%M}'
+
+
+def previstos(agendamento_id, data, horario_inicio, agora, fuso=None):
+    """
+    ``[(tipo, chave, executar_em)]`` de um agendamento. Lembretes cujo
+    horário já passou (agendamento marcado em cima da hora, worker parado)
+    ficam de fora, a não ser que não reste nenhum: aí vai só o mais próximo do
+    atendimento, para envio imediato.
+    """
+    inicio = inicio_do_atendimento(data, horario_inicio, fuso)
+    if inicio <= agora:
+        return []
+    momentos = sorted((inicio - antecedencia, tipo) for tipo, antecedencia in ANTECEDENCIAS.items())
+    futuros = [(momento, tipo) for momento, tipo in momentos if momento > agora] or momentos[-1:]
+    return [(tipo, chave(agendamento_id, tipo, data, horario_inicio), momento) for momento, tipo in futuros]
+
+
+def _enfileirar(linhas, agora, fuso):
+    lembretes = {
+        chave_do_lembrete: (pk, tipo, momento)
+        for pk, data, horario_inicio in linhas
+        for tipo, chave_do_lembrete, momento in previstos(pk, data, horario_inicio, agora, fuso)
+    }
+    # A maior parte já foi enfileirada em varreduras anteriores: ler é barato, escrever não.
+    existentes = set(Lembrete.objects.filter(chave__in=list(lembretes)).values_list('chave', flat=True))
+    novos = [
+        Lembrete(agendamento_id=pk, tipo=tipo, chave=chave_do_lembrete, executar_em=momento)
+        for chave_do_lembrete, (pk, tipo, momento) in lembretes.items()
+        if chave_do_lembrete not in existentes
+    ]
+    if novos:
+        escrita.executar(Lembrete.objects.bulk_create, novos, ignore_conflicts=True)
+    return len(novos)
+
+
+def varrer(agora=None, lote=LOTE):
+    """
+    Enfileira os lembretes dos agendamentos ativos até o fim da maior
+    antecedência. Retorna quantos lembretes novos foram criados.
+    """
+    agora = agora or timezone.now()
+    fuso = timezone.get_current_timezone()
+    dia = timezone.localdate(agora, fuso)
+    ultimo_dia = dia + timedelta(days=max(ANTECEDENCIAS.values()).days + 1)
+    criados = 0
+    while dia <= ultimo_dia:
+        ultimo_id = 0
+        while linhas := list(
+            Agendamento.objects.ativos().filter(data=dia, pk__gt=ultimo_id).order_by('pk').values_list(
+                'pk', 'data', 'horario_inicio'
+            )[:lote]
+        ):
+            criados += _enfileirar(linhas, agora, fuso)
+            ultimo_id = linhas[-1][0]
+        dia += timedelta(days=1)
+    return criados
+
+
+def espera(tentativas):
+    """
+    Espera antes da próxima tentativa: dobra a cada falha, com jitter.
+    """
+    return min(ESPERA_INICIAL * 2 ** (tentativas - 1), ESPERA_MAXIMA) * (1 + random.random() / 2)
+
+
+def mensagem(lembrete):
+    agendamento = lembrete.agendamento
+    inicio = timezone.localtime(inicio_do_atendimento(agendamento.data, agendamento.horario_inicio))
+    return {
+        'chave': lembrete.chave,
+        'tipo': lembrete.tipo,
+        'agendamento': agendamento.pk,
+        'nome': agendamento.usuario.nome,
+        'email': agendamento.usuario.email,
+        'telefone': agendamento.usuario.telefone,
+        'texto': (
+            f"Olá, {agendamento.usuario.nome}! Lembrete do seu atendimento com "
+            f"{agendamento.profissional.nome} em {inicio:%d/%m/%Y} às {inicio:%H:%M}."
+        ),
+    }
+
+
+def _vale(lembrete, agora):
+    agendamento = lembrete.agendamento
+    return (
+        agendamento.status in Agendamento.STATUS_ATIVOS
+        and lembrete.chave == chave(agendamento.pk, lembrete.tipo, agendamento.data, agendamento.horario_inicio)
+        and inicio_do_atendimento(agendamento.data, agendamento.horario_inicio) > agora
+    )
+
+
+def _reivindicar(ids, trava, agora):
+    return Lembrete.objects.filter(
+        pk__in=ids, status__in=('pendente', 'enviando'), executar_em__lte=agora
+    ).update(status='enviando', trava=trava, executar_em=agora + PRAZO)
+
+
+def _registrar(trava, agora, enviados, descartados, falhas):
+    reivindicados = Lembrete.objects.filter(trava=trava)
+    reivindicados.filter(pk__in=enviados).update(
+        status='enviado', enviado_em=agora, tentativas=F('tentativas') + 1, trava=None, ultimo_erro=None
+    )
+    reivindicados.filter(pk__in=descartados).update(status='descartado', trava=None)
+    for lembrete, erro in falhas:
+        tentativas = lembrete.tentativas + 1
+        reivindicados.filter(pk=lembrete.pk).update(
+            status='falhou' if tentativas >= TENTATIVAS else 'pendente',
+            executar_em=agora + espera(tentativas),
+            tentativas=tentativas,
+            trava=None,
+            ultimo_erro=repr(erro),
+        )
+
+
+def enviar_pendentes(agora=None, lote=LOTE, enviador=None):
+    """
+    Envia até ``lote`` lembretes vencidos. Retorna ``{'enviados': n,
+    'descartados': n, 'falhas': n}``.
+    """
+    agora = agora or timezone.now()
+    resultado = {'enviados': 0, 'descartados': 0, 'falhas': 0}
+    ids = list(
+        Lembrete.objects.filter(status__in=('pendente', 'enviando'), executar_em__lte=agora)
+        .order_by('executar_em').values_list('pk', flat=True)[:lote]
+    )
+    trava = uuid.uuid4().hex
+    if not ids or not escrita.executar(_reivindicar, ids, trava, agora):
+        return resultado
+
+    enviador = enviador or enviador_configurado()
+    enviados, descartados, falhas = [], [], []
+    for lembrete in Lembrete.objects.filter(pk__in=ids, trava=trava).select_related(
+        'agendamento__usuario', 'agendamento__profissional'
+    ):
+        if not _vale(lembrete, agora):
+            descartados.append(lembrete.pk)
+            continue
+        try:
+            enviador.enviar(mensagem(lembrete))
+        except Exception as erro:
+            logger.warning("Falha ao enviar o lembrete %s: %r", lembrete.chave, erro)
+            falhas.append((lembrete, erro))
+        else:
+            enviados.append(lembrete.pk)
+    # A trava no filtro: se o prazo venceu e outro worker reivindicou, o registro é dele.
+    escrita.executar(_registrar, trava, agora, enviados, descartados, falhas)
+    resultado.update(enviados=len(enviados), descartados=len(descartados), falhas=len(falhas))
+    return resultado
+
+
+def expurgar(agora=None, lote=LOTE):
+    """
+    Apaga, em lotes, os lembretes finalizados há mais de ``RETENCAO``.
+    Retorna quantos foram apagados.
+    """
+    agora = agora or timezone.now()
+    antigos = Lembrete.objects.filter(status__in=FINALIZADOS, executar_em__lt=agora - RETENCAO)
+    apagados = 0
+    while ids := list(antigos.values_list('pk', flat=True)[:lote]):
+        apagados += escrita.executar(lambda: Lembrete.objects.filter(pk__in=ids).delete()[0])
+    return apagados
+
+
+class Agendador:
+    """
+    Laço de varredura e envio. ``iniciar()`` o roda em uma thread daemon;
+    ``executar()`` o roda na thread atual até ``encerrar()``.
+    """
+    def __init__(self, intervalo_de_envio=INTERVALO_DE_ENVIO, intervalo_de_varredura=INTERVALO_DE_VARREDURA):
+        self.intervalo_de_envio = intervalo_de_envio
+        self.intervalo_de_varredura = intervalo_de_varredura
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self.executar, name='lembretes', daemon=True)
+                self._thread.start()
+
+    def encerrar(self):
+        self._parar.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def executar(self, enviador=None):
+        enviador = enviador or enviador_configurado()
+        proxima_varredura = 0
+        try:
+            while not self._parar.is_set():
+                pendentes = False
+                try:
+                    if relogio.monotonic() >= proxima_varredura:
+                        varrer()
+                        expurgar()
+                        proxima_varredura = relogio.monotonic() + self.intervalo_de_varredura
+                    resultado = enviar_pendentes(enviador=enviador)
+                    # Lote cheio: ainda há lembretes vencidos.
+                    pendentes = sum(resultado.values()) >= LOTE
+                except Exception:
+                    logger.exception("Falha no processamento dos lembretes.")
+                self._parar.wait(PAUSA_ENTRE_LOTES if pendentes else self.intervalo_de_envio)
+        finally:
+            connections.close_all()
+
+
+agendador = Agendador()
+
+
+def iniciar():
+    """
+    Inicia a thread dos lembretes se ``settings.LEMBRETES_EM_PROCESSO`` estiver ligado.
+    """
+    if getattr(settings, 'LEMBRETES_EM_PROCESSO', False):
+        agendador.iniciar()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import arquivamento
+
+
+class Command(BaseCommand):
+    help = "Move os agendamentos finalizados antigos, com os feedbacks, para as tabelas arquivadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idade-dias', type=int, default=None,
+            help="Arquiva os anteriores a tantos dias atrás (padrão: settings.ARQUIVAMENTO_IDADE_DIAS).",
+        )
+        parser.add_argument('--lote', type=int, default=arquivamento.LOTE, help="Agendamentos por transação.")
+
+    def handle(self, *args, **options):
+        corte = arquivamento.data_de_corte(idade=options['idade_dias'])
+        arquivados = arquivamento.arquivar(idade=options['idade_dias'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{arquivados} agendamento(s) anteriores a {corte} arquivado(s)."))
@@ -0,0 +1,37 @@
+import inspect
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmarks import CENARIOS
+
+
+class Command(BaseCommand):
+    help = "Executa um cenário de benchmark em um banco de testes descartável."
+
+    def add_arguments(self, parser):
+        parser.add_argument('cenario', choices=sorted(CENARIOS), help="Cenário a executar.")
+        parser.add_argument('--linhas', type=int, help="Volume de dados gerado pelo cenário.")
+        parser.add_argument('--repeticoes', type=int, help="Repetições de cada medição (padrão: as do cenário).")
+        parser.add_argument('--json', help="Arquivo em que o cenário grava os resultados (cenário endpoints).")
+
+    def handle(self, *args, **options):
+        cenario = CENARIOS[options['cenario']]
+        if options['json'] and 'arquivo_json' not in inspect.signature(cenario).parameters:
+            raise CommandError(f"O cenário {options['cenario']} não grava resultados em JSON.")
+        # O banco real nunca é tocado: o cenário roda no banco de testes.
+        nome_original = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            parametros = {
+                chave: valor for chave, valor in options.items()
+                if chave in ('linhas', 'repeticoes') and valor is not None
+            }
+            if options['json']:
+                parametros['arquivo_json'] = options['json']
+            cenario(self.stdout, **parametros)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
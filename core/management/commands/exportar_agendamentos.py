@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.exportacao import FORMATOS, LOTE, agendamentos_para_exportar, exportar
+from core.models import Agendamento, AgendamentoArquivado
+
+
+class Command(BaseCommand):
+    help = "Exporta o histórico de agendamentos em CSV ou JSONL sem carregá-lo inteiro na memória."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--inicio', help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument('--fim', help="Data final (AAAA-MM-DD).")
+        parser.add_argument(
+            '--status', choices=[status for status, _ in Agendamento.STATUS_CHOICES],
+            help="Exporta apenas agendamentos com este status.",
+        )
+        parser.add_argument('--saida', help="Arquivo de saída; padrão é a saída padrão.")
+        parser.add_argument('--lote', type=int, default=LOTE, help="Agendamentos lidos por consulta.")
+
+    def handle(self, *args, **options):
+        filtros = (options['inicio'], options['fim'], options['status'])
+        queryset = agendamentos_para_exportar(*filtros)
+        arquivados = agendamentos_para_exportar(*filtros, modelo=AgendamentoArquivado)
+        linhas = exportar(queryset, options['formato'], options['lote'], arquivados=arquivados)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8', newline='') as arquivo:
+                arquivo.writelines(linhas)
+        else:
+            for linha in linhas:
+                self.stdout.write(linha, ending='')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import geolocalizacao
+
+
+class Command(BaseCommand):
+    help = "Recalcula as coordenadas dos profissionais pela tabela de centróides de bairros."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            localizados = geolocalizacao.preencher()
+        self.stdout.write(self.style.SUCCESS(f"{localizados} profissional(is) localizado(s)."))
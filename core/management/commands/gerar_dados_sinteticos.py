@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import dados_sinteticos
+
+
+class Command(BaseCommand):
+    help = "Gera uma base sintética e reproduzível (clientes, profissionais, agendamentos, feedbacks) no banco configurado."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=10_000)
+        parser.add_argument('--profissionais', type=int, default=50)
+        parser.add_argument('--tratamentos', type=int, default=20)
+        parser.add_argument('--agendamentos', type=int, default=100_000)
+        parser.add_argument('--anos', type=int, default=3, help="Anos de histórico de agendamentos.")
+        parser.add_argument(
+            '--feedbacks', type=float, default=0.4, help="Proporção dos atendimentos concluídos com feedback."
+        )
+        parser.add_argument('--semente', type=int, default=42, help="A mesma semente gera os mesmos dados.")
+        parser.add_argument('--lote', type=int, default=dados_sinteticos.LOTE, help="Linhas por bulk_create.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        criados = dados_sinteticos.gerar(
+            usuarios=options['usuarios'], profissionais=options['profissionais'],
+            tratamentos=options['tratamentos'], agendamentos=options['agendamentos'], anos=options['anos'],
+            proporcao_de_feedbacks=options['feedbacks'], semente=options['semente'], lote=options['lote'],
+            saida=self.stdout if options['verbosity'] > 1 else None,
+        )
+        resumo = ', '.join(f"{quantidade} {modelo}" for modelo, quantidade in criados.items())
+        self.stdout.write(self.style.SUCCESS(f"Gerados {resumo} em {time.perf_counter() - inicio:.1f} s."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import recomendacoes
+
+
+class Command(BaseCommand):
+    help = "Recalcula as recomendações de profissionais de todos os clientes a partir do histórico."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k', type=int, default=recomendacoes.TOP_K, help="Profissionais guardados por cliente.",
+        )
+
+    def handle(self, *args, **options):
+        gerados = recomendacoes.gerar(k=options['k'])
+        self.stdout.write(self.style.SUCCESS(f"Recomendações de {gerados} cliente(s) geradas."))
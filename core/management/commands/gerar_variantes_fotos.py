@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core import imagens
+from core.models import ProfissionalDePodologia, Usuario
+
+
+class Command(BaseCommand):
+    help = "Gera as miniaturas das fotos de usuários e profissionais que ainda não as têm."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas', action='store_true',
+            help="Reprocessa também as fotos que já têm variantes (as existentes no disco são reaproveitadas).",
+        )
+
+    def handle(self, *args, **options):
+        for modelo in (Usuario, ProfissionalDePodologia):
+            fotos = modelo.objects.exclude(foto='').exclude(foto__isnull=True)
+            if not options['todas']:
+                fotos = fotos.filter(foto_hash__isnull=True)
+            processadas = falhas = 0
+            for pk in fotos.values_list('pk', flat=True).iterator():
+                if imagens.processar(modelo, pk):
+                    processadas += 1
+                else:
+                    falhas += 1
+            self.stdout.write(f"{modelo._meta.verbose_name_plural}: {processadas} processada(s), {falhas} falha(s).")
+        self.stdout.write(self.style.SUCCESS("Variantes atualizadas."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core import lembretes
+
+
+class Command(BaseCommand):
+    help = "Enfileira e envia os lembretes dos agendamentos (fora do servidor, ou pelo cron com --uma-vez)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uma-vez', action='store_true',
+            help="Faz uma varredura, envia tudo o que estiver vencido e termina.",
+        )
+
+    def handle(self, *args, **options):
+        enviador = lembretes.enviador_configurado()
+        if not options['uma_vez']:
+            self.stdout.write("Processando lembretes; Ctrl+C para encerrar.")
+            try:
+                lembretes.Agendador().executar(enviador)
+            except KeyboardInterrupt:
+                pass
+            return
+
+        criados = lembretes.varrer()
+        totais = {'enviados': 0, 'descartados': 0, 'falhas': 0}
+        while any((resultado := lembretes.enviar_pendentes(enviador=enviador)).values()):
+            totais = {nome: totais[nome] + resultado[nome] for nome in totais}
+        apagados = lembretes.expurgar()
+        self.stdout.write(self.style.SUCCESS(
+            f"{criados} lembrete(s) enfileirado(s), {totais['enviados']} enviado(s), "
+            f"{totais['descartados']} descartado(s), {totais['falhas']} falha(s), {apagados} expurgado(s)."
+        ))
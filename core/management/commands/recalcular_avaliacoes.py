@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import avaliacoes
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o resumo de avaliações dos profissionais a partir dos feedbacks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help="Apenas verifica divergências, sem gravar; termina com erro se houver alguma.",
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            divergencias = avaliacoes.divergencias()
+            for profissional, diferencas in divergencias:
+                detalhes = ', '.join(
+                    f"{campo}: {gravado} (esperado {esperado})"
+                    for campo, (gravado, esperado) in diferencas.items()
+                )
+                self.stdout.write(f"{profissional.pk} - {detalhes}")
+            if divergencias:
+                raise CommandError(f"{len(divergencias)} profissional(is) com resumo divergente.")
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência encontrada."))
+            return
+
+        with transaction.atomic():
+            corrigidos = avaliacoes.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{corrigidos} profissional(is) atualizado(s)."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import estatisticas
+
+
+class Command(BaseCommand):
+    help = "Reconstrói as estatísticas diárias (dashboard) a partir dos agendamentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', help="Data inicial (AAAA-MM-DD); padrão é todo o histórico.")
+        parser.add_argument('--fim', help="Data final (AAAA-MM-DD).")
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help="Apenas verifica divergências, sem gravar; termina com erro se houver alguma.",
+        )
+
+    def handle(self, *args, **options):
+        inicio, fim = options['inicio'], options['fim']
+        if options['verificar']:
+            divergencias = estatisticas.divergencias(inicio, fim)
+            for (data, profissional), diferencas in divergencias:
+                detalhes = ', '.join(
+                    f"{campo}: {gravado} (esperado {esperado})"
+                    for campo, (gravado, esperado) in diferencas.items()
+                )
+                self.stdout.write(f"{data} {profissional or 'clínica'} - {detalhes}")
+            if divergencias:
+                raise CommandError(f"{len(divergencias)} linha(s) de estatística divergente(s).")
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência encontrada."))
+            return
+
+        gravadas = estatisticas.reconstruir(inicio, fim)
+        self.stdout.write(self.style.SUCCESS(f"{gravadas} linha(s) de estatística gravada(s)."))
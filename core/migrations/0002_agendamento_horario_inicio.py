@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendamento',
+            name='horario_inicio',
+            field=models.TimeField(blank=True, help_text='Horário de início do atendimento; a duração vem da soma dos serviços.', null=True, verbose_name='Horário de Início'),
+        ),
+    ]
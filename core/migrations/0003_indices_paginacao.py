@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_agendamento_horario_inicio'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['data', 'id'], name='agendamento_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['-data', '-id'], name='feedback_data_id_idx'),
+        ),
+    ]
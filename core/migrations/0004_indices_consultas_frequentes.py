@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['profissional', 'data', 'status'], name='agendamento_prof_data_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(condition=models.Q(('status__in', ['pendente', 'confirmado'])), fields=['data', 'profissional', 'horario_inicio'], name='agendamento_ativos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['usuario', 'data'], name='agendamento_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['usuario', '-data'], name='feedback_usuario_data_idx'),
+        ),
+    ]
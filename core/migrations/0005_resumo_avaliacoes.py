@@ -0,0 +1,76 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def preencher_resumo_avaliacoes(apps, schema_editor):
+    Feedback = apps.get_model('core', 'Feedback')
+    ProfissionalDePodologia = apps.get_model('core', 'ProfissionalDePodologia')
+    agregados = {
+        'avaliacoes_total': Count('id'),
+        'avaliacoes_soma': Sum('nota'),
+        **{f'avaliacoes_nota_{nota}': Count('id', filter=Q(nota=nota)) for nota in range(1, 6)},
+    }
+    linhas = Feedback.objects.order_by().values('agendamento__profissional_id').annotate(**agregados)
+    for linha in linhas:
+        resumo = {campo: linha[campo] for campo in agregados}
+        resumo['avaliacao_media'] = resumo['avaliacoes_soma'] / resumo['avaliacoes_total']
+        ProfissionalDePodologia.objects.filter(pk=linha['agendamento__profissional_id']).update(**resumo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_indices_consultas_frequentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacao_media',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Avaliação média'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_nota_1',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Notas 1'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_nota_2',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Notas 2'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_nota_3',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Notas 3'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_nota_4',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Notas 4'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_nota_5',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Notas 5'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_soma',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Soma das notas'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='avaliacoes_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Avaliações'),
+        ),
+        migrations.AddIndex(
+            model_name='profissionaldepodologia',
+            index=models.Index(fields=['aprovado', '-avaliacao_media'], name='profissional_avaliacao_idx'),
+        ),
+        migrations.RunPython(preencher_resumo_avaliacoes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+CAMPOS = 'nome, especialidade, especializacao, bairro'
+NOVOS = 'new.nome, new.especialidade, new.especializacao, new.bairro'
+ANTIGOS = 'old.nome, old.especialidade, old.especializacao, old.bairro'
+
+# Tabela FTS5 de conteúdo externo sobre core_profissionaldepodologia, mantida
+# por triggers. Migrações que recriem a tabela de profissionais no SQLite
+# (AlterField, por exemplo) descartam os triggers e precisam recriá-los.
+CRIAR = [
+    f"""
+    CREATE VIRTUAL TABLE core_profissional_busca USING fts5(
+        {CAMPOS},
+        content='core_profissionaldepodologia',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER core_profissional_busca_ai AFTER INSERT ON core_profissionaldepodologia BEGIN
+        INSERT INTO core_profissional_busca(rowid, {CAMPOS}) VALUES (new.id, {NOVOS});
+    END
+    """,
+    f"""
+    CREATE TRIGGER core_profissional_busca_ad AFTER DELETE ON core_profissionaldepodologia BEGIN
+        INSERT INTO core_profissional_busca(core_profissional_busca, rowid, {CAMPOS})
+        VALUES ('delete', old.id, {ANTIGOS});
+    END
+    """,
+    f"""
+    CREATE TRIGGER core_profissional_busca_au AFTER UPDATE OF {CAMPOS} ON core_profissionaldepodologia BEGIN
+        INSERT INTO core_profissional_busca(core_profissional_busca, rowid, {CAMPOS})
+        VALUES ('delete', old.id, {ANTIGOS});
+        INSERT INTO core_profissional_busca(rowid, {CAMPOS}) VALUES (new.id, {NOVOS});
+    END
+    """,
+    "INSERT INTO core_profissional_busca(core_profissional_busca) VALUES ('rebuild')",
+]
+
+REMOVER = [
+    "DROP TRIGGER IF EXISTS core_profissional_busca_ai",
+    "DROP TRIGGER IF EXISTS core_profissional_busca_ad",
+    "DROP TRIGGER IF EXISTS core_profissional_busca_au",
+    "DROP TABLE IF EXISTS core_profissional_busca",
+]
+
+
+def executar(comandos):
+    def operacao(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in comandos:
+            schema_editor.execute(sql)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_resumo_avaliacoes'),
+    ]
+
+    operations = [
+        migrations.RunPython(executar(CRIAR), executar(REMOVER)),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_busca_profissionais'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='foto_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='foto_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
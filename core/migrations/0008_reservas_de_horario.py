@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_variantes_fotos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('horario_inicio', models.TimeField(verbose_name='Horário de Início')),
+                ('duracao', models.PositiveIntegerField(verbose_name='Duração (minutos)')),
+                ('status', models.CharField(choices=[('retida', 'Retida'), ('confirmada', 'Confirmada')], default='retida', max_length=10, verbose_name='Status')),
+                ('expira_em', models.DateTimeField(verbose_name='Expira em')),
+                ('criada_em', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('agendamento', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reserva', to='core.agendamento', verbose_name='Agendamento')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='core.profissionaldepodologia', verbose_name='Profissional')),
+                ('servicos', models.ManyToManyField(related_name='reservas', to='core.tratamentopodologico', verbose_name='Serviços')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='core.usuario', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Horário',
+                'verbose_name_plural': 'Reservas de Horário',
+            },
+        ),
+        migrations.CreateModel(
+            name='OcupacaoDeHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('intervalo', models.PositiveSmallIntegerField(help_text='Índice do intervalo no dia, a partir da meia-noite.')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.profissionaldepodologia')),
+                ('reserva', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacoes', to='core.reserva')),
+            ],
+            options={
+                'verbose_name': 'Ocupação de Horário',
+                'verbose_name_plural': 'Ocupações de Horário',
+                'constraints': [models.UniqueConstraint(fields=('profissional', 'data', 'intervalo'), name='ocupacao_horario_unica')],
+            },
+        ),
+    ]
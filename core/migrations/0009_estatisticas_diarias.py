@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_reservas_de_horario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('total_pendente', models.IntegerField(default=0, verbose_name='Pendentes')),
+                ('total_confirmado', models.IntegerField(default=0, verbose_name='Confirmados')),
+                ('total_concluido', models.IntegerField(default=0, verbose_name='Concluídos')),
+                ('total_cancelado', models.IntegerField(default=0, verbose_name='Cancelados')),
+                ('receita_pendente', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita pendente')),
+                ('receita_confirmado', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita confirmada')),
+                ('receita_concluido', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita concluída')),
+                ('receita_cancelado', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita cancelada')),
+                ('profissional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas', to='core.profissionaldepodologia', verbose_name='Profissional')),
+            ],
+            options={
+                'verbose_name': 'Estatística Diária',
+                'verbose_name_plural': 'Estatísticas Diárias',
+                'ordering': ['data'],
+                'constraints': [models.UniqueConstraint(fields=('profissional', 'data'), name='estatistica_profissional_data_unica'), models.UniqueConstraint(condition=models.Q(('profissional__isnull', True)), fields=('data',), name='estatistica_clinica_data_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indice_data_nasc'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lembrete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('chave', models.CharField(max_length=100, unique=True, verbose_name='Chave de idempotência')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('descartado', 'Descartado'), ('falhou', 'Falhou')], default='pendente', max_length=10, verbose_name='Status')),
+                ('executar_em', models.DateTimeField(verbose_name='Executar em')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('trava', models.CharField(blank=True, editable=False, max_length=32, null=True)),
+                ('ultimo_erro', models.TextField(blank=True, null=True, verbose_name='Último erro')),
+                ('enviado_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('agendamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='core.agendamento', verbose_name='Agendamento')),
+            ],
+            options={
+                'verbose_name': 'Lembrete',
+                'verbose_name_plural': 'Lembretes',
+                'indexes': [models.Index(fields=['status', 'executar_em'], name='lembrete_status_executar_idx')],
+            },
+        ),
+    ]
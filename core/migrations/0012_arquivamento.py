@@ -0,0 +1,62 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_lembretes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendamentoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data', models.DateField(verbose_name='Data do Agendamento')),
+                ('horario_inicio', models.TimeField(blank=True, null=True, verbose_name='Horário de Início')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('confirmado', 'Confirmado'), ('concluido', 'Concluído'), ('cancelado', 'Cancelado')], max_length=10, verbose_name='Status do Agendamento')),
+                ('preco_total', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Preço total')),
+                ('duracao_total', models.PositiveIntegerField(verbose_name='Duração total (minutos)')),
+                ('arquivado_em', models.DateTimeField(verbose_name='Arquivado em')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agendamentos_arquivados', to='core.profissionaldepodologia', verbose_name='Profissional')),
+                ('servicos', models.ManyToManyField(related_name='agendamentos_arquivados', to='core.tratamentopodologico', verbose_name='Serviços')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agendamentos_arquivados', to='core.usuario', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Agendamento Arquivado',
+                'verbose_name_plural': 'Agendamentos Arquivados',
+                'ordering': ['data'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeedbackArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nota', models.PositiveSmallIntegerField(choices=[(1, '1 - Muito ruim'), (2, '2 - Ruim'), (3, '3 - Regular'), (4, '4 - Bom'), (5, '5 - Excelente')], verbose_name='Nota')),
+                ('comentario', models.TextField(blank=True, null=True, verbose_name='Comentário')),
+                ('data', models.DateTimeField(verbose_name='Data do Feedback')),
+                ('agendamento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feedback', to='core.agendamentoarquivado', verbose_name='Agendamento')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks_arquivados', to='core.usuario', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Feedback Arquivado',
+                'verbose_name_plural': 'Feedbacks Arquivados',
+                'ordering': ['-data'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='agendamentoarquivado',
+            index=models.Index(fields=['data', 'id'], name='arquivado_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamentoarquivado',
+            index=models.Index(fields=['usuario', 'data'], name='arquivado_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamentoarquivado',
+            index=models.Index(fields=['profissional', 'data'], name='arquivado_prof_data_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_coordenadas(apps, schema_editor):
+    from core import geolocalizacao
+
+    geolocalizacao.preencher(apps.get_model('core', 'ProfissionalDePodologia'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_arquivamento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='celula_lat',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='celula_lon',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='profissionaldepodologia',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddIndex(
+            model_name='profissionaldepodologia',
+            index=models.Index(condition=models.Q(('aprovado', True)), fields=['celula_lat', 'celula_lon', 'latitude', 'longitude', '-avaliacao_media'], name='profissional_celula_idx'),
+        ),
+        migrations.RunPython(preencher_coordenadas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_geolocalizacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recomendacao',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recomendacao', serialize=False, to='core.usuario', verbose_name='Cliente')),
+                ('profissionais', models.JSONField(default=list, verbose_name='Profissionais')),
+                ('pontuacoes', models.JSONField(default=list, verbose_name='Pontuações')),
+                ('gerada_em', models.DateTimeField(verbose_name='Gerada em')),
+            ],
+            options={
+                'verbose_name': 'Recomendação',
+                'verbose_name_plural': 'Recomendações',
+            },
+        ),
+    ]
@@ -1,13 +1,118 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from datetime import date
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Coalesce, ExtractYear
+from django.db.models.lookups import In
+
+
+class InLiteral(In):
+    """
+    Igual a ``__in``, mas com os valores escritos no SQL em vez de parâmetros.
+    O SQLite só usa um índice parcial quando consegue provar a condição do
+    índice a partir da consulta, e isso não é possível com parâmetros.
+
+    Registrado só no campo ``Agendamento.status`` (ver o fim da classe), e
+    só aceita valores de ``choices`` do campo: nada vindo do usuário chega ao SQL.
+    """
+    lookup_name = 'in_literal'
+
+    def process_rhs(self, compiler, connection):
+        validos = {str(valor) for valor, _ in self.lhs.output_field.flatchoices}
+        invalidos = {str(valor) for valor in self.rhs} - validos
+        if invalidos:
+            raise ValueError(f"Valores fora de choices em __in_literal: {sorted(invalidos)}")
+        valores = ', '.join("'%s'" % valor for valor in dict.fromkeys(map(str, self.rhs)))
+        return f'({valores})', ()
+
+
+def idade_em(data_nasc, hoje):
+    """
+    Anos completos em ``hoje``; quem nasceu em 29/02 faz aniversário em 01/03
+    nos anos não bissextos, como na anotação ``Usuario.objects.com_idade()``.
+    """
+    return hoje.year - data_nasc.year - ((hoje.month, hoje.day) < (data_nasc.month, data_nasc.day))
+
+
+def anos_antes(hoje, anos):
+    """
+    A data ``anos`` anos antes de ``hoje`` (29/02 vira 28/02 se preciso).
+    """
+    try:
+        return hoje.replace(year=hoje.year - anos)
+    except ValueError:
+        return hoje.replace(year=hoje.year - anos, day=28)
+
+
+def _condicao_de_idade(minima, maxima, hoje):
+    condicao = models.Q(data_nasc__isnull=False)
+    if minima is not None:
+        condicao &= models.Q(data_nasc__lte=anos_antes(hoje, minima))
+    if maxima is not None:
+        condicao &= models.Q(data_nasc__gt=anos_antes(hoje, maxima + 1))
+    return condicao
+
+
+class UsuarioQuerySet(models.QuerySet):
+    def com_idade(self, hoje=None):
+        """
+        Anota ``idade`` (anos completos) calculada no SQL a partir de
+        ``data_nasc``; nulo quando não há data de nascimento.
+        """
+        hoje = hoje or date.today()
+        ainda_nao_fez_aniversario = models.Q(data_nasc__month__gt=hoje.month) | models.Q(
+            data_nasc__month=hoje.month, data_nasc__day__gt=hoje.day
+        )
+        return self.annotate(idade=models.ExpressionWrapper(
+            models.Value(hoje.year) - ExtractYear('data_nasc') - models.Case(
+                models.When(ainda_nao_fez_aniversario, then=models.Value(1)), default=models.Value(0)
+            ),
+            output_field=models.IntegerField(),
+        ))
+
+    def idade_entre(self, minima=None, maxima=None, hoje=None):
+        """
+        Filtra pela idade (limites inclusivos) convertendo-a em um intervalo de
+        ``data_nasc``, que usa o índice em vez de calcular a idade por linha.
+        """
+        return self.filter(_condicao_de_idade(minima, maxima, hoje or date.today()))
+
+    def faixa_etaria(self, faixa, hoje=None):
+        return self.idade_entre(*Usuario.LIMITES_DAS_FAIXAS[faixa], hoje=hoje)
+
+    def distribuicao_por_faixa(self, hoje=None):
+        """
+        ``{faixa: total}`` de cada faixa etária, mais ``None`` para quem não
+        tem data de nascimento, em uma única consulta agregada.
+        """
+        hoje = hoje or date.today()
+        contagens = {
+            faixa: models.Count('pk', filter=_condicao_de_idade(minima, maxima, hoje))
+            for faixa, (minima, maxima) in Usuario.LIMITES_DAS_FAIXAS.items()
+        }
+        totais = self.aggregate(sem_data_nasc=models.Count('pk', filter=models.Q(data_nasc__isnull=True)), **contagens)
+        totais[None] = totais.pop('sem_data_nasc')
+        return totais
 
 
 class Usuario(models.Model):
+    FAIXAS_ETARIAS = [
+        ('pediatrico', 'Pediátrico (até 17 anos)'),
+        ('adulto', 'Adulto (18 a 59 anos)'),
+        ('idoso', 'Idoso (60 anos ou mais)'),
+    ]
+    # Idade mínima e máxima (inclusive) de cada faixa.
+    LIMITES_DAS_FAIXAS = {
+        'pediatrico': (None, 17),
+        'adulto': (18, 59),
+        'idoso': (60, None),
+    }
+
     nome = models.CharField('Nome', max_length=255)
     data_nasc = models.DateField('Data de Nascimento', null=True, blank=True)
     foto = models.ImageField("Foto", upload_to='avatares', blank=True, null=True)
+    # SHA-256 da foto, preenchido quando as variantes ficam prontas (ver core.imagens).
+    foto_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
     email = models.EmailField('E-mail')
     telefone = models.CharField("Telefone", max_length=15, null=True, blank=True)
     cpf = models.CharField("CPF", max_length=15, null=True, blank=True)
@@ -20,20 +125,36 @@ class Usuario(models.Model):
         related_name="usuario"
     )
 
+    objects = UsuarioQuerySet.as_manager()
+
+    _idade_anotada = None
+
     @property
     def idade(self):
+        """
+        Valor anotado por ``Usuario.objects.com_idade()`` ou, sem a anotação,
+        calculado com a mesma regra.
+        """
+        if self._idade_anotada is not None:
+            return self._idade_anotada
         if self.data_nasc:
-            hoje = date.today()
-            diferenca = hoje - self.data_nasc
-            return round(diferenca.days // 365.25)
+            return idade_em(self.data_nasc, date.today())
         return None
 
+    @idade.setter
+    def idade(self, valor):
+        self._idade_anotada = valor
+
     def __str__(self):
         return self.nome
 
     class Meta:
         verbose_name = "Usuário"
         verbose_name_plural = "Usuários"
+        indexes = [
+            # Filtros por faixa etária viram intervalos de data de nascimento.
+            models.Index(fields=['data_nasc'], name='usuario_data_nasc_idx'),
+        ]
 
 
 class Disponibilidade(models.Model):
@@ -83,6 +204,8 @@ class ProfissionalDePodologia(models.Model):
         related_name="profissional"
     )
     foto = models.ImageField("Foto", upload_to='avatares', blank=True, null=True)
+    # SHA-256 da foto, preenchido quando as variantes ficam prontas (ver core.imagens).
+    foto_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
     email = models.EmailField("E-mail", help_text="E-mail de contato do profissional")
     telefone_whatsapp = models.CharField(
         "Telefone/WhatsApp",
@@ -122,9 +245,35 @@ class ProfissionalDePodologia(models.Model):
     )
     aprovado = models.BooleanField("Aprovado", default=False)
 
+    # Centróide do bairro e célula da grade espacial, preenchidos por core.geolocalizacao.
+    latitude = models.FloatField("Latitude", null=True, blank=True, editable=False)
+    longitude = models.FloatField("Longitude", null=True, blank=True, editable=False)
+    celula_lat = models.IntegerField(null=True, blank=True, editable=False)
+    celula_lon = models.IntegerField(null=True, blank=True, editable=False)
+
+    # Resumo das avaliações, mantido por core.avaliacoes a cada Feedback salvo ou excluído.
+    avaliacoes_total = models.PositiveIntegerField("Avaliações", default=0, editable=False)
+    avaliacoes_soma = models.PositiveIntegerField("Soma das notas", default=0, editable=False)
+    avaliacoes_nota_1 = models.PositiveIntegerField("Notas 1", default=0, editable=False)
+    avaliacoes_nota_2 = models.PositiveIntegerField("Notas 2", default=0, editable=False)
+    avaliacoes_nota_3 = models.PositiveIntegerField("Notas 3", default=0, editable=False)
+    avaliacoes_nota_4 = models.PositiveIntegerField("Notas 4", default=0, editable=False)
+    avaliacoes_nota_5 = models.PositiveIntegerField("Notas 5", default=0, editable=False)
+    avaliacao_media = models.FloatField("Avaliação média", null=True, blank=True, editable=False)
+
     class Meta:
         verbose_name = "Profissional de Podologia"
         verbose_name_plural = "Profissionais de Podologia"
+        indexes = [
+            models.Index(fields=['aprovado', '-avaliacao_media'], name='profissional_avaliacao_idx'),
+            # Busca por proximidade, só entre os aprovados: recorte da grade, pontos de cada
+            # célula e, em cada ponto, os mais bem avaliados, sem ler a tabela.
+            models.Index(
+                fields=['celula_lat', 'celula_lon', 'latitude', 'longitude', '-avaliacao_media'],
+                condition=models.Q(aprovado=True),
+                name='profissional_celula_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.nome
@@ -153,6 +302,73 @@ class TratamentoPodologico(models.Model):
         return self.nome
 
 
+class AgendamentoQuerySet(models.QuerySet):
+    def ativos(self):
+        """
+        Agendamentos que ainda ocupam horário na agenda (pendentes ou confirmados).
+        """
+        return self.filter(status__in_literal=Agendamento.STATUS_ATIVOS)
+
+    def com_totais(self):
+        """
+        Anota ``preco_total`` e ``duracao_total`` (soma dos serviços) com
+        subconsultas correlacionadas, de modo que os totais podem ser filtrados
+        e ordenados no próprio SQL. Agendamentos sem serviços ficam com zero.
+        """
+        Relacao = Agendamento.servicos.through
+        servicos = Relacao.objects.filter(agendamento_id=models.OuterRef('pk')).order_by().values('agendamento_id')
+
+        def total(campo, output_field):
+            soma = servicos.annotate(total=models.Sum(f'tratamentopodologico__{campo}')).values('total')
+            return Coalesce(models.Subquery(soma, output_field=output_field), models.Value(0), output_field=output_field)
+
+        return self.annotate(
+            preco_total=total('preco', models.DecimalField(max_digits=12, decimal_places=2)),
+            duracao_total=total('duracao', models.IntegerField()),
+        )
+
+    def transicionar(self, status):
+        """
+        Leva todos os agendamentos do queryset para ``status`` com um único
+        UPDATE, aplicado só aos que podem fazer essa transição.
+        Retorna ``{id: resultado}``, com resultado 'alterado', 'inalterado'
+        (já estava no status) ou 'invalido' (transição não permitida).
+        """
+        origens = [origem for origem, destinos in Agendamento.TRANSICOES.items() if status in destinos]
+        from . import estatisticas  # evita import circular
+
+        with transaction.atomic():
+            anteriores = dict(self.order_by().values_list('id', 'status'))
+            # O UPDATE não dispara sinais; as estatísticas diárias são movidas aqui.
+            estatisticas.mover_em_lote(self.filter(status__in=origens), status)
+            self.filter(status__in=origens).update(status=status)
+            if status == 'cancelado':
+                OcupacaoDeHorario.objects.filter(
+                    reserva__agendamento__in=[pk for pk, anterior in anteriores.items() if anterior in origens]
+                ).delete()
+        resultados = {}
+        for pk, anterior in anteriores.items():
+            if anterior == status:
+                resultados[pk] = 'inalterado'
+            elif anterior in origens:
+                resultados[pk] = 'alterado'
+            else:
+                resultados[pk] = 'invalido'
+        return resultados
+
+    def transicionar_em_lote(self, transicoes):
+        """
+        Aplica ``{status: [ids]}`` com um UPDATE por status de destino, em uma
+        única transação. Ids fora do queryset aparecem como 'inexistente'.
+        """
+        resultados = {}
+        with transaction.atomic():
+            for status, ids in transicoes.items():
+                resultados.update(dict.fromkeys(ids, 'inexistente'))
+                resultados.update(self.filter(pk__in=ids).transicionar(status))
+        return resultados
+
+
 class Agendamento(models.Model):
     STATUS_CHOICES = [
         ('pendente', 'Pendente'),
@@ -160,6 +376,14 @@ class Agendamento(models.Model):
         ('concluido', 'Concluído'),
         ('cancelado', 'Cancelado'),
     ]
+    STATUS_ATIVOS = ('pendente', 'confirmado')
+    # Destinos permitidos a partir de cada status.
+    TRANSICOES = {
+        'pendente': {'confirmado', 'concluido', 'cancelado'},
+        'confirmado': {'concluido', 'cancelado'},
+        'concluido': set(),
+        'cancelado': set(),
+    }
 
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, verbose_name="Cliente", related_name="agendamentos")
     profissional = models.ForeignKey(
@@ -167,6 +391,12 @@ class Agendamento(models.Model):
     )
     servicos = models.ManyToManyField(TratamentoPodologico, verbose_name="Serviços", related_name="agendamentos")
     data = models.DateField(verbose_name="Data do Agendamento", default=date.today)
+    horario_inicio = models.TimeField(
+        verbose_name="Horário de Início",
+        null=True,
+        blank=True,
+        help_text="Horário de início do atendimento; a duração vem da soma dos serviços."
+    )
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
@@ -174,22 +404,61 @@ class Agendamento(models.Model):
         verbose_name="Status do Agendamento"
     )
 
+    objects = AgendamentoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Agendamento"
         verbose_name_plural = "Agendamentos"
         ordering = ['data']
+        indexes = [
+            # Chave da paginação por cursor (data, id).
+            models.Index(fields=['data', 'id'], name='agendamento_data_id_idx'),
+            # Agenda do profissional por dia e status.
+            models.Index(fields=['profissional', 'data', 'status'], name='agendamento_prof_data_st_idx'),
+            # Apenas os agendamentos que ainda ocupam horário na agenda.
+            models.Index(
+                fields=['data', 'profissional', 'horario_inicio'],
+                condition=models.Q(status__in=['pendente', 'confirmado']),
+                name='agendamento_ativos_idx',
+            ),
+            # Histórico do cliente.
+            models.Index(fields=['usuario', 'data'], name='agendamento_usuario_data_idx'),
+        ]
 
     def __str__(self):
         return f"Agendamento em {self.data} - {self.usuario.nome}"
 
+    def save(self, *args, **kwargs):
+        # Estatísticas e ocupações de horário acompanham o agendamento pelos
+        # sinais de core.signals, na mesma transação.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def marcar_concluido(self):
-        self.status = 'concluido'
-        self.save()
+        self.transicionar('concluido')
 
     def cancelar(self):
-        self.status = 'cancelado'
-        self.save()
+        self.transicionar('cancelado')
 
+    def transicionar(self, status):
+        """
+        Muda o status regravando só essa coluna. Para vários agendamentos de
+        uma vez, use ``Agendamento.objects.filter(...).transicionar(status)``.
+        """
+        if status != self.status and status not in self.TRANSICOES[self.status]:
+            raise ValidationError(
+                f"Não é possível passar de {self.get_status_display()} para {dict(self.STATUS_CHOICES)[status]}."
+            )
+        self.status = status
+        with transaction.atomic():
+            self.save(update_fields=['status'])
+            if status == 'cancelado':
+                # O horário volta a ficar livre para novas reservas.
+                OcupacaoDeHorario.objects.filter(reserva__agendamento=self).delete()
+
+
+# Lookup do índice parcial dos agendamentos ativos; nenhum outro campo ganha __in_literal.
+Agendamento._meta.get_field('status').register_lookup(InLiteral)
 
 
 class Feedback(models.Model):
@@ -233,10 +502,22 @@ class Feedback(models.Model):
         verbose_name = "Feedback"
         verbose_name_plural = "Feedbacks"
         ordering = ['-data']
+        indexes = [
+            # Chave da paginação por cursor (-data, -id).
+            models.Index(fields=['-data', '-id'], name='feedback_data_id_idx'),
+            # Feedbacks do cliente, mais recentes primeiro.
+            models.Index(fields=['usuario', '-data'], name='feedback_usuario_data_idx'),
+        ]
 
     def __str__(self):
         return f"Feedback de {self.usuario.nome} - Nota: {self.nota}"
 
+    def save(self, *args, **kwargs):
+        # O resumo de avaliações do profissional é atualizado pelos sinais de
+        # core.signals e precisa ficar na mesma transação do feedback.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def clean(self):
         """
         Validações adicionais:
@@ -246,3 +527,223 @@ class Feedback(models.Model):
             raise ValidationError("O feedback só pode ser enviado para atendimentos concluídos.")
 
 
+class AgendamentoArquivado(models.Model):
+    """
+    Agendamento concluído ou cancelado retirado da tabela quente por
+    ``core.arquivamento``, com o mesmo id. Os totais ficam congelados com os
+    preços do momento do arquivamento.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, verbose_name="Cliente", related_name="agendamentos_arquivados"
+    )
+    profissional = models.ForeignKey(
+        ProfissionalDePodologia, on_delete=models.CASCADE, verbose_name="Profissional",
+        related_name="agendamentos_arquivados"
+    )
+    servicos = models.ManyToManyField(
+        TratamentoPodologico, verbose_name="Serviços", related_name="agendamentos_arquivados"
+    )
+    data = models.DateField(verbose_name="Data do Agendamento")
+    horario_inicio = models.TimeField(verbose_name="Horário de Início", null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Agendamento.STATUS_CHOICES, verbose_name="Status do Agendamento")
+    preco_total = models.DecimalField("Preço total", max_digits=12, decimal_places=2)
+    duracao_total = models.PositiveIntegerField("Duração total (minutos)")
+    arquivado_em = models.DateTimeField(verbose_name="Arquivado em")
+
+    class Meta:
+        verbose_name = "Agendamento Arquivado"
+        verbose_name_plural = "Agendamentos Arquivados"
+        ordering = ['data']
+        indexes = [
+            # Chave da paginação por cursor (data, id).
+            models.Index(fields=['data', 'id'], name='arquivado_data_id_idx'),
+            models.Index(fields=['usuario', 'data'], name='arquivado_usuario_data_idx'),
+            models.Index(fields=['profissional', 'data'], name='arquivado_prof_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"Agendamento arquivado em {self.data} - {self.usuario_id}"
+
+
+class FeedbackArquivado(models.Model):
+    """
+    Feedback de um agendamento arquivado, com o mesmo id do original.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, verbose_name="Cliente", related_name="feedbacks_arquivados"
+    )
+    agendamento = models.OneToOneField(
+        AgendamentoArquivado, on_delete=models.CASCADE, verbose_name="Agendamento", related_name="feedback"
+    )
+    nota = models.PositiveSmallIntegerField(choices=Feedback.NOTA_CHOICES, verbose_name="Nota")
+    comentario = models.TextField(verbose_name="Comentário", blank=True, null=True)
+    data = models.DateTimeField(verbose_name="Data do Feedback")
+
+    class Meta:
+        verbose_name = "Feedback Arquivado"
+        verbose_name_plural = "Feedbacks Arquivados"
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"Feedback arquivado de {self.usuario_id} - Nota: {self.nota}"
+
+
+class Reserva(models.Model):
+    """
+    Horário retido por alguns minutos enquanto o agendamento é concluído
+    (ver ``core.reservas``). Os intervalos da grade que ele ocupa ficam em
+    ``OcupacaoDeHorario``.
+    """
+    STATUS_CHOICES = [
+        ('retida', 'Retida'),
+        ('confirmada', 'Confirmada'),
+    ]
+
+    profissional = models.ForeignKey(
+        ProfissionalDePodologia, on_delete=models.CASCADE, verbose_name="Profissional", related_name="reservas"
+    )
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, verbose_name="Cliente", related_name="reservas")
+    servicos = models.ManyToManyField(TratamentoPodologico, verbose_name="Serviços", related_name="reservas")
+    data = models.DateField(verbose_name="Data")
+    horario_inicio = models.TimeField(verbose_name="Horário de Início")
+    duracao = models.PositiveIntegerField(verbose_name="Duração (minutos)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='retida', verbose_name="Status")
+    expira_em = models.DateTimeField(verbose_name="Expira em")
+    agendamento = models.OneToOneField(
+        Agendamento,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Agendamento",
+        related_name="reserva"
+    )
+    criada_em = models.DateTimeField(auto_now_add=True, verbose_name="Criada em")
+
+    class Meta:
+        verbose_name = "Reserva de Horário"
+        verbose_name_plural = "Reservas de Horário"
+
+    def __str__(self):
+        return f"Reserva de {self.profissional_id} em {self.data} às {self.horario_inicio}"
+
+
+class OcupacaoDeHorario(models.Model):
+    """
+    Um intervalo da grade de horários (``agenda.INTERVALO_PADRAO`` minutos)
+    ocupado por uma reserva. A restrição única faz do próprio INSERT a
+    disputa pelo horário: das reservas concorrentes, só uma consegue gravar.
+    """
+    reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, related_name="ocupacoes")
+    profissional = models.ForeignKey(ProfissionalDePodologia, on_delete=models.CASCADE, related_name="+")
+    data = models.DateField()
+    intervalo = models.PositiveSmallIntegerField(help_text="Índice do intervalo no dia, a partir da meia-noite.")
+
+    class Meta:
+        verbose_name = "Ocupação de Horário"
+        verbose_name_plural = "Ocupações de Horário"
+        constraints = [
+            models.UniqueConstraint(fields=['profissional', 'data', 'intervalo'], name='ocupacao_horario_unica'),
+        ]
+
+
+class EstatisticaDiaria(models.Model):
+    """
+    Totais de agendamentos e receita (soma do preço dos serviços) por dia,
+    por status, de um profissional ou, com ``profissional`` nulo, da clínica
+    toda. Mantida de forma incremental por ``core.estatisticas``.
+    """
+    data = models.DateField(verbose_name="Data")
+    profissional = models.ForeignKey(
+        ProfissionalDePodologia,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Profissional",
+        related_name="estatisticas"
+    )
+    total_pendente = models.IntegerField("Pendentes", default=0)
+    total_confirmado = models.IntegerField("Confirmados", default=0)
+    total_concluido = models.IntegerField("Concluídos", default=0)
+    total_cancelado = models.IntegerField("Cancelados", default=0)
+    receita_pendente = models.DecimalField("Receita pendente", max_digits=12, decimal_places=2, default=0)
+    receita_confirmado = models.DecimalField("Receita confirmada", max_digits=12, decimal_places=2, default=0)
+    receita_concluido = models.DecimalField("Receita concluída", max_digits=12, decimal_places=2, default=0)
+    receita_cancelado = models.DecimalField("Receita cancelada", max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Estatística Diária"
+        verbose_name_plural = "Estatísticas Diárias"
+        ordering = ['data']
+        constraints = [
+            models.UniqueConstraint(fields=['profissional', 'data'], name='estatistica_profissional_data_unica'),
+            models.UniqueConstraint(
+                fields=['data'], condition=models.Q(profissional__isnull=True), name='estatistica_clinica_data_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Estatísticas de {self.data}"
+
+
+class Lembrete(models.Model):
+    """
+    Lembrete de um agendamento a ser enviado em ``executar_em`` (ver
+    ``core.lembretes``). A ``chave`` identifica o envio (agendamento, tipo,
+    data e horário): varreduras repetidas não o enfileiram de novo e um
+    agendamento remarcado ganha outro lembrete.
+    """
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('descartado', 'Descartado'),
+        ('falhou', 'Falhou'),
+    ]
+
+    agendamento = models.ForeignKey(
+        Agendamento, on_delete=models.CASCADE, verbose_name="Agendamento", related_name="lembretes"
+    )
+    tipo = models.CharField(max_length=20, verbose_name="Tipo")
+    chave = models.CharField(max_length=100, unique=True, verbose_name="Chave de idempotência")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pendente', verbose_name="Status")
+    # Próxima execução: o horário do envio, o da nova tentativa ou o fim do prazo de quem o reivindicou.
+    executar_em = models.DateTimeField(verbose_name="Executar em")
+    tentativas = models.PositiveSmallIntegerField(default=0, verbose_name="Tentativas")
+    trava = models.CharField(max_length=32, null=True, blank=True, editable=False)
+    ultimo_erro = models.TextField(null=True, blank=True, verbose_name="Último erro")
+    enviado_em = models.DateTimeField(null=True, blank=True, verbose_name="Enviado em")
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+
+    class Meta:
+        verbose_name = "Lembrete"
+        verbose_name_plural = "Lembretes"
+        indexes = [
+            # Fila: os lembretes vencidos de cada status, na ordem de execução.
+            models.Index(fields=['status', 'executar_em'], name='lembrete_status_executar_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lembrete {self.tipo} do agendamento {self.agendamento_id}"
+
+
+class Recomendacao(models.Model):
+    """
+    Profissionais recomendados a um cliente, do mais ao menos indicado, com a
+    pontuação de cada um. Gerada offline por ``core.recomendacoes``: uma linha
+    por cliente, lida pela chave primária.
+    """
+    usuario = models.OneToOneField(
+        Usuario, on_delete=models.CASCADE, primary_key=True, verbose_name="Cliente", related_name="recomendacao"
+    )
+    profissionais = models.JSONField(default=list, verbose_name="Profissionais")
+    pontuacoes = models.JSONField(default=list, verbose_name="Pontuações")
+    gerada_em = models.DateTimeField(verbose_name="Gerada em")
+
+    class Meta:
+        verbose_name = "Recomendação"
+        verbose_name_plural = "Recomendações"
+
+    def __str__(self):
+        return f"Recomendações de {self.usuario_id}"
@@ -0,0 +1,187 @@
+"""
+Paginação por cursor (keyset) para as listagens da API.
+
+O cursor guarda os valores das colunas de ordenação do último (ou primeiro)
+item da página, e a página seguinte é buscada com ``WHERE (data, id) > (...)``
+em vez de ``OFFSET``. Assim, a página N custa o mesmo que a primeira e novas
+inserções não deslocam os itens já vistos.
+"""
+import base64
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação keyset sobre ``ordering``, que deve terminar em um campo único
+    (normalmente ``id``) para que a ordem seja total.
+    """
+    ordering = ('data', 'id')
+    # Ordenações alternativas aceitas em ``?ordenacao=``, cada uma também
+    # terminando em um campo único. Podem usar anotações do queryset.
+    orderings = {}
+    ordering_query_param = 'ordenacao'
+    page_size = 50
+    page_size_query_param = 'tamanho'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+    invalid_ordering_message = 'Ordenação inválida.'
+
+    def __init__(self):
+        self._ordenar_por(self.ordering)
+
+    def _ordenar_por(self, ordering):
+        self.campos = [campo.lstrip('-') for campo in ordering]
+        self.descendentes = [campo.startswith('-') for campo in ordering]
+
+    def get_ordering(self, request):
+        nome = request.query_params.get(self.ordering_query_param)
+        if not nome:
+            return self.ordering
+        if nome not in self.orderings:
+            raise ValidationError({self.ordering_query_param: [self.invalid_ordering_message]})
+        return self.orderings[nome]
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(tamanho, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._concluir(list(self._pagina(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Versão assíncrona de ``paginate_queryset``, para as views ASGI.
+        """
+        return self._concluir([item async for item in self._pagina(queryset, request)])
+
+    def _pagina(self, queryset, request):
+        """
+        Queryset (ainda não avaliado) com os itens da página e um a mais, que
+        indica se há página seguinte.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.tamanho = self.get_page_size(request)
+        self._ordenar_por(self.get_ordering(request))
+
+        self.cursor = self.decode_cursor(request, queryset)
+        self.reverso = self.cursor is not None and self.cursor['reverso']
+        ordem = [
+            ('-' if descendente != self.reverso else '') + campo
+            for campo, descendente in zip(self.campos, self.descendentes)
+        ]
+        queryset = queryset.order_by(*ordem)
+        if self.cursor is not None:
+            queryset = queryset.filter(self._depois_de(self.cursor['valores'], self.reverso))
+        return queryset[:self.tamanho + 1]
+
+    def _concluir(self, itens):
+        tem_mais = len(itens) > self.tamanho
+        itens = itens[:self.tamanho]
+        if self.reverso:
+            itens.reverse()
+            self.tem_proxima, self.tem_anterior = True, tem_mais
+        else:
+            self.tem_proxima, self.tem_anterior = tem_mais, self.cursor is not None
+        self.itens = itens
+        return itens
+
+    def _depois_de(self, valores, reverso):
+        """
+        Filtro "estritamente depois de ``valores``" na ordem efetiva. O primeiro
+        termo (``data >= valor``) permite ao banco posicionar-se no índice.
+        """
+        def comparacao(indice, estrito):
+            descendente = self.descendentes[indice] != reverso
+            lookup = ('lt' if descendente else 'gt') + ('' if estrito else 'e')
+            return Q(**{f'{self.campos[indice]}__{lookup}': valores[indice]})
+
+        alternativas = []
+        for indice in range(len(self.campos)):
+            iguais = {campo: valor for campo, valor in zip(self.campos[:indice], valores[:indice])}
+            alternativas.append(Q(**iguais) & comparacao(indice, estrito=True))
+        return comparacao(0, estrito=False) & reduce(operator.or_, alternativas)
+
+    @staticmethod
+    def _campo(queryset, nome):
+        """
+        Campo do modelo ou, para anotações (ex.: ``preco_total``), o ``output_field`` da expressão.
+        """
+        anotacao = queryset.query.annotations.get(nome)
+        if anotacao is not None:
+            return anotacao.output_field
+        return queryset.model._meta.get_field(nome)
+
+    @staticmethod
+    def _texto(item, nome):
+        try:
+            return item._meta.get_field(nome).value_to_string(item)
+        except FieldDoesNotExist:
+            return str(getattr(item, nome))
+
+    def decode_cursor(self, request, queryset):
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(codificado.encode('ascii')).decode('utf-8'))
+            valores = [
+                self._campo(queryset, campo).to_python(valor)
+                for campo, valor in zip(self.campos, dados['v'], strict=True)
+            ]
+            return {'valores': valores, 'reverso': bool(dados.get('r'))}
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverso):
+        valores = [self._texto(item, campo) for campo in self.campos]
+        dados = json.dumps({'v': valores, 'r': int(reverso)}, separators=(',', ':'))
+        codificado = base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, codificado)
+
+    def get_next_link(self):
+        if not self.tem_proxima or not self.itens:
+            return None
+        return self.encode_cursor(self.itens[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.tem_anterior or not self.itens:
+            return None
+        return self.encode_cursor(self.itens[0], reverso=True)
+
+    def dados_paginados(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.dados_paginados(data))
+
+
+class AgendamentoPagination(KeysetPagination):
+    ordering = ('data', 'id')
+    # Exigem ``Agendamento.objects.com_totais()``.
+    orderings = {
+        'preco_total': ('preco_total', 'id'),
+        '-preco_total': ('-preco_total', '-id'),
+        'duracao_total': ('duracao_total', 'id'),
+        '-duracao_total': ('-duracao_total', '-id'),
+    }
+
+
+class FeedbackPagination(KeysetPagination):
+    ordering = ('-data', '-id')
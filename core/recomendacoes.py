@@ -0,0 +1,229 @@
+"""
+Recomendação de profissionais para cada cliente (tabela ``Recomendacao``).
+
+``gerar()`` é um job offline (``manage.py gerar_recomendacoes``), todo em
+operações vetorizadas do NumPy/SciPy sobre o histórico inteiro:
+
+1. as notas dos feedbacks, atuais e arquivados, viram uma matriz esparsa
+   cliente × profissional, com a nota centrada em 3 (de -1 a 1; a média, se o
+   cliente avaliou o mesmo profissional mais de uma vez). Os tipos de
+   tratamento dos agendamentos não cancelados dão o perfil de cada cliente e
+   de cada profissional (cliente × tipo e profissional × tipo);
+2. a similaridade entre profissionais é o cosseno entre as colunas de notas,
+   encolhida quando poucos clientes avaliaram os dois (``ENCOLHIMENTO``). Cada
+   profissional guarda só os ``VIZINHOS`` mais similares;
+3. a pontuação de um profissional para o cliente é a média das notas que o
+   cliente deu aos vizinhos dele, ponderada pela similaridade, mais
+   ``PESO_DOS_TIPOS`` vezes o cosseno entre os perfis de tipos. É calculada
+   em lotes de clientes, com produtos de matrizes, e os ``TOP_K`` melhores de
+   cada cliente saem de um ``argpartition``, fora os já avaliados por ele e os
+   não aprovados;
+4. cada cliente ganha uma linha, gravada pela fila de escrita; as dos
+   clientes que ficaram sem recomendação são apagadas no fim.
+
+A API só lê a linha do cliente pela chave primária (e os profissionais
+dela), sem calcular nada na requisição.
+"""
+import numpy as np
+from scipy import sparse
+
+from django.db.models import Count
+from django.utils import timezone
+
+from . import escrita
+from .models import (
+    Agendamento, AgendamentoArquivado, Feedback, FeedbackArquivado, ProfissionalDePodologia, Recomendacao,
+    TratamentoPodologico
+)
+
+TOP_K = 20
+VIZINHOS = 50
+ENCOLHIMENTO = 5  # clientes em comum que valem metade da confiança
+PESO_DOS_TIPOS = 0.5
+CELULAS_POR_LOTE = 4_000_000  # clientes × profissionais pontuados de cada vez
+LOTE_DE_GRAVACAO = 2000
+TIPOS = [tipo for tipo, _ in TratamentoPodologico.TIPOS_TRATAMENTO]
+
+
+def _notas():
+    """
+    ``(clientes, profissionais, notas)`` de todos os feedbacks, em arrays.
+    """
+    partes = [
+        np.array(modelo.objects.order_by().values_list('usuario_id', 'agendamento__profissional_id', 'nota'),
+                 dtype=np.int64).reshape(-1, 3)
+        for modelo in (Feedback, FeedbackArquivado)
+    ]
+    notas = np.concatenate(partes)
+    return notas[:, 0], notas[:, 1], notas[:, 2]
+
+
+def _tipos(campo):
+    """
+    ``(ids, tipos, quantidades)`` dos serviços dos agendamentos não
+    cancelados, agrupados por ``campo`` (``'usuario'`` ou ``'profissional'``)
+    e tipo de tratamento.
+    """
+    indice = {tipo: posicao for posicao, tipo in enumerate(TIPOS)}
+    linhas = []
+    for modelo in (Agendamento, AgendamentoArquivado):
+        Relacao = modelo.servicos.through
+        chave = modelo._meta.model_name
+        linhas.extend(
+            Relacao.objects.exclude(**{f'{chave}__status': 'cancelado'}).order_by()
+            .values_list(f'{chave}__{campo}_id', 'tratamentopodologico__tipo').annotate(quantidade=Count('id'))
+        )
+    linhas = [(pk, indice[tipo], quantidade) for pk, tipo, quantidade in linhas if tipo in indice]
+    if not linhas:
+        return (np.empty(0, dtype=np.int64),) * 3
+    return tuple(np.array(coluna, dtype=np.int64) for coluna in zip(*linhas))
+
+
+def _perfis(linhas, tipos, quantidades, tamanho):
+    """
+    Matriz densa ``tamanho`` × tipos com as quantidades, cada linha de norma 1.
+    """
+    perfis = np.zeros((tamanho, len(TIPOS)), dtype=np.float32)
+    np.add.at(perfis, (linhas, tipos), quantidades)
+    normas = np.linalg.norm(perfis, axis=1, keepdims=True)
+    return np.divide(perfis, normas, out=perfis, where=normas > 0)
+
+
+def similaridades(notas, presencas, vizinhos=VIZINHOS, encolhimento=ENCOLHIMENTO):
+    """
+    Matriz esparsa profissional × profissional em que a linha ``p`` tem os
+    ``vizinhos`` profissionais mais similares a ``p`` (só similaridades
+    positivas). ``notas`` e ``presencas`` são as matrizes cliente × profissional
+    das notas centradas e de quem avaliou quem.
+    """
+    normas = np.sqrt(np.asarray(notas.multiply(notas).sum(axis=0), dtype=np.float32).ravel())
+    inversas = np.divide(1, normas, out=np.zeros_like(normas), where=normas > 0)
+    cosseno = sparse.diags(inversas) @ (notas.T @ notas).tocsr() @ sparse.diags(inversas)
+    em_comum = (presencas.T @ presencas).tocsr()
+    em_comum.data = em_comum.data / (em_comum.data + encolhimento)
+    similar = cosseno.multiply(em_comum).tocsr()
+    similar = (similar - sparse.diags(similar.diagonal())).tocsr()
+    similar.data[similar.data < 0] = 0
+    similar.eliminate_zeros()
+
+    # Só os vizinhos mais similares de cada linha.
+    por_linha = np.diff(similar.indptr)
+    for linha in np.flatnonzero(por_linha > vizinhos):
+        inicio, fim = similar.indptr[linha], similar.indptr[linha + 1]
+        valores = similar.data[inicio:fim]
+        valores[np.argpartition(valores, -vizinhos)[:-vizinhos]] = 0
+    similar.eliminate_zeros()
+    return similar.astype(np.float32)
+
+
+def _melhores(pontuacoes, k):
+    """
+    ``(colunas, pontuacoes)`` dos ``k`` maiores valores de cada linha, em ordem decrescente.
+    """
+    k = min(k, pontuacoes.shape[1])
+    colunas = np.argpartition(-pontuacoes, k - 1, axis=1)[:, :k]
+    valores = np.take_along_axis(pontuacoes, colunas, axis=1)
+    ordem = np.argsort(-valores, axis=1, kind='stable')
+    return np.take_along_axis(colunas, ordem, axis=1), np.take_along_axis(valores, ordem, axis=1)
+
+
+def calcular(clientes, profissionais, notas, tipos_dos_clientes, tipos_dos_profissionais, aprovados, k=TOP_K,
+             vizinhos=VIZINHOS, peso_dos_tipos=PESO_DOS_TIPOS, celulas_por_lote=CELULAS_POR_LOTE):
+    """
+    Gera ``(cliente, [profissionais], [pontuacoes])`` para cada cliente com
+    histórico, a partir de arrays: ``clientes``, ``profissionais`` e ``notas``
+    dos feedbacks; ``tipos_dos_clientes`` e ``tipos_dos_profissionais``,
+    ``(ids, índices em TIPOS, quantidades)``; ``aprovados``, os ids dos
+    profissionais que podem ser recomendados.
+    """
+    ids_clientes, linhas = np.unique(np.concatenate([clientes, tipos_dos_clientes[0]]), return_inverse=True)
+    ids_profissionais, colunas = np.unique(
+        np.concatenate([profissionais, tipos_dos_profissionais[0], aprovados]), return_inverse=True
+    )
+    forma = (len(ids_clientes), len(ids_profissionais))
+    if not all(forma):
+        return
+    avaliacoes = len(notas)
+    linhas_das_notas, colunas_das_notas = linhas[:avaliacoes], colunas[:avaliacoes]
+
+    # Notas repetidas do mesmo par viram a média; a presença marca quem avaliou quem.
+    # As duas matrizes vêm das mesmas coordenadas e têm a mesma estrutura.
+    presencas = sparse.csr_matrix(
+        (np.ones(avaliacoes, dtype=np.float32), (linhas_das_notas, colunas_das_notas)), shape=forma
+    )
+    somas = sparse.csr_matrix(
+        ((np.asarray(notas, dtype=np.float32) - 3) / 2, (linhas_das_notas, colunas_das_notas)), shape=forma
+    )
+    centradas = somas.copy()
+    centradas.data = somas.data / presencas.data
+    presencas.data[:] = 1
+
+    vizinhanca = similaridades(centradas, presencas, vizinhos).T.tocsr()
+    perfis_dos_clientes = _perfis(
+        linhas[avaliacoes:], tipos_dos_clientes[1], tipos_dos_clientes[2], forma[0]
+    )
+    inicio_dos_tipos = avaliacoes + len(tipos_dos_profissionais[0])
+    perfis_dos_profissionais = _perfis(
+        colunas[avaliacoes:inicio_dos_tipos], tipos_dos_profissionais[1], tipos_dos_profissionais[2], forma[1]
+    )
+    recomendaveis = np.zeros(forma[1], dtype=bool)
+    recomendaveis[colunas[inicio_dos_tipos:]] = True
+
+    lote = max(1, celulas_por_lote // forma[1])
+    for inicio in range(0, forma[0], lote):
+        fatia = slice(inicio, min(inicio + lote, forma[0]))
+        numerador = (centradas[fatia] @ vizinhanca).toarray()
+        denominador = (presencas[fatia] @ vizinhanca).toarray()
+        pontuacoes = np.divide(numerador, denominador, out=np.zeros_like(numerador), where=denominador > 0)
+        pontuacoes += peso_dos_tipos * (perfis_dos_clientes[fatia] @ perfis_dos_profissionais.T)
+        pontuacoes[:, ~recomendaveis] = -np.inf
+        avaliados = presencas[fatia].nonzero()
+        pontuacoes[avaliados] = -np.inf
+
+        escolhidos, valores = _melhores(pontuacoes, k)
+        for cliente, colunas_escolhidas, pontos in zip(ids_clientes[fatia], escolhidos, valores):
+            validos = pontos > 0
+            if validos.any():
+                yield (
+                    int(cliente), ids_profissionais[colunas_escolhidas[validos]].tolist(),
+                    np.round(pontos[validos].astype(float), 4).tolist(),
+                )
+
+
+def _gravar(linhas, agora):
+    Recomendacao.objects.bulk_create(
+        [
+            Recomendacao(usuario_id=cliente, profissionais=profissionais, pontuacoes=pontuacoes, gerada_em=agora)
+            for cliente, profissionais, pontuacoes in linhas
+        ],
+        update_conflicts=True, unique_fields=['usuario'], update_fields=['profissionais', 'pontuacoes', 'gerada_em'],
+    )
+    return len(linhas)
+
+
+def _expurgar(agora):
+    return Recomendacao.objects.filter(gerada_em__lt=agora).delete()[0]
+
+
+def gerar(k=TOP_K, agora=None, lote=LOTE_DE_GRAVACAO):
+    """
+    Recalcula as recomendações de todos os clientes. Retorna quantos
+    clientes ficaram com recomendações.
+    """
+    agora = agora or timezone.now()
+    aprovados = np.fromiter(
+        ProfissionalDePodologia.objects.filter(aprovado=True).values_list('pk', flat=True).iterator(), dtype=np.int64
+    )
+    linhas = calcular(*_notas(), _tipos('usuario'), _tipos('profissional'), aprovados, k=k)
+
+    gravadas = 0
+    pendentes = []
+    for linha in linhas:
+        pendentes.append(linha)
+        if len(pendentes) == lote:
+            gravadas += escrita.executar(_gravar, pendentes, agora)
+            pendentes = []
+    if pendentes:
+        gravadas += escrita.executar(_gravar, pendentes, agora)
+    escrita.executar(_expurgar, agora)
+    return gravadas
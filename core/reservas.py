@@ -0,0 +1,167 @@
+"""
+Reserva de horários sem agendamento em dobro.
+
+Reservar é um processo de dois passos:
+
+1. ``reservar()`` retém o horário por ``RETENCAO``. Para isso, grava uma
+   ``Reserva`` e uma ``OcupacaoDeHorario`` por intervalo da grade que o
+   atendimento cobre. A restrição única ``(profissional, data, intervalo)``
+   decide a disputa no próprio INSERT: de duas recepcionistas reservando o
+   mesmo horário, uma grava e a outra recebe ``HorarioIndisponivel``. Não há
+   lock de tabela nem leitura prévia da agenda.
+2. ``confirmar()`` transforma a reserva retida (e ainda válida) em
+   ``Agendamento``. As ocupações continuam valendo até o agendamento ser
+   cancelado, excluído, remarcado (outro dia, horário ou profissional) ou ter
+   os serviços trocados (ver ``core.signals``). Daí em diante, um agendamento
+   ainda ativo é conferido diretamente, como os criados fora deste fluxo.
+
+A abordagem é otimista. Se o conflito for com reservas já expiradas, elas são
+apagadas e o INSERT é repetido. Se o banco estiver ocupado ("database is
+locked"), a tentativa é refeita após uma espera crescente com jitter.
+"""
+import random
+import time as relogio
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .agenda import DIAS_POR_INDICE, INTERVALO_PADRAO, _mesclar, _minutos
+from .models import Agendamento, OcupacaoDeHorario, ProfissionalDePodologia, Reserva, TratamentoPodologico
+
+RETENCAO = timedelta(minutes=5)
+TENTATIVAS = 5
+ESPERA_INICIAL = 0.01  # segundos
+
+
+class HorarioIndisponivel(Exception):
+    pass
+
+
+class ReservaExpirada(Exception):
+    pass
+
+
+def intervalos(horario_inicio, duracao, intervalo=INTERVALO_PADRAO):
+    """
+    Índices dos intervalos da grade cobertos por um atendimento.
+    """
+    inicio = _minutos(horario_inicio)
+    return range(inicio // intervalo, -(-(inicio + max(duracao, 1)) // intervalo))
+
+
+def _dentro_do_expediente(profissional_id, data, inicio, fim):
+    Janela = ProfissionalDePodologia.disponibilidade.through
+    dia = next(nome for nome, indice in DIAS_POR_INDICE.items() if indice == data.weekday())
+    janelas = Janela.objects.filter(
+        profissionaldepodologia_id=profissional_id,
+        profissionaldepodologia__aprovado=True,
+        disponibilidade__dia=dia,
+    ).values_list('disponibilidade__horario_inicio', 'disponibilidade__horario_fim')
+    return any(
+        inicio_janela <= inicio and fim <= fim_janela
+        for inicio_janela, fim_janela in _mesclar((_minutos(a), _minutos(b)) for a, b in janelas)
+    )
+
+
+def _conflita_com_agendamentos_sem_ocupacoes(profissional_id, data, inicio, fim):
+    """
+    Agendamentos criados fora deste fluxo (admin, formulário) não têm
+    ocupações, e os remarcados ou com outros serviços perdem as da reserva;
+    eles são conferidos diretamente. Os sem ``horario_inicio`` não conflitam
+    com nada, como em ``agenda.agendamentos_do_periodo``.
+    """
+    agendamentos = Agendamento.objects.ativos().filter(
+        ~Exists(OcupacaoDeHorario.objects.filter(reserva__agendamento=OuterRef('pk'))),
+        profissional_id=profissional_id, data=data, horario_inicio__isnull=False,
+    ).order_by().values_list('horario_inicio').annotate(duracao=Coalesce(Sum('servicos__duracao'), 0))
+    for horario_inicio, duracao in agendamentos:
+        outro = _minutos(horario_inicio)
+        if outro < fim and inicio < outro + max(duracao, INTERVALO_PADRAO):
+            return True
+    return False
+
+
+def _liberar_expiradas(profissional_id, data, faixa, agora):
+    """
+    Apaga as reservas vencidas que ocupam a faixa. Retorna se havia alguma.
+    """
+    expiradas = Reserva.objects.filter(
+        status='retida', expira_em__lt=agora,
+        ocupacoes__profissional_id=profissional_id, ocupacoes__data=data, ocupacoes__intervalo__in=faixa,
+    ).values_list('pk', flat=True).distinct()
+    apagadas, _ = Reserva.objects.filter(pk__in=list(expiradas)).delete()
+    return apagadas > 0
+
+
+def reservar(profissional_id, usuario_id, data, horario_inicio, servicos_ids, agora=None):
+    """
+    Retém o horário e retorna a ``Reserva``. Levanta ``HorarioIndisponivel``
+    se ele estiver fora do expediente ou ocupado.
+    """
+    agora = agora or timezone.now()
+    duracao = TratamentoPodologico.objects.filter(pk__in=servicos_ids).aggregate(
+        total=Coalesce(Sum('duracao'), 0)
+    )['total']
+    inicio = _minutos(horario_inicio)
+    fim = inicio + duracao
+    if not _dentro_do_expediente(profissional_id, data, inicio, fim):
+        raise HorarioIndisponivel("Horário fora do expediente do profissional.")
+    if _conflita_com_agendamentos_sem_ocupacoes(profissional_id, data, inicio, fim):
+        raise HorarioIndisponivel("Horário já ocupado.")
+
+    faixa = intervalos(horario_inicio, duracao)
+    espera = ESPERA_INICIAL
+    for tentativa in range(TENTATIVAS):
+        try:
+            with transaction.atomic():
+                reserva = Reserva.objects.create(
+                    profissional_id=profissional_id, usuario_id=usuario_id, data=data,
+                    horario_inicio=horario_inicio, duracao=duracao, expira_em=agora + RETENCAO,
+                )
+                reserva.servicos.set(servicos_ids)
+                OcupacaoDeHorario.objects.bulk_create([
+                    OcupacaoDeHorario(reserva=reserva, profissional_id=profissional_id, data=data, intervalo=intervalo)
+                    for intervalo in faixa
+                ])
+            return reserva
+        except IntegrityError:
+            if not _liberar_expiradas(profissional_id, data, faixa, agora):
+                raise HorarioIndisponivel("Horário já reservado.")
+        except OperationalError:
+            if tentativa == TENTATIVAS - 1:
+                raise
+            relogio.sleep(espera * (1 + random.random()))
+            espera *= 2
+    raise HorarioIndisponivel("Horário já reservado.")
+
+
+def confirmar(reserva_id, agora=None):
+    """
+    Cria o ``Agendamento`` de uma reserva retida e ainda válida. Levanta
+    ``ReservaExpirada`` se ela venceu, já foi confirmada ou não existe.
+    """
+    agora = agora or timezone.now()
+    with transaction.atomic():
+        # O UPDATE condicional garante que só uma confirmação vence.
+        if not Reserva.objects.filter(pk=reserva_id, status='retida', expira_em__gte=agora).update(status='confirmada'):
+            raise ReservaExpirada("Reserva expirada ou já confirmada.")
+        reserva = Reserva.objects.get(pk=reserva_id)
+        agendamento = Agendamento.objects.create(
+            usuario_id=reserva.usuario_id, profissional_id=reserva.profissional_id,
+            data=reserva.data, horario_inicio=reserva.horario_inicio,
+        )
+        agendamento.servicos.set(reserva.servicos.values_list('pk', flat=True))
+        reserva.agendamento = agendamento
+        reserva.save(update_fields=['agendamento'])
+    return agendamento
+
+
+def liberar(reserva_id):
+    """
+    Desiste de uma reserva retida, liberando o horário. Retorna se havia reserva.
+    """
+    apagadas, _ = Reserva.objects.filter(pk=reserva_id, status='retida').delete()
+    return apagadas > 0
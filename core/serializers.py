@@ -1,52 +1,412 @@
 from rest_framework import serializers
-from .models import Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback
+from rest_framework.exceptions import ValidationError
+from . import imagens
+from .geolocalizacao import RAIO_PADRAO, coordenadas
+from .importacao import LIMITE as LIMITE_DO_LOTE
+from .recomendacoes import TOP_K
+from .models import (
+    Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback, Reserva,
+    EstatisticaDiaria, AgendamentoArquivado, FeedbackArquivado
+)
 
-class UsuarioSerializer(serializers.ModelSerializer):
+def _arvore(valor):
+    """
+    ``'id,usuario.nome,usuario.email'`` -> ``{'id': {}, 'usuario': {'nome': {}, 'email': {}}}``.
+    """
+    arvore = {}
+    for caminho in filter(None, (parte.strip() for parte in valor.split(','))):
+        no = arvore
+        for nome in caminho.split('.'):
+            no = no.setdefault(nome, {})
+    return arvore
+
+
+def _aninhado(campo):
+    """
+    O serializer de modelo de um campo aninhado (direto ou ``many=True``), ou ``None``.
+    """
+    if isinstance(campo, serializers.ListSerializer):
+        campo = campo.child
+    return campo if isinstance(campo, serializers.ModelSerializer) else None
+
+
+class SelecaoDeCampos:
+    """
+    Campos e expansões pedidos para um nível da árvore de serializers.
+    ``campos`` vazio significa todos os campos.
+    """
+    def __init__(self, campos=None, expandir=None, prefixo=''):
+        self.campos = campos or {}
+        self.expandir = expandir or {}
+        self.prefixo = prefixo
+
+    @classmethod
+    def da_requisicao(cls, request):
+        """
+        Seleção de ``?fields=`` e ``?expand=``, ou ``None`` se a requisição não
+        usa nenhum dos dois (representação completa).
+        """
+        parametros = getattr(request, 'query_params', {})
+        if 'fields' not in parametros and 'expand' not in parametros:
+            return None
+        return cls(_arvore(parametros.get('fields', '')), _arvore(parametros.get('expand', '')))
+
+    def expande(self, nome):
+        # Pedir campos de uma relação (usuario.nome) também a expande.
+        return nome in self.expandir or bool(self.campos.get(nome))
+
+    def aplicar(self, campos):
+        inexistentes = [nome for nome in self.campos if nome not in campos]
+        if inexistentes:
+            raise ValidationError({'fields': [f"Campo inexistente: {self.prefixo}{nome}." for nome in inexistentes]})
+        invalidas = [nome for nome in self.expandir if _aninhado(campos.get(nome)) is None]
+        if invalidas:
+            raise ValidationError({'expand': [f"Relação inexistente: {self.prefixo}{nome}." for nome in invalidas]})
+
+        selecionados = {}
+        for nome, campo in campos.items():
+            if self.campos and nome not in self.campos:
+                continue
+            aninhado = _aninhado(campo)
+            if aninhado is not None and self.expande(nome):
+                aninhado._selecao = SelecaoDeCampos(
+                    self.campos.get(nome), self.expandir.get(nome), prefixo=f'{self.prefixo}{nome}.'
+                )
+            elif aninhado is not None:
+                campo = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=isinstance(campo, serializers.ListSerializer),
+                    **({'source': campo.source} if campo.source else {}),
+                )
+            selecionados[nome] = campo
+        return selecionados
+
+
+class CamposDinamicosMixin:
+    """
+    Representação esparsa pedida na query string:
+
+    - ``?fields=id,data,status,usuario.nome`` devolve só esses campos;
+    - ``?expand=usuario,profissional.disponibilidade`` aninha essas relações.
+
+    Com qualquer um dos dois, as relações não expandidas voltam como ids (ou
+    listas de ids). Sem nenhum, a representação completa de sempre.
+    ``core.consultas.otimizar_queryset`` lê os campos resultantes, então o
+    queryset só faz os JOINs e prefetches do que foi pedido.
+    """
+    _selecao = None
+
+    def _na_raiz(self):
+        parent = getattr(self, 'parent', None)
+        return parent is None or (
+            isinstance(parent, serializers.ListSerializer) and getattr(parent, 'parent', None) is None
+        )
+
+    def get_fields(self):
+        campos = super().get_fields()
+        selecao = self._selecao
+        if selecao is None and self._na_raiz():
+            selecao = SelecaoDeCampos.da_requisicao(self.context.get('request'))
+        return campos if selecao is None else selecao.aplicar(campos)
+
+
+class VarianteDaFotoField(serializers.ReadOnlyField):
+    """
+    URL de uma variante reduzida da foto (ver ``core.imagens``), ou ``None``
+    enquanto ela ainda não foi gerada.
+    """
+    def __init__(self, variante='thumb', **kwargs):
+        self.variante = variante
+        kwargs['source'] = 'foto_hash'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = imagens.url(value, self.variante)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     idade = serializers.ReadOnlyField()
+    foto_thumb = VarianteDaFotoField()
 
     class Meta:
         model = Usuario
-        fields = ['id', 'nome', 'data_nasc', 'foto', 'email', 'telefone', 'cpf', 'idade']
+        fields = ['id', 'nome', 'data_nasc', 'foto', 'foto_thumb', 'email', 'telefone', 'cpf', 'idade']
+
+
+class UsuarioFiltrosSerializer(serializers.Serializer):
+    faixa = serializers.ChoiceField(choices=Usuario.FAIXAS_ETARIAS, required=False)
+    idade_min = serializers.IntegerField(min_value=0, max_value=150, required=False)
+    idade_max = serializers.IntegerField(min_value=0, max_value=150, required=False)
 
 
-class DisponibilidadeSerializer(serializers.ModelSerializer):
+class DisponibilidadeSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Disponibilidade
         fields = ['id', 'dia', 'horario_inicio', 'horario_fim']
 
 
-class ProfissionalDePodologiaSerializer(serializers.ModelSerializer):
+class ProfissionalDePodologiaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     disponibilidade = DisponibilidadeSerializer(many=True)
+    foto_thumb = VarianteDaFotoField()
+    avaliacoes_histograma = serializers.SerializerMethodField()
     
     class Meta:
         model = ProfissionalDePodologia
         fields = [
-            'id', 'nome', 'especializacao', 'user', 'foto', 'email', 
+            'id', 'nome', 'especializacao', 'user', 'foto', 'foto_thumb', 'email',
             'telefone_whatsapp', 'rede_social', 'disponibilidade', 'endereco',
-            'bairro', 'especialidade', 'aprovado'
+            'bairro', 'especialidade', 'aprovado', 'avaliacao_media', 'avaliacoes_total',
+            'avaliacoes_histograma'
         ]
 
+    def get_avaliacoes_histograma(self, obj):
+        return {nota: getattr(obj, f'avaliacoes_nota_{nota}') for nota in range(1, 6)}
+
+
+class ProfissionalProximoSerializer(ProfissionalDePodologiaSerializer):
+    distancia_km = serializers.FloatField(read_only=True)
 
-class TratamentoPodologicoSerializer(serializers.ModelSerializer):
+    class Meta(ProfissionalDePodologiaSerializer.Meta):
+        fields = ProfissionalDePodologiaSerializer.Meta.fields + ['distancia_km']
+
+
+class ProfissionalRecomendadoSerializer(ProfissionalDePodologiaSerializer):
+    pontuacao = serializers.FloatField(read_only=True)
+
+    class Meta(ProfissionalDePodologiaSerializer.Meta):
+        fields = ProfissionalDePodologiaSerializer.Meta.fields + ['pontuacao']
+
+
+class RecomendacoesParametrosSerializer(serializers.Serializer):
+    k = serializers.IntegerField(min_value=1, max_value=TOP_K, default=10)
+
+
+class ProximosParametrosSerializer(serializers.Serializer):
+    """
+    Origem da busca por proximidade: ``latitude`` e ``longitude``, ou um
+    ``bairro`` (ou ``endereco``) da tabela de centróides.
+    """
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    bairro = serializers.CharField(max_length=255, required=False)
+    endereco = serializers.CharField(max_length=255, required=False)
+    k = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    raio_km = serializers.FloatField(min_value=0.1, max_value=500, default=RAIO_PADRAO)
+    dia = serializers.ChoiceField(choices=Disponibilidade.DIAS_DA_SEMANA, required=False)
+
+    def validate(self, dados):
+        if ('latitude' in dados) != ('longitude' in dados):
+            raise serializers.ValidationError("Informe latitude e longitude juntas.")
+        if 'latitude' in dados:
+            dados['origem'] = (dados['latitude'], dados['longitude'])
+        elif dados.get('bairro') or dados.get('endereco'):
+            dados['origem'] = coordenadas(dados.get('bairro'), dados.get('endereco'))
+            if dados['origem'] is None:
+                raise serializers.ValidationError({'bairro': ["Bairro não encontrado na tabela de bairros."]})
+        else:
+            raise serializers.ValidationError("Informe latitude e longitude, bairro ou endereço.")
+        return dados
+
+
+class TratamentoPodologicoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = TratamentoPodologico
         fields = ['id', 'nome', 'descricao', 'duracao', 'preco', 'tipo']
 
 
-class AgendamentoSerializer(serializers.ModelSerializer):
+class TotalDosServicosMixin:
+    """
+    Total anotado por ``Agendamento.objects.com_totais()``. Sem a anotação
+    (por exemplo, no agendamento aninhado em um feedback), soma os serviços já
+    carregados pelo prefetch.
+    """
+    campo_do_servico = None
+    # Sem a anotação, o total depende dos serviços carregados (ver core.consultas).
+    prefetch_necessario = 'servicos'
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        if hasattr(instance, self.source):
+            return getattr(instance, self.source)
+        return sum(getattr(servico, self.campo_do_servico) for servico in instance.servicos.all())
+
+
+class PrecoTotalField(TotalDosServicosMixin, serializers.DecimalField):
+    campo_do_servico = 'preco'
+
+    def __init__(self, **kwargs):
+        super().__init__(max_digits=12, decimal_places=2, **kwargs)
+
+
+class DuracaoTotalField(TotalDosServicosMixin, serializers.IntegerField):
+    campo_do_servico = 'duracao'
+
+
+class AgendamentoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer()
     profissional = ProfissionalDePodologiaSerializer()
     servicos = TratamentoPodologicoSerializer(many=True)
+    preco_total = PrecoTotalField()
+    duracao_total = DuracaoTotalField()
 
     class Meta:
         model = Agendamento
-        fields = ['id', 'usuario', 'profissional', 'servicos', 'data', 'status']
+        fields = [
+            'id', 'usuario', 'profissional', 'servicos', 'data', 'horario_inicio', 'status',
+            'preco_total', 'duracao_total'
+        ]
+
+
+class AgendamentoFiltrosSerializer(serializers.Serializer):
+    inicio = serializers.DateField(required=False)
+    fim = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=Agendamento.STATUS_CHOICES, required=False)
+    preco_total_min = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    preco_total_max = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    duracao_total_min = serializers.IntegerField(min_value=0, required=False)
+    duracao_total_max = serializers.IntegerField(min_value=0, required=False)
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class AgendamentoEmLoteItemSerializer(serializers.Serializer):
+    """
+    Formato de um item de ``POST /api/agendamentos/em-lote/``; a existência
+    dos ids e os conflitos de horário são conferidos para o lote todo em
+    ``core.importacao``.
+    """
+    usuario = serializers.IntegerField(min_value=1)
+    profissional = serializers.IntegerField(min_value=1)
+    servicos = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    data = serializers.DateField()
+    horario_inicio = serializers.TimeField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Agendamento.STATUS_CHOICES, default='pendente')
+
+
+class AgendamentosEmLoteSerializer(serializers.Serializer):
+    # Os itens são validados um a um na view, para que os erros saiam por item.
+    agendamentos = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=LIMITE_DO_LOTE)
+    verificar_conflitos = serializers.BooleanField(default=True)
+    tudo_ou_nada = serializers.BooleanField(default=False)
+
+
+class FeedbackSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer()
     agendamento = AgendamentoSerializer()
 
     class Meta:
         model = Feedback
         fields = ['id', 'usuario', 'agendamento', 'nota', 'comentario', 'data']
+
+
+class FeedbackArquivadoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = FeedbackArquivado
+        fields = ['id', 'nota', 'comentario', 'data']
+
+
+class AgendamentoArquivadoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    usuario = UsuarioSerializer()
+    profissional = ProfissionalDePodologiaSerializer()
+    servicos = TratamentoPodologicoSerializer(many=True)
+    feedback = FeedbackArquivadoSerializer(allow_null=True)
+
+    class Meta:
+        model = AgendamentoArquivado
+        fields = [
+            'id', 'usuario', 'profissional', 'servicos', 'data', 'horario_inicio', 'status',
+            'preco_total', 'duracao_total', 'feedback', 'arquivado_em'
+        ]
+
+
+class AgendamentoArquivadoFiltrosSerializer(AgendamentoFiltrosSerializer):
+    usuario = serializers.IntegerField(min_value=1, required=False)
+    profissional = serializers.IntegerField(min_value=1, required=False)
+
+
+class HorariosLivresParametrosSerializer(serializers.Serializer):
+    servicos = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    profissional = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    quantidade = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    inicio = serializers.DateField(required=False)
+    dias = serializers.IntegerField(min_value=1, max_value=60, default=60)
+
+
+class HorarioLivreSerializer(serializers.Serializer):
+    profissional = serializers.IntegerField(source='profissional_id')
+    data = serializers.DateField()
+    horario_inicio = serializers.TimeField()
+    horario_fim = serializers.TimeField()
+
+
+class ExportacaoParametrosSerializer(serializers.Serializer):
+    formato = serializers.ChoiceField(choices=['csv', 'jsonl'], default='csv')
+    inicio = serializers.DateField(required=False)
+    fim = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=Agendamento.STATUS_CHOICES, required=False)
+
+
+class TransicaoSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Agendamento.STATUS_CHOICES)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+
+class TransicoesEmLoteSerializer(serializers.Serializer):
+    transicoes = TransicaoSerializer(many=True, allow_empty=False)
+
+    def validate_transicoes(self, transicoes):
+        vistos = set()
+        for transicao in transicoes:
+            repetidos = vistos.intersection(transicao['ids'])
+            if repetidos:
+                raise serializers.ValidationError(
+                    f"Agendamentos com mais de um status de destino: {sorted(repetidos)}."
+                )
+            vistos.update(transicao['ids'])
+        return transicoes
+
+
+class BuscaParametrosSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    limite = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class ReservaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    servicos = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=TratamentoPodologico.objects.all(), allow_empty=False
+    )
+
+    class Meta:
+        model = Reserva
+        fields = [
+            'id', 'profissional', 'usuario', 'servicos', 'data', 'horario_inicio', 'duracao',
+            'status', 'expira_em', 'agendamento'
+        ]
+        read_only_fields = ['duracao', 'status', 'expira_em', 'agendamento']
+
+
+class EstatisticasParametrosSerializer(serializers.Serializer):
+    inicio = serializers.DateField()
+    fim = serializers.DateField()
+    profissional = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, dados):
+        dias = (dados['fim'] - dados['inicio']).days
+        if dias < 0:
+            raise serializers.ValidationError("O fim deve ser igual ou posterior ao início.")
+        if dias > 366:
+            raise serializers.ValidationError("O período pode ter no máximo um ano.")
+        return dados
+
+
+class EstatisticaDiariaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = EstatisticaDiaria
+        fields = [
+            'data', 'total_pendente', 'total_confirmado', 'total_concluido', 'total_cancelado',
+            'receita_pendente', 'receita_confirmado', 'receita_concluido', 'receita_cancelado',
+        ]
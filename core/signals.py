@@ -0,0 +1,237 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import avaliacoes, catalogo, estatisticas, geolocalizacao, imagens
+from .models import (
+    Agendamento, AgendamentoArquivado, Disponibilidade, Feedback, FeedbackArquivado, OcupacaoDeHorario,
+    ProfissionalDePodologia, TratamentoPodologico, Usuario
+)
+
+
+def _profissional_do_agendamento(agendamento_id):
+    return Agendamento.objects.filter(pk=agendamento_id).values_list('profissional_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Feedback)
+def guardar_avaliacao_anterior(sender, instance, raw=False, **kwargs):
+    """
+    Guarda o profissional e a nota gravados antes de uma edição.
+    """
+    instance._avaliacao_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._avaliacao_anterior = Feedback.objects.filter(pk=instance.pk).values_list(
+        'agendamento__profissional_id', 'nota'
+    ).first()
+
+
+@receiver(post_save, sender=Feedback)
+def atualizar_resumo_ao_salvar(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    atual = (_profissional_do_agendamento(instance.agendamento_id), instance.nota)
+    anterior = getattr(instance, '_avaliacao_anterior', None)
+    if anterior == atual:
+        return
+    if anterior is not None:
+        avaliacoes.registrar(*anterior, sinal=-1)
+    avaliacoes.registrar(*atual, sinal=1)
+
+
+@receiver(post_delete, sender=Feedback)
+def atualizar_resumo_ao_excluir(sender, instance, **kwargs):
+    avaliacoes.registrar(_profissional_do_agendamento(instance.agendamento_id), instance.nota, sinal=-1)
+
+
+@receiver(post_delete, sender=FeedbackArquivado)
+def atualizar_resumo_ao_excluir_arquivado(sender, instance, **kwargs):
+    # Arquivar não passa por aqui; só a exclusão do histórico (em cascata com o cliente, por exemplo).
+    profissional_id = AgendamentoArquivado.objects.filter(pk=instance.agendamento_id).values_list(
+        'profissional_id', flat=True
+    ).first()
+    avaliacoes.registrar(profissional_id, instance.nota, sinal=-1)
+
+
+@receiver(pre_save, sender=Usuario)
+@receiver(pre_save, sender=ProfissionalDePodologia)
+def marcar_foto_alterada(sender, instance, raw=False, **kwargs):
+    """
+    Uma foto recém-enviada ainda não foi gravada no storage (``_committed``
+    falso). Nesse caso, ou se a foto foi removida, as variantes antigas deixam
+    de valer.
+    """
+    instance._foto_alterada = not raw and bool(instance.foto) and not instance.foto._committed
+    if instance._foto_alterada or not instance.foto:
+        instance.foto_hash = None
+
+
+@receiver(pre_save, sender=ProfissionalDePodologia)
+def geolocalizar(sender, instance, raw=False, **kwargs):
+    """
+    Coordenadas e célula da grade a partir do bairro (ou do endereço).
+    """
+    if not raw:
+        for campo, valor in geolocalizacao.localizacao(instance.bairro, instance.endereco).items():
+            setattr(instance, campo, valor)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_save, sender=ProfissionalDePodologia)
+def agendar_variantes_da_foto(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, '_foto_alterada', False):
+        return
+    transaction.on_commit(partial(imagens.agendar, sender, instance.pk))
+
+
+@receiver(post_save, sender=TratamentoPodologico)
+@receiver(post_delete, sender=TratamentoPodologico)
+def invalidar_catalogo_de_tratamentos(sender, **kwargs):
+    catalogo.invalidar('tratamentos')
+
+
+@receiver(post_save, sender=ProfissionalDePodologia)
+@receiver(post_delete, sender=ProfissionalDePodologia)
+@receiver(post_save, sender=Disponibilidade)
+@receiver(post_delete, sender=Disponibilidade)
+@receiver(m2m_changed, sender=ProfissionalDePodologia.disponibilidade.through)
+def invalidar_catalogo_de_profissionais(sender, action=None, **kwargs):
+    if action is None or action.startswith('post_'):
+        catalogo.invalidar('profissionais')
+
+
+@receiver(pre_save, sender=Agendamento)
+def guardar_estatistica_anterior(sender, instance, raw=False, **kwargs):
+    """
+    Guarda dia, profissional, status e horário gravados antes de uma edição.
+    """
+    instance._estatistica_anterior = instance._horario_anterior = None
+    if raw or instance.pk is None:
+        return
+    anterior = Agendamento.objects.filter(pk=instance.pk).values_list(
+        'data', 'profissional_id', 'status', 'horario_inicio'
+    ).first()
+    if anterior is not None:
+        data, profissional_id, status, horario_inicio = anterior
+        instance._estatistica_anterior = (data, profissional_id, status)
+        instance._horario_anterior = (data, profissional_id, horario_inicio)
+
+
+@receiver(post_save, sender=Agendamento)
+def atualizar_estatisticas_ao_salvar(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    atual = (instance.data, instance.profissional_id, instance.status)
+    anterior = getattr(instance, '_estatistica_anterior', None)
+    if created or anterior is None:
+        # Os serviços (e a receita) chegam depois, pelo m2m_changed.
+        estatisticas.registrar(*atual, 1, estatisticas.ZERO)
+        return
+    if anterior == atual:
+        return
+    if anterior[1] != atual[1]:
+        # A nota do feedback passa para o resumo do novo profissional, na mesma transação do save().
+        nota = Feedback.objects.filter(agendamento=instance).values_list('nota', flat=True).first()
+        if nota is not None:
+            avaliacoes.registrar(anterior[1], nota, sinal=-1)
+            avaliacoes.registrar(atual[1], nota, sinal=1)
+    receita = estatisticas.receita_dos_agendamentos([instance.pk]).get(instance.pk, estatisticas.ZERO)
+    estatisticas.registrar(*anterior, -1, -receita)
+    estatisticas.registrar(*atual, 1, receita)
+
+
+@receiver(pre_delete, sender=Agendamento)
+def atualizar_estatisticas_ao_excluir(sender, instance, **kwargs):
+    # Antes da exclusão, enquanto os serviços ainda estão ligados ao agendamento.
+    anterior = Agendamento.objects.filter(pk=instance.pk).values_list('data', 'profissional_id', 'status').first()
+    if anterior is not None:
+        receita = estatisticas.receita_dos_agendamentos([instance.pk]).get(instance.pk, estatisticas.ZERO)
+        estatisticas.registrar(*anterior, -1, -receita)
+
+
+def _liberar_ocupacoes(agendamentos):
+    """
+    Apaga as ocupações da grade das reservas que viraram esses agendamentos.
+    Sem elas, o agendamento passa a ser conferido diretamente por
+    ``reservas.reservar`` (como os criados fora do fluxo de reservas).
+    """
+    OcupacaoDeHorario.objects.filter(reserva__agendamento__in=agendamentos).delete()
+
+
+@receiver(post_save, sender=Agendamento)
+def liberar_ocupacoes_ao_remarcar(sender, instance, created, raw=False, **kwargs):
+    anterior = getattr(instance, '_horario_anterior', None)
+    if raw or created or anterior is None:
+        return
+    if anterior != (instance.data, instance.profissional_id, instance.horario_inicio):
+        _liberar_ocupacoes([instance.pk])
+
+
+@receiver(pre_delete, sender=Agendamento)
+def liberar_ocupacoes_ao_excluir(sender, instance, **kwargs):
+    # Antes do SET_NULL em Reserva.agendamento, que perderia a ligação.
+    _liberar_ocupacoes([instance.pk])
+
+
+@receiver(pre_delete, sender=AgendamentoArquivado)
+def atualizar_estatisticas_ao_excluir_arquivado(sender, instance, **kwargs):
+    estatisticas.registrar(instance.data, instance.profissional_id, instance.status, -1, -instance.preco_total)
+
+
+@receiver(m2m_changed, sender=Agendamento.servicos.through)
+def atualizar_receita_dos_servicos(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Ajusta a receita quando serviços entram ou saem de agendamentos, dos dois
+    lados da relação (``agendamento.servicos`` e ``tratamento.agendamentos``).
+    """
+    if action == 'pre_clear':
+        # pk_set não vem preenchido em clear; guarda o que será removido.
+        relacao = instance.agendamentos if reverse else instance.servicos
+        instance._servicos_removidos = set(relacao.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_servicos_removidos', set())
+    if not pk_set:
+        return
+    # A duração mudou: as ocupações da reserva já não cobrem o atendimento.
+    _liberar_ocupacoes(list(pk_set) if reverse else [instance.pk])
+    sinal = 1 if action == 'post_add' else -1
+    if reverse:
+        agendamentos, precos = list(pk_set), {pk: instance.preco for pk in pk_set}
+    else:
+        agendamentos = [instance.pk]
+        precos = {instance.pk: sum(
+            TratamentoPodologico.objects.filter(pk__in=pk_set).values_list('preco', flat=True), estatisticas.ZERO
+        )}
+    for pk, data, profissional_id, status in Agendamento.objects.filter(pk__in=agendamentos).values_list(
+        'pk', 'data', 'profissional_id', 'status'
+    ):
+        estatisticas.registrar(data, profissional_id, status, 0, sinal * precos[pk])
+
+
+@receiver(pre_save, sender=TratamentoPodologico)
+def guardar_preco_anterior(sender, instance, raw=False, **kwargs):
+    instance._preco_anterior = None
+    if not raw and instance.pk is not None:
+        instance._preco_anterior = TratamentoPodologico.objects.filter(pk=instance.pk).values_list(
+            'preco', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=TratamentoPodologico)
+def recalcular_estatisticas_do_preco(sender, instance, created, raw=False, **kwargs):
+    """
+    A receita usa o preço atual dos serviços; mudar o preço refaz, de uma vez,
+    o período entre o primeiro e o último dia em que o tratamento aparece.
+    """
+    anterior = getattr(instance, '_preco_anterior', None)
+    if raw or created or anterior is None or anterior == instance.preco:
+        return
+    periodo = instance.agendamentos.order_by().aggregate(inicio=Min('data'), fim=Max('data'))
+    if periodo['inicio'] is not None:
+        estatisticas.reconstruir(periodo['inicio'], periodo['fim'])
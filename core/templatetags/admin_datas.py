@@ -0,0 +1,106 @@
+"""
+Hierarquia de datas (``date_hierarchy``) do admin guiada pelo índice.
+
+O ``{% date_hierarchy %}`` do Django lista os anos, meses ou dias com
+``QuerySet.dates()``/``datetimes()``, um SELECT DISTINCT sobre a data truncada
+que lê todas as linhas do período, e descobre o período inicial com MIN e MAX
+em uma mesma consulta, que o SQLite também resolve varrendo a tabela.
+
+Aqui o mesmo resultado sai de buscas no índice da coluna de data: o primeiro e
+o último valor com ``ORDER BY ... LIMIT 1`` e cada ano/mês/dia presente com o
+menor valor a partir do fim do período anterior. É uma consulta por item
+listado, cada uma lendo poucas entradas do índice.
+"""
+from datetime import date, datetime, timedelta
+
+from django import template
+from django.conf import settings
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db.models import Max, Min
+from django.utils import timezone
+
+register = template.Library()
+
+
+def _inicio_do_periodo(dia, tipo):
+    if tipo == 'year':
+        return dia.replace(month=1, day=1)
+    if tipo == 'month':
+        return dia.replace(day=1)
+    return dia
+
+
+def _inicio_do_seguinte(inicio, tipo):
+    if tipo == 'year':
+        return inicio.replace(year=inicio.year + 1)
+    if tipo == 'month':
+        return (inicio + timedelta(days=31)).replace(day=1)
+    return inicio + timedelta(days=1)
+
+
+class _DatasPeloIndice:
+    """
+    Queryset do changelist com ``aggregate(first=Min, last=Max)``, ``dates()``
+    e ``datetimes()`` (as chamadas feitas por ``date_hierarchy``) resolvidos
+    por buscas no índice.
+    """
+    def __init__(self, queryset):
+        self._queryset = queryset.order_by()
+
+    def __getattr__(self, nome):
+        return getattr(self._queryset, nome)
+
+    def _primeiro(self, campo, a_partir_de=None, descendente=False):
+        queryset = self._queryset.filter(**{f'{campo}__isnull': False})
+        if a_partir_de is not None:
+            queryset = queryset.filter(**{f'{campo}__gte': a_partir_de})
+        return queryset.order_by(f'-{campo}' if descendente else campo).values_list(campo, flat=True).first()
+
+    def aggregate(self, **agregacoes):
+        return {
+            nome: self._primeiro(agregacao.source_expressions[0].name, descendente=isinstance(agregacao, Max))
+            for nome, agregacao in agregacoes.items()
+            if isinstance(agregacao, (Min, Max))
+        }
+
+    def _periodos(self, campo, tipo, com_horario):
+        def local(dia):
+            momento = datetime(dia.year, dia.month, dia.day)
+            return timezone.make_aware(momento) if settings.USE_TZ else momento
+
+        periodos, a_partir_de = [], None
+        while (valor := self._primeiro(campo, a_partir_de)) is not None:
+            if com_horario:
+                valor = (timezone.localtime(valor) if timezone.is_aware(valor) else valor).date()
+            inicio = _inicio_do_periodo(valor, tipo)
+            periodos.append(local(inicio) if com_horario else inicio)
+            seguinte = _inicio_do_seguinte(inicio, tipo)
+            a_partir_de = local(seguinte) if com_horario else seguinte
+        return periodos
+
+    def dates(self, campo, tipo):
+        return self._periodos(campo, tipo, com_horario=False)
+
+    def datetimes(self, campo, tipo):
+        return self._periodos(campo, tipo, com_horario=True)
+
+
+class _ChangeListPeloIndice:
+    def __init__(self, cl):
+        self._cl = cl
+        self.queryset = _DatasPeloIndice(cl.queryset)
+
+    def __getattr__(self, nome):
+        return getattr(self._cl, nome)
+
+
+def hierarquia_de_datas(cl):
+    return date_hierarchy(_ChangeListPeloIndice(cl))
+
+
+@register.tag(name='hierarquia_de_datas')
+def hierarquia_de_datas_tag(parser, token):
+    return InclusionAdminNode(
+        parser, token, func=hierarquia_de_datas, template_name='date_hierarchy.html', takes_context=False,
+    )
@@ -1,3 +1,1485 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.exceptions import FieldError, MiddlewareNotUsed, ValidationError
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from PIL import Image
+
+from . import (
+    agenda, arquivamento, avaliacoes, dados_sinteticos, escrita, estatisticas, geolocalizacao, imagens, lembretes,
+    recomendacoes, reservas
+)
+from .admin import ContagemLimitadaPaginator
+from .benchmarks import em_banco_de_arquivo
+from .instrumentacao import InstrumentacaoMiddleware
+from .agenda import agendamentos_do_periodo
+from .models import (
+    Usuario, Disponibilidade, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback, Reserva,
+    EstatisticaDiaria, Lembrete, AgendamentoArquivado, FeedbackArquivado, OcupacaoDeHorario, Recomendacao,
+    anos_antes, idade_em
+)
+
+
+class ConsultasConstantesMixin:
+    """
+    Helper para garantir que uma listagem não faz consultas N+1.
+    """
+
+    def assertConsultasConstantes(self, url, criar, tamanhos=(1, 5, 25)):
+        """
+        Para cada tamanho, completa a base com ``criar(quantidade)`` e faz um
+        GET em ``url``; falha se o número de consultas variar entre os tamanhos.
+        """
+        contagens = {}
+        existentes = 0
+        for tamanho in tamanhos:
+            criar(tamanho - existentes)
+            existentes = tamanho
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            contagens[tamanho] = len(consultas)
+        self.assertEqual(
+            len(set(contagens.values())), 1,
+            f"Número de consultas varia com o tamanho da página: {contagens}"
+        )
+        return contagens
+
+
+def criar_agendamentos(quantidade, status='concluido', com_feedback=False):
+    """
+    Cria ``quantidade`` agendamentos, cada um com cliente, profissional,
+    disponibilidades e serviços próprios.
+    """
+    agendamentos = []
+    for _ in range(quantidade):
+        usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+        profissional = ProfissionalDePodologia.objects.create(
+            nome='Profissional', especializacao='Infantil', email='prof@example.com',
+            especialidade='Podologia infantil', aprovado=True
+        )
+        profissional.disponibilidade.add(
+            Disponibilidade.objects.create(dia='segunda', horario_inicio=time(8), horario_fim=time(12)),
+            Disponibilidade.objects.create(dia='quarta', horario_inicio=time(13), horario_fim=time(18)),
+        )
+        agendamento = Agendamento.objects.create(
+            usuario=usuario, profissional=profissional, data=date(2024, 12, 2),
+            horario_inicio=time(9), status=status
+        )
+        agendamento.servicos.add(
+            TratamentoPodologico.objects.create(
+                nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Preventivo'
+            ),
+            TratamentoPodologico.objects.create(
+                nome='Órtese', descricao='-', duracao=45, preco=150, tipo='Clínico'
+            ),
+        )
+        if com_feedback:
+            Feedback.objects.create(usuario=usuario, agendamento=agendamento, nota=5)
+        agendamentos.append(agendamento)
+    return agendamentos
+
+
+class ConsultasApiTests(ConsultasConstantesMixin, TestCase):
+
+    def test_listagem_de_agendamentos_sem_n_mais_1(self):
+        self.assertConsultasConstantes('/api/agendamentos/', criar_agendamentos)
+
+    def test_listagem_de_feedbacks_sem_n_mais_1(self):
+        self.assertConsultasConstantes(
+            '/api/feedbacks/', lambda quantidade: criar_agendamentos(quantidade, com_feedback=True)
+        )
+
+    def test_listagem_de_profissionais_sem_n_mais_1(self):
+        self.assertConsultasConstantes('/api/profissionais/', criar_agendamentos)
+
+
+class CamposDinamicosTests(ConsultasConstantesMixin, TestCase):
+
+    def test_campos_e_expansoes(self):
+        agendamento = criar_agendamentos(1, com_feedback=True)[0]
+        resposta = self.client.get('/api/agendamentos/', {'fields': 'id,data,status,usuario.nome'})
+        self.assertEqual(resposta.json()['results'], [
+            {'id': agendamento.pk, 'usuario': {'nome': 'Cliente'}, 'data': '2024-12-02', 'status': 'concluido'}
+        ])
+
+        # Relações não expandidas voltam como ids.
+        item = self.client.get('/api/agendamentos/', {'expand': 'profissional'}).json()['results'][0]
+        self.assertEqual(item['usuario'], agendamento.usuario_id)
+        self.assertEqual(sorted(item['servicos']), sorted(agendamento.servicos.values_list('pk', flat=True)))
+        self.assertEqual(item['profissional']['nome'], 'Profissional')
+        self.assertEqual(len(item['profissional']['disponibilidade']), 2)
+        self.assertIsInstance(item['profissional']['disponibilidade'][0], int)
+
+        feedback = self.client.get('/api/feedbacks/', {
+            'fields': 'nota,agendamento.preco_total', 'expand': 'agendamento.profissional.disponibilidade'
+        }).json()['results'][0]
+        self.assertEqual(feedback, {'agendamento': {'preco_total': '230.00'}, 'nota': 5})
+
+        erro = self.client.get('/api/agendamentos/', {'fields': 'id,usuario.idade_em_dias'})
+        self.assertEqual(erro.status_code, 400)
+        self.assertEqual(erro.json(), {'fields': ['Campo inexistente: usuario.idade_em_dias.']})
+        erro = self.client.get('/api/async/agendamentos/', {'expand': 'data'})
+        self.assertEqual((erro.status_code, erro.json()), (400, {'expand': ['Relação inexistente: data.']}))
+
+    def test_so_consulta_o_que_foi_pedido(self):
+        criar_agendamentos(3)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get('/api/agendamentos/', {'fields': 'id,data,status,usuario.nome'})
+        self.assertEqual(len(consultas), 1)
+        sql = consultas[0]['sql']
+        self.assertIn('core_usuario', sql)
+        self.assertNotIn('core_profissionaldepodologia', sql)
+        # Sem os totais na resposta, nada de subconsultas de soma.
+        self.assertNotIn('SUM(', sql)
+
+        self.assertConsultasConstantes(
+            '/api/feedbacks/?fields=id,agendamento.preco_total&expand=agendamento.profissional',
+            lambda quantidade: criar_agendamentos(quantidade, com_feedback=True),
+        )
+
+
+class PaginasDeFeedbackTests(TestCase):
+
+    def test_edicao_de_feedback(self):
+        feedback = criar_agendamentos(1, com_feedback=True)[0].feedback
+        resposta = self.client.get(f'/feedbacks/editar/{feedback.pk}/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'class="form-control"')
+
+    def test_listagem_e_formulario_sem_n_mais_1(self):
+        criar_agendamentos(3, com_feedback=True)
+        sem_feedback = criar_agendamentos(2)
+        criar_agendamentos(1, status='pendente')
+        with self.assertNumQueries(2):
+            resposta = self.client.get('/feedbacks/')
+        self.assertEqual(len(resposta.context['feedbacks']), 3)
+
+        with self.assertNumQueries(2):
+            resposta = self.client.get('/feedbacks/adicionar/')
+        # Só concluídos ainda sem feedback entram nas opções.
+        opcoes = [valor.value for valor, _ in resposta.context['form'].fields['agendamento'].choices if valor]
+        self.assertEqual(sorted(opcoes), [agendamento.pk for agendamento in sem_feedback])
+
+    @mock.patch('core.views.FEEDBACKS_POR_PAGINA', 2)
+    def test_listagem_paginada(self):
+        criar_agendamentos(3, com_feedback=True)
+        self.assertEqual(len(self.client.get('/feedbacks/').context['feedbacks']), 2)
+        self.assertEqual(len(self.client.get('/feedbacks/', {'pagina': 2}).context['feedbacks']), 1)
+
+
+class PaginacaoKeysetTests(TestCase):
+
+    def test_paginas_estaveis_com_insercoes_concorrentes(self):
+        agendamentos = criar_agendamentos(5)
+        vistos = []
+        resposta = self.client.get('/api/agendamentos/', {'tamanho': 2}).json()
+        vistos += [item['id'] for item in resposta['results']]
+        self.assertIsNone(resposta['previous'])
+
+        # Um agendamento inserido antes do cursor não desloca as páginas seguintes.
+        novo = criar_agendamentos(1)[0]
+        Agendamento.objects.filter(pk=novo.pk).update(data=date(2024, 1, 1))
+        while resposta['next']:
+            resposta = self.client.get(resposta['next']).json()
+            vistos += [item['id'] for item in resposta['results']]
+        self.assertEqual(vistos, [agendamento.pk for agendamento in agendamentos])
+
+        anterior = self.client.get(resposta['previous']).json()
+        self.assertEqual([item['id'] for item in anterior['results']], vistos[2:4])
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get('/api/agendamentos/', {'cursor': 'xyz'}).status_code, 404)
+
+
+class PlanoDeConsultaTests(TestCase):
+    """
+    Roda EXPLAIN QUERY PLAN nas consultas mais frequentes e falha se alguma
+    delas deixar de usar o índice esperado e voltar a varrer a tabela.
+    """
+
+    def assertUsaIndice(self, queryset, indice):
+        plano = queryset.explain()
+        tabela = queryset.model._meta.db_table
+        self.assertNotRegex(plano, rf'SCAN {tabela}\b(?! USING (COVERING )?INDEX {indice})', plano)
+        self.assertIn(f'INDEX {indice}', plano, plano)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plano, plano)
+
+    def test_agenda_do_profissional_por_dia_e_status(self):
+        self.assertUsaIndice(
+            Agendamento.objects.filter(profissional_id=1, data=date(2024, 12, 2), status='confirmado'),
+            'agendamento_prof_data_st_idx',
+        )
+
+    def test_agenda_do_profissional_no_periodo(self):
+        self.assertUsaIndice(
+            Agendamento.objects.filter(
+                profissional_id=1, data__range=(date(2024, 12, 1), date(2024, 12, 31)), status='pendente'
+            ),
+            'agendamento_prof_data_st_idx',
+        )
+
+    def test_agendamentos_ativos_do_periodo_usa_indice_parcial(self):
+        self.assertUsaIndice(agendamentos_do_periodo(date(2024, 12, 1), 60), 'agendamento_ativos_idx')
+
+    def test_in_literal_so_no_status_e_so_com_choices(self):
+        with self.assertRaises(ValueError):
+            str(Agendamento.objects.filter(status__in_literal=["pendente') OR (1=1"]).query)
+        with self.assertRaises(FieldError):
+            TratamentoPodologico.objects.filter(tipo__in_literal=['Clínico'])
+
+    def test_historico_do_cliente(self):
+        self.assertUsaIndice(
+            Agendamento.objects.filter(usuario_id=1, data__gte=date(2024, 1, 1)).order_by('data'),
+            'agendamento_usuario_data_idx',
+        )
+
+    def test_feedbacks_do_cliente_mais_recentes_primeiro(self):
+        self.assertUsaIndice(Feedback.objects.filter(usuario_id=1).order_by('-data'), 'feedback_usuario_data_idx')
+
+    def test_paginas_por_cursor(self):
+        self.assertUsaIndice(
+            Agendamento.objects.filter(data__gte=date(2024, 1, 1)).order_by('data', 'id')[:51],
+            'agendamento_data_id_idx',
+        )
+        self.assertUsaIndice(Feedback.objects.order_by('-data', '-id')[:51], 'feedback_data_id_idx')
+
+    def test_serie_do_dashboard(self):
+        # A restrição única (profissional, data) vira o índice automático do
+        # SQLite e atende tanto a série de um profissional quanto a da clínica
+        # (profissional IS NULL).
+        periodo = (date(2024, 1, 1), date(2024, 12, 31))
+        for profissional in (None, 1):
+            plano = EstatisticaDiaria.objects.filter(
+                data__range=periodo, profissional_id=profissional
+            ).order_by('data').explain()
+            self.assertRegex(plano, r'SEARCH core_estatisticadiaria USING INDEX \S+ \(profissional_id=\? AND data>\? AND data<\?\)', plano)
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plano, plano)
+
+    def test_varredura_dos_lembretes(self):
+        self.assertUsaIndice(
+            Agendamento.objects.ativos().filter(data=date(2024, 12, 2), pk__gt=0).order_by('pk')[:500],
+            'agendamento_data_id_idx',
+        )
+        self.assertUsaIndice(
+            Lembrete.objects.filter(status='pendente', executar_em__lte=timezone.now()).order_by('executar_em')[:500],
+            'lembrete_status_executar_idx',
+        )
+
+
+class ResumoAvaliacoesTests(TestCase):
+
+    def test_resumo_acompanha_inclusao_edicao_e_exclusao(self):
+        primeiro, segundo = criar_agendamentos(2)
+        segundo.profissional = primeiro.profissional
+        segundo.save()
+        Feedback.objects.create(usuario=primeiro.usuario, agendamento=primeiro, nota=5)
+        feedback = Feedback.objects.create(usuario=segundo.usuario, agendamento=segundo, nota=2)
+        feedback.nota = 4
+        feedback.save()
+
+        profissional = ProfissionalDePodologia.objects.get(pk=primeiro.profissional_id)
+        self.assertEqual((profissional.avaliacoes_total, profissional.avaliacoes_soma), (2, 9))
+        self.assertEqual((profissional.avaliacoes_nota_2, profissional.avaliacoes_nota_4), (0, 1))
+        self.assertEqual(profissional.avaliacao_media, 4.5)
+
+        feedback.delete()
+        primeiro.delete()
+        profissional.refresh_from_db()
+        self.assertEqual((profissional.avaliacoes_total, profissional.avaliacao_media), (0, None))
+        call_command('recalcular_avaliacoes', '--verificar', stdout=StringIO())
+
+    def test_nota_acompanha_a_troca_de_profissional(self):
+        agendamento, outro = criar_agendamentos(2, com_feedback=True)
+        anterior = agendamento.profissional_id
+        agendamento.profissional = outro.profissional
+        agendamento.save()
+        self.assertEqual(avaliacoes.divergencias(), [])
+        self.assertEqual(
+            dict(ProfissionalDePodologia.objects.values_list('pk', 'avaliacoes_total')),
+            {anterior: 0, outro.profissional_id: 2},
+        )
+
+    def test_comando_detecta_e_corrige_divergencia(self):
+        agendamento = criar_agendamentos(1, com_feedback=True)[0]
+        ProfissionalDePodologia.objects.filter(pk=agendamento.profissional_id).update(avaliacoes_total=7)
+        with self.assertRaises(CommandError):
+            call_command('recalcular_avaliacoes', '--verificar', stdout=StringIO())
+        call_command('recalcular_avaliacoes', stdout=StringIO())
+        call_command('recalcular_avaliacoes', '--verificar', stdout=StringIO())
+
+    def test_listagem_ordena_e_filtra_por_avaliacao(self):
+        for agendamento, nota in zip(criar_agendamentos(3), (3, 5, 4)):
+            Feedback.objects.create(usuario=agendamento.usuario, agendamento=agendamento, nota=nota)
+        resposta = self.client.get('/api/profissionais/', {'ordering': '-avaliacao_media', 'avaliacao_minima': 4})
+        self.assertEqual([item['avaliacao_media'] for item in resposta.json()], [5.0, 4.0])
+
+
+class ExportacaoTests(TestCase):
+
+    def test_exportacao_csv_e_jsonl_em_streaming(self):
+        criar_agendamentos(3)
+        resposta = self.client.get('/api/agendamentos/exportar/', {'formato': 'csv'})
+        self.assertTrue(resposta.streaming)
+        linhas = b''.join(resposta.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(linhas), 4)
+        self.assertTrue(linhas[1].endswith('Avaliação; Órtese,230.00'))
+
+        resposta = self.client.get('/api/agendamentos/exportar/', {'formato': 'jsonl', 'status': 'concluido'})
+        registros = [json.loads(linha) for linha in b''.join(resposta.streaming_content).splitlines()]
+        self.assertEqual(len(registros), 3)
+        self.assertEqual([servico['preco'] for servico in registros[0]['servicos']], ['80.00', '150.00'])
+
+    def test_comando_de_exportacao(self):
+        criar_agendamentos(2)
+        saida = StringIO()
+        call_command('exportar_agendamentos', '--formato', 'jsonl', '--lote', '1', stdout=saida)
+        self.assertEqual(len(saida.getvalue().splitlines()), 2)
+
+
+class TransicoesDeStatusTests(TestCase):
+
+    def test_transicao_em_lote_pela_api(self):
+        pendente, confirmado, cancelado = criar_agendamentos(3, status='pendente')
+        Agendamento.objects.filter(pk=confirmado.pk).update(status='confirmado')
+        Agendamento.objects.filter(pk=cancelado.pk).update(status='cancelado')
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.post('/api/agendamentos/transicionar/', {'transicoes': [
+                {'status': 'concluido', 'ids': [pendente.pk, cancelado.pk, 999]},
+                {'status': 'confirmado', 'ids': [confirmado.pk]},
+            ]}, content_type='application/json')
+        # Um UPDATE de agendamentos por status de destino.
+        self.assertEqual(
+            sum(1 for consulta in consultas if consulta['sql'].startswith('UPDATE "core_agendamento"')), 2
+        )
+        resultados = {item['id']: item['resultado'] for item in resposta.json()['resultados']}
+        self.assertEqual(resultados, {
+            pendente.pk: 'alterado', cancelado.pk: 'invalido', 999: 'inexistente', confirmado.pk: 'inalterado',
+        })
+        self.assertEqual(
+            dict(Agendamento.objects.values_list('id', 'status')),
+            {pendente.pk: 'concluido', confirmado.pk: 'confirmado', cancelado.pk: 'cancelado'},
+        )
+
+    def test_nao_conclui_agendamento_cancelado(self):
+        agendamento = criar_agendamentos(1, status='cancelado')[0]
+        with self.assertRaises(ValidationError):
+            agendamento.marcar_concluido()
+
+
+class BuscaProfissionaisTests(TestCase):
+
+    def criar(self, nome, especializacao, bairro, aprovado=True):
+        return ProfissionalDePodologia.objects.create(
+            nome=nome, especializacao=especializacao, especialidade='Podologia clínica',
+            bairro=bairro, email='prof@example.com', aprovado=aprovado
+        )
+
+    def test_busca_sem_acentos_por_relevancia_e_apenas_aprovados(self):
+        infantil = self.criar('Ana Souza', 'Atendimento infantil, TEA', 'Centro')
+        self.criar('Bruno Lima', 'Atendimento infantil, TEA', 'Centro', aprovado=False)
+        self.criar('Carla Dias', 'Idosos', 'São José')
+        resposta = self.client.get('/api/profissionais/buscar/', {'q': 'tea INFANT centro'})
+        self.assertEqual([item['id'] for item in resposta.json()], [infantil.pk])
+
+        # O índice acompanha edições e exclusões.
+        ProfissionalDePodologia.objects.filter(pk=infantil.pk).update(bairro='Sao Jose')
+        resposta = self.client.get('/api/profissionais/buscar/', {'q': 'são josé'})
+        self.assertEqual(len(resposta.json()), 2)
+        infantil.delete()
+        resposta = self.client.get('/api/profissionais/buscar/', {'q': 'sao jose'})
+        self.assertEqual([item['nome'] for item in resposta.json()], ['Carla Dias'])
+
+
+class ProfissionaisProximosTests(TestCase):
+
+    def criar(self, nome, bairro=None, endereco=None, aprovado=True, dias=()):
+        profissional = ProfissionalDePodologia.objects.create(
+            nome=nome, especializacao='-', especialidade='-', email='prof@example.com',
+            bairro=bairro, endereco=endereco, aprovado=aprovado,
+        )
+        for dia in dias:
+            profissional.disponibilidade.add(
+                Disponibilidade.objects.create(dia=dia, horario_inicio=time(8), horario_fim=time(12))
+            )
+        return profissional
+
+    def proximos(self, **parametros):
+        resposta = self.client.get('/api/profissionais/proximos/', parametros)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        return [(item['nome'], item['distancia_km']) for item in resposta.json()]
+
+    def test_coordenadas_pelo_bairro_ou_endereco(self):
+        centro = self.criar('Ana', bairro='  CENTRO ')
+        pelo_endereco = self.criar('Bruno', endereco='Rua das Flores, 10 - Sao Jose')
+        self.assertEqual((centro.latitude, centro.longitude), geolocalizacao.bairros()['centro'])
+        self.assertEqual((pelo_endereco.latitude, pelo_endereco.longitude), geolocalizacao.bairros()['sao jose'])
+        pelo_endereco.endereco = 'Bairro desconhecido'
+        pelo_endereco.save()
+        self.assertIsNone(pelo_endereco.celula_lat)
+
+        ProfissionalDePodologia.objects.filter(pk=centro.pk).update(bairro='Planalto', latitude=None, celula_lat=None)
+        self.assertEqual(geolocalizacao.preencher(), 1)
+        centro.refresh_from_db()
+        self.assertEqual((centro.latitude, centro.longitude), geolocalizacao.bairros()['planalto'])
+
+    def test_k_mais_proximos_aprovados(self):
+        self.criar('Ana', 'Centro', dias=['segunda'])
+        self.criar('Bruno', 'Vila Nova', dias=['sabado'])
+        self.criar('Carla', 'Cidade Alta', dias=['sabado'])
+        self.criar('Daniel', 'Industrial')
+        self.criar('Eva', 'Centro', aprovado=False)
+
+        resultado = self.proximos(bairro='Centro', k=3)
+        self.assertEqual([nome for nome, _ in resultado], ['Ana', 'Bruno', 'Carla'])
+        self.assertEqual(resultado[0][1], 0)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(
+                [nome for nome, _ in self.proximos(bairro='Centro', k=3, dia='sabado')], ['Bruno', 'Carla']
+            )
+        # Sem vizinhos suficientes, o raio cresce rápido até o limite (quatro leituras de pontos); os ids vêm em
+        # duas consultas, por mais pontos que haja; depois, profissionais e disponibilidade.
+        self.assertEqual(len(consultas), 8)
+        # Conferência com a força bruta: distância de cada um até o ponto.
+        origem = (-5.15, -42.70)
+        todos = sorted(
+            (geolocalizacao.distancia(origem, (profissional.latitude, profissional.longitude)), profissional.nome)
+            for profissional in ProfissionalDePodologia.objects.filter(aprovado=True)
+        )
+        self.assertEqual(
+            [nome for nome, _ in self.proximos(latitude=origem[0], longitude=origem[1], k=2)],
+            [nome for _, nome in todos[:2]],
+        )
+        self.assertEqual(self.proximos(bairro='Centro', raio_km=1), [('Ana', 0)])
+        self.assertEqual(self.client.get('/api/profissionais/proximos/', {'bairro': 'Atlântida'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/profissionais/proximos/', {'latitude': -5}).status_code, 400)
+
+
+class RecomendacoesTests(TestCase):
+
+    def setUp(self):
+        self.clinico = TratamentoPodologico.objects.create(
+            nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico'
+        )
+        self.estetico = TratamentoPodologico.objects.create(
+            nome='Spa dos pés', descricao='-', duracao=30, preco=90, tipo='Estético'
+        )
+        self.ana, self.bruno, self.carla, self.daniel, self.eva = [
+            ProfissionalDePodologia.objects.create(
+                nome=nome, especializacao='-', especialidade='-', email='prof@example.com', aprovado=nome != 'Daniel'
+            )
+            for nome in ('Ana', 'Bruno', 'Carla', 'Daniel', 'Eva')
+        ]
+        # Quem gosta da Ana também gosta do Bruno (e do Daniel, não aprovado) e não da Carla.
+        for nome in ('Fã 1', 'Fã 2'):
+            cliente = Usuario.objects.create(nome=nome, email='cliente@example.com')
+            for profissional, nota in ((self.ana, 5), (self.bruno, 5), (self.daniel, 5), (self.carla, 1)):
+                self.atender(cliente, profissional, nota)
+        self.eva_cliente = Usuario.objects.create(nome='Estética', email='cliente@example.com')
+        self.atender(self.eva_cliente, self.eva, servico=self.estetico)
+        self.alvo = Usuario.objects.create(nome='Alvo', email='cliente@example.com')
+        self.atender(self.alvo, self.ana, 5)
+        self.estreante = Usuario.objects.create(nome='Estreante', email='cliente@example.com')
+        self.atender(self.estreante, self.carla, servico=self.estetico)
+        self.novo = Usuario.objects.create(nome='Novo', email='cliente@example.com')
+
+    def atender(self, cliente, profissional, nota=None, servico=None):
+        agendamento = Agendamento.objects.create(
+            usuario=cliente, profissional=profissional, data=date(2024, 12, 2), status='concluido'
+        )
+        agendamento.servicos.add(servico or self.clinico)
+        if nota:
+            Feedback.objects.create(usuario=cliente, agendamento=agendamento, nota=nota)
+
+    def recomendados(self, cliente, **parametros):
+        resposta = self.client.get(f'/api/usuarios/{cliente.pk}/recomendacoes/', parametros)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        dados = resposta.json()
+        return dados['origem'], [profissional['nome'] for profissional in dados['profissionais']]
+
+    def test_gerar_pelas_notas_e_pelos_tipos(self):
+        Recomendacao.objects.create(
+            usuario=self.novo, profissionais=[self.ana.pk], pontuacoes=[1], gerada_em=timezone.now()
+        )
+        # Os fãs já avaliaram todos os profissionais do seu tipo de tratamento.
+        self.assertEqual(recomendacoes.gerar(), 3)
+
+        alvo = Recomendacao.objects.get(usuario=self.alvo)
+        # Bruno pelas notas dos vizinhos e pelo tipo; Carla só pelo tipo; Ana já foi avaliada e Daniel não é aprovado.
+        self.assertEqual(alvo.profissionais, [self.bruno.pk, self.carla.pk])
+        # Carla: metade do cosseno entre os perfis de tipos (o do alvo e 2 Clínico + 1 Estético).
+        self.assertEqual(alvo.pontuacoes, [1.5, round(0.5 * 2 / 5 ** 0.5, 4)])
+        # Sem notas, só o perfil de tipos: Estético leva à Eva, depois à Carla, que também o atende.
+        self.assertEqual(Recomendacao.objects.get(usuario=self.estreante).profissionais, [self.eva.pk, self.carla.pk])
+        # Quem ficou sem histórico perde a linha antiga.
+        self.assertFalse(Recomendacao.objects.filter(usuario=self.novo).exists())
+
+    def test_api_le_a_linha_pre_calculada(self):
+        recomendacoes.gerar()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.recomendados(self.alvo), ('historico', ['Bruno', 'Carla']))
+        self.assertLessEqual(len(consultas), 3)
+        self.assertEqual(self.recomendados(self.alvo, k=1), ('historico', ['Bruno']))
+
+        self.bruno.aprovado = False
+        self.bruno.save()
+        self.assertEqual(self.recomendados(self.alvo), ('historico', ['Carla']))
+        # Sem histórico, os mais bem avaliados.
+        self.assertEqual(self.recomendados(self.novo, k=2), ('populares', ['Ana', 'Carla']))
+        self.assertEqual(self.client.get('/api/usuarios/999999/recomendacoes/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/usuarios/{self.alvo.pk}/recomendacoes/', {'k': 0}).status_code, 400)
+
+
+class VariantesDeFotosTests(TestCase):
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name, IMAGENS_SINCRONO=True)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def enviar_foto(self, objeto, cor='red'):
+        conteudo = BytesIO()
+        Image.new('RGB', (1200, 800), cor).save(conteudo, 'JPEG')
+        objeto.foto = ContentFile(conteudo.getvalue(), name='foto.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            objeto.save()
+        objeto.refresh_from_db()
+
+    def test_miniatura_gerada_apos_envio_e_reaproveitada_por_hash(self):
+        profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        self.enviar_foto(profissional)
+        with default_storage.open(imagens.caminho(profissional.foto_hash, 'thumb')) as arquivo:
+            with Image.open(arquivo) as miniatura:
+                self.assertEqual((miniatura.format, miniatura.size), ('WEBP', (160, 160)))
+
+        resposta = self.client.get(f'/api/profissionais/{profissional.pk}/')
+        self.assertEqual(
+            resposta.json()['foto_thumb'],
+            f'http://testserver/media/{imagens.caminho(profissional.foto_hash, "thumb")}',
+        )
+
+        # A mesma imagem enviada por outro usuário reaproveita as variantes do disco.
+        usuario = Usuario.objects.create(nome='Bruno', email='bruno@example.com')
+        self.enviar_foto(usuario)
+        self.assertEqual(usuario.foto_hash, profissional.foto_hash)
+        self.assertEqual(len(default_storage.listdir(f'{imagens.PASTA}/{usuario.foto_hash[:2]}')[1]), 2)
+
+        # Trocar ou remover a foto invalida a miniatura anterior.
+        self.enviar_foto(usuario, cor='blue')
+        self.assertNotEqual(usuario.foto_hash, profissional.foto_hash)
+        usuario.foto = None
+        usuario.save()
+        usuario.refresh_from_db()
+        self.assertIsNone(usuario.foto_hash)
+
+
+class CatalogoEmCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.tratamento = TratamentoPodologico.objects.create(
+            nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico'
+        )
+
+    def test_repeticao_sem_banco_e_304_com_etag(self):
+        primeira = self.client.get('/api/tratamentos/')
+        etag = primeira['ETag']
+        with self.assertNumQueries(0):
+            repetida = self.client.get('/api/tratamentos/')
+            nao_modificada = self.client.get('/api/tratamentos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.content, primeira.content)
+        self.assertEqual(repetida['ETag'], etag)
+        self.assertEqual(nao_modificada.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TratamentoPodologico.objects.create(nome='Órtese', descricao='-', duracao=60, preco=150, tipo='Clínico')
+        alterada = self.client.get('/api/tratamentos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(alterada.status_code, 200)
+        self.assertNotEqual(alterada['ETag'], etag)
+        self.assertEqual(len(alterada.json()), 2)
+
+    def test_repeticao_mantem_cabecalhos_e_separa_por_host(self):
+        primeira = self.client.get('/api/tratamentos/')
+        with self.assertNumQueries(0):
+            repetida = self.client.get('/api/tratamentos/')
+        for cabecalho in ('Content-Type', 'Vary', 'Allow'):
+            self.assertEqual(repetida[cabecalho], primeira[cabecalho])
+
+        # O corpo tem URLs absolutas: outro esquema ou host não reaproveita a entrada.
+        with self.assertNumQueries(1):
+            segura = self.client.get('/api/tratamentos/', secure=True)
+        self.assertNotEqual(segura['ETag'], primeira['ETag'])
+
+    def test_disponibilidade_e_avaliacoes_invalidam_profissionais(self):
+        profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        url = f'/api/profissionais/{profissional.pk}/'
+        self.assertEqual(self.client.get(url).json()['disponibilidade'], [])
+
+        disponibilidade = Disponibilidade.objects.create(dia='segunda', horario_inicio=time(8), horario_fim=time(12))
+        profissional.disponibilidade.add(disponibilidade)
+        self.assertEqual(len(self.client.get(url).json()['disponibilidade']), 1)
+
+        # O resumo de avaliações é gravado com UPDATE, sem sinais do profissional.
+        usuario = Usuario.objects.create(nome='Bruno', email='bruno@example.com')
+        agendamento = Agendamento.objects.create(
+            usuario=usuario, profissional=profissional, data=date(2024, 11, 4), status='concluido'
+        )
+        Feedback.objects.create(usuario=usuario, agendamento=agendamento, nota=4, comentario='-')
+        self.assertEqual(self.client.get(url).json()['avaliacao_media'], 4.0)
+
+
+@override_settings(SQLITE_FILA_DE_ESCRITA=True)
+class FilaDeEscritaTests(TransactionTestCase):
+
+    def test_escritas_concorrentes_passam_pela_fila(self):
+        self.addCleanup(escrita.fila.encerrar)
+        threads = set()
+
+        def criar(indice):
+            threads.add(threading.current_thread().name)
+            if indice == 3:
+                raise ValidationError('falha')
+            return TratamentoPodologico.objects.create(
+                nome=f'T{indice}', descricao='-', duracao=30, preco=80, tipo='Clínico'
+            ).pk
+
+        def enviar(indice):
+            try:
+                return escrita.executar(criar, indice)
+            except ValidationError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            resultados = list(pool.map(enviar, range(20)))
+
+        self.assertEqual(threads, {'fila-de-escrita'})
+        self.assertIsNone(resultados[3])
+        self.assertEqual(TratamentoPodologico.objects.count(), 19)
+        self.assertEqual(
+            sorted(TratamentoPodologico.objects.values_list('pk', flat=True)), sorted(r for r in resultados if r)
+        )
+
+
+class LeituraAssincronaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        agendamentos = criar_agendamentos(3, com_feedback=True)
+        self.profissional = agendamentos[0].profissional
+        self.esperado = {
+            url: self.client.get(url.replace('/api/async/', '/api/')).json()
+            for url in (
+                '/api/async/agendamentos/?tamanho=2',
+                '/api/async/feedbacks/',
+                f'/api/async/profissionais/{self.profissional.pk}/',
+                '/api/async/profissionais/?ordering=-avaliacao_media&avaliacao_minima=4',
+            )
+        }
+
+    async def test_mesmas_respostas_da_api_sincrona(self):
+        for url, esperado in self.esperado.items():
+            resposta = await self.async_client.get(url)
+            # Os links de paginação apontam para o próprio endpoint assíncrono.
+            self.assertEqual(json.loads(resposta.content.decode().replace('/api/async/', '/api/')), esperado, url)
+
+        proxima = self.esperado['/api/async/agendamentos/?tamanho=2']['next'].replace('/api/', '/api/async/')
+        self.assertEqual(len((await self.async_client.get(proxima)).json()['results']), 1)
+        self.assertEqual((await self.async_client.get('/api/async/feedbacks/999/')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/async/feedbacks/?cursor=x')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/async/profissionais/?avaliacao_minima=x')).status_code, 400)
+
+
+class HorariosLivresTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+        self.profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        # Janelas sobrepostas de segunda-feira se unem em 8h–13h; a da tarde fica separada.
+        for inicio, fim in ((8, 12), (11, 13), (14, 16)):
+            self.profissional.disponibilidade.add(
+                Disponibilidade.objects.create(dia='segunda', horario_inicio=time(inicio), horario_fim=time(fim))
+            )
+        self.servico = TratamentoPodologico.objects.create(
+            nome='Curativo', descricao='-', duracao=20, preco=60, tipo='Clínico'
+        )
+        self.segunda = date(2030, 1, 7)
+
+    def agendar(self, horario, status='confirmado'):
+        agendamento = Agendamento.objects.create(
+            usuario=self.usuario, profissional=self.profissional, data=self.segunda, horario_inicio=horario,
+            status=status,
+        )
+        agendamento.servicos.add(self.servico)
+        return agendamento
+
+    def test_janelas_descontam_agendamentos_e_reservas_retidas(self):
+        self.agendar(time(9))
+        self.agendar(time(15), status='cancelado')
+        Reserva.objects.create(
+            profissional=self.profissional, usuario=self.usuario, data=self.segunda, horario_inicio=time(10),
+            duracao=45, expira_em=timezone.now() + timedelta(minutes=10),
+        )
+        Reserva.objects.create(
+            profissional=self.profissional, usuario=self.usuario, data=self.segunda, horario_inicio=time(12),
+            duracao=30, expira_em=timezone.now() - timedelta(minutes=1),
+        )
+        with self.assertNumQueries(3):
+            indice = agenda.IndiceDeHorarios(self.segunda, dias=14)
+            self.assertEqual(
+                indice.livres(self.profissional.pk, self.segunda), [(480, 540), (560, 600), (645, 780), (840, 960)]
+            )
+            self.assertEqual(indice.livres(self.profissional.pk, self.segunda + timedelta(days=1)), [])
+        # A segunda semana é lida só quando consultada.
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                indice.livres(self.profissional.pk, self.segunda + timedelta(days=7)), [(480, 780), (840, 960)]
+            )
+
+    def test_inicios_alinhados_a_grade_e_corte_de_hoje(self):
+        self.agendar(time(8, 10))
+        horarios = agenda.proximos_horarios_livres(
+            [self.servico.pk], quantidade=3, inicio=self.segunda, dias=7, agora=datetime(2030, 1, 6, 20)
+        )
+        # O agendamento ocupa 8h10–8h30; o primeiro início livre na grade é 8h30.
+        self.assertEqual(
+            [(horario.horario_inicio, horario.horario_fim) for horario in horarios],
+            [(time(8, 30), time(8, 50)), (time(8, 45), time(9, 5)), (time(9), time(9, 20))],
+        )
+
+        # Hoje, só a partir do próximo início da grade depois de agora.
+        horarios = agenda.proximos_horarios_livres(
+            [self.servico.pk], quantidade=1, inicio=self.segunda, dias=7, agora=datetime(2030, 1, 7, 12, 45)
+        )
+        self.assertEqual((horarios[0].data, horarios[0].horario_inicio), (self.segunda, time(14)))
+        # Datas anteriores a hoje são ignoradas: a próxima segunda com expediente.
+        horarios = agenda.proximos_horarios_livres(
+            [self.servico.pk], quantidade=1, inicio=self.segunda, dias=14, agora=datetime(2030, 1, 7, 16)
+        )
+        self.assertEqual((horarios[0].data, horarios[0].horario_inicio), (date(2030, 1, 14), time(8)))
+
+    def test_agendamento_sem_horario_nao_bloqueia_a_grade(self):
+        self.agendar(None)
+        indice = agenda.IndiceDeHorarios(self.segunda, dias=7)
+        self.assertEqual(indice.livres(self.profissional.pk, self.segunda), [(480, 780), (840, 960)])
+        reserva = reservas.reservar(self.profissional.pk, self.usuario.pk, self.segunda, time(8), [self.servico.pk])
+        self.assertEqual(reserva.horario_inicio, time(8))
+
+    def test_servico_inexistente(self):
+        self.assertIsNone(agenda.proximos_horarios_livres([self.servico.pk, 999]))
+        resposta = self.client.get('/api/profissionais/horarios-livres/', {'servicos': [self.servico.pk, 999]})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('servicos', resposta.json())
+
+
+class ReservaDeHorarioTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+        self.profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        self.profissional.disponibilidade.add(
+            Disponibilidade.objects.create(dia='segunda', horario_inicio=time(8), horario_fim=time(12))
+        )
+        self.servico = TratamentoPodologico.objects.create(
+            nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico'
+        )
+
+    def reservar(self, horario, dia=date(2030, 1, 7)):
+        return self.client.post('/api/reservas/', {
+            'profissional': self.profissional.pk, 'usuario': self.usuario.pk, 'servicos': [self.servico.pk],
+            'data': dia.isoformat(), 'horario_inicio': horario,
+        }, content_type='application/json')
+
+    def test_reserva_confirmacao_e_conflitos(self):
+        reserva = self.reservar('09:00')
+        self.assertEqual(reserva.status_code, 201)
+        # Sobreposição parcial, fora do expediente e horário retido fora da agenda livre.
+        self.assertEqual(self.reservar('09:15').status_code, 409)
+        self.assertEqual(self.reservar('11:45').status_code, 409)
+        livres = self.client.get('/api/profissionais/horarios-livres/', {
+            'servicos': self.servico.pk, 'inicio': '2030-01-07', 'dias': 1, 'quantidade': 20
+        }).json()
+        self.assertNotIn('09:00:00', [horario['horario_inicio'] for horario in livres])
+
+        pk = reserva.json()['id']
+        confirmacao = self.client.post(f'/api/reservas/{pk}/confirmar/')
+        self.assertEqual(confirmacao.status_code, 201)
+        self.assertEqual(confirmacao.json()['horario_inicio'], '09:00:00')
+        self.assertEqual(self.client.post(f'/api/reservas/{pk}/confirmar/').status_code, 409)
+
+        # Cancelar o agendamento libera o horário.
+        Agendamento.objects.get(pk=confirmacao.json()['id']).cancelar()
+        self.assertEqual(self.reservar('09:15').status_code, 201)
+
+    def test_reserva_vencida_nao_confirma_e_libera_o_horario(self):
+        pk = self.reservar('10:00').json()['id']
+        Reserva.objects.filter(pk=pk).update(expira_em=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client.post(f'/api/reservas/{pk}/confirmar/').status_code, 409)
+        self.assertEqual(self.reservar('10:00').status_code, 201)
+        self.assertFalse(Reserva.objects.filter(pk=pk).exists())
+
+    def test_remarcar_ou_excluir_libera_as_ocupacoes(self):
+        agendamento = reservas.confirmar(self.reservar('09:00').json()['id'])
+        agendamento.horario_inicio = time(10)
+        agendamento.save()
+        self.assertFalse(OcupacaoDeHorario.objects.filter(reserva__agendamento=agendamento).exists())
+        # O horário antigo volta a ficar livre; o novo é conferido diretamente, sem as ocupações.
+        self.assertEqual(self.reservar('10:15').status_code, 409)
+        self.assertEqual(self.reservar('09:00').status_code, 201)
+
+        outro = reservas.confirmar(self.reservar('11:00').json()['id'])
+        outro.servicos.add(TratamentoPodologico.objects.create(
+            nome='Órtese', descricao='-', duracao=30, preco=150, tipo='Clínico'
+        ))
+        self.assertEqual(self.reservar('11:30').status_code, 409)
+        outro.delete()
+        self.assertEqual(self.reservar('11:30').status_code, 201)
+        self.assertEqual(set(OcupacaoDeHorario.objects.values_list('reserva__status', flat=True)), {'retida'})
+
+
+@override_settings(SQLITE_FILA_DE_ESCRITA=True)
+def disputar_horarios(threads):
+    """
+    ``threads`` chamadas simultâneas de ``reservas.reservar`` para horários
+    sobrepostos. Retorna reservas retidas, gravadas e ocupações no banco.
+    """
+    usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+    profissional = ProfissionalDePodologia.objects.create(
+        nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+    )
+    profissional.disponibilidade.add(
+        Disponibilidade.objects.create(dia='segunda', horario_inicio=time(8), horario_fim=time(10))
+    )
+    servico = TratamentoPodologico.objects.create(nome='Avaliação', descricao='-', duracao=45, preco=80, tipo='Clínico')
+    horarios = [time(8, 30), time(8, 45), time(9)]
+    largada = threading.Barrier(threads)
+
+    def tentar(indice):
+        largada.wait()
+        try:
+            return reservas.reservar(
+                profissional.pk, usuario.pk, date(2030, 1, 7), horarios[indice % len(horarios)], [servico.pk]
+            )
+        except reservas.HorarioIndisponivel:
+            return None
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        retidas = [reserva for reserva in pool.map(tentar, range(threads)) if reserva]
+    return len(retidas), Reserva.objects.count(), OcupacaoDeHorario.objects.count()
+
+
+class ReservaConcorrenteTests(TransactionTestCase):
+
+    def test_sem_agendamento_em_dobro_nos_horarios_disputados(self):
+        self.addCleanup(escrita.fila.encerrar)
+        usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+        profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        profissional.disponibilidade.add(
+            Disponibilidade.objects.create(dia='segunda', horario_inicio=time(8), horario_fim=time(10))
+        )
+        servico = TratamentoPodologico.objects.create(nome='Avaliação', descricao='-', duracao=45, preco=80, tipo='Clínico')
+        horarios = [time(8), time(8, 15), time(8, 30), time(9), time(9, 15)]
+
+        def tentar(indice):
+            try:
+                reserva = escrita.executar(
+                    reservas.reservar, profissional.pk, usuario.pk, date(2030, 1, 7),
+                    horarios[indice % len(horarios)], [servico.pk],
+                )
+                return escrita.executar(reservas.confirmar, reserva.pk).pk
+            except reservas.HorarioIndisponivel:
+                return None
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            confirmados = [pk for pk in pool.map(tentar, range(200)) if pk]
+
+        inicios = sorted(
+            agenda._minutos(horario)
+            for horario in Agendamento.objects.filter(pk__in=confirmados).values_list('horario_inicio', flat=True)
+        )
+        self.assertTrue(inicios)
+        for anterior, seguinte in zip(inicios, inicios[1:]):
+            self.assertGreaterEqual(seguinte - anterior, 45)
+
+    def test_disputa_direta_pela_tabela_de_ocupacoes(self):
+        # Sem a fila de escrita, num arquivo SQLite com o perfil de produção: as
+        # threads gravam ao mesmo tempo e só a restrição única decide.
+        retidas, gravadas, ocupacoes = em_banco_de_arquivo(
+            dict(connection.settings_dict['OPTIONS']), False, disputar_horarios, 12
+        )
+        # Os três horários disputados se sobrepõem dois a dois: só uma reserva pode vencer.
+        self.assertEqual((retidas, gravadas, ocupacoes), (1, 1, 3))
+
+
+class EstatisticasDiariasTests(TestCase):
+
+    def assertSemDivergencias(self):
+        self.assertEqual(estatisticas.divergencias(), [])
+
+    def test_estatisticas_acompanham_agendamentos_e_servicos(self):
+        primeiro, segundo, terceiro = criar_agendamentos(3, status='pendente')
+        self.assertSemDivergencias()
+
+        primeiro.transicionar('confirmado')
+        Agendamento.objects.filter(pk__in=[primeiro.pk, segundo.pk]).transicionar('concluido')
+        terceiro.servicos.remove(terceiro.servicos.first())
+        self.assertSemDivergencias()
+
+        servico = segundo.servicos.first()
+        servico.preco = 999
+        servico.save()
+        servico.agendamentos.clear()
+        terceiro.data = date(2024, 12, 3)
+        terceiro.save()
+        primeiro.delete()
+        self.assertSemDivergencias()
+
+        resposta = self.client.get('/api/estatisticas/', {'inicio': '2024-12-01', 'fim': '2024-12-31'})
+        self.assertEqual(
+            [(linha['data'], linha['total_concluido'], linha['total_pendente']) for linha in resposta.json()],
+            [('2024-12-02', 1, 0), ('2024-12-03', 0, 1)],
+        )
+        self.assertEqual(resposta.json()[0]['receita_concluido'], '150.00')
+        self.assertEqual(
+            self.client.get('/api/estatisticas/', {'inicio': '2024-01-01', 'fim': '2025-12-31'}).status_code, 400
+        )
+
+    def test_mudanca_de_preco_reconstroi_o_periodo_uma_vez(self):
+        agendamentos = criar_agendamentos(3)
+        servico = agendamentos[0].servicos.first()
+        for deslocamento, agendamento in enumerate(agendamentos):
+            agendamento.data = date(2024, 12, 2) + timedelta(days=deslocamento)
+            agendamento.save()
+            agendamento.servicos.add(servico)
+        with CaptureQueriesContext(connection) as consultas:
+            servico.preco = 999
+            servico.save()
+        self.assertEqual(
+            sum(1 for consulta in consultas if consulta['sql'].startswith('DELETE FROM "core_estatisticadiaria"')), 1
+        )
+        self.assertSemDivergencias()
+
+    def test_comando_detecta_e_corrige_divergencia(self):
+        criar_agendamentos(2)
+        EstatisticaDiaria.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('recalcular_estatisticas', '--verificar', stdout=StringIO())
+        call_command('recalcular_estatisticas', stdout=StringIO())
+        self.assertSemDivergencias()
+        self.assertEqual(EstatisticaDiaria.objects.get(profissional=None).total_concluido, 2)
+
+    def test_registro_em_lote_quando_o_insert_falha(self):
+        profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        # O INSERT em lote é desfeito, como quando outra transação cria uma das linhas no meio do caminho.
+        with mock.patch.object(EstatisticaDiaria.objects, 'bulk_create', side_effect=IntegrityError):
+            estatisticas.registrar_em_lote({(date(2024, 12, 2), profissional.pk, 'concluido'): (2, 100)})
+        linhas = EstatisticaDiaria.objects.values_list('profissional_id', 'total_concluido', 'receita_concluido')
+        self.assertEqual({pk: totais for pk, *totais in linhas}, {profissional.pk: [2, 100], None: [2, 100]})
+
+
+class AgendamentosEmLoteTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+        self.profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com', aprovado=True
+        )
+        self.avaliacao = TratamentoPodologico.objects.create(
+            nome='Avaliação', descricao='-', duracao=30, preco=80, tipo='Clínico'
+        )
+        self.ortese = TratamentoPodologico.objects.create(
+            nome='Órtese', descricao='-', duracao=45, preco=150, tipo='Clínico'
+        )
+
+    def item(self, **campos):
+        return {
+            'usuario': self.usuario.pk, 'profissional': self.profissional.pk,
+            'servicos': [self.avaliacao.pk, self.ortese.pk], 'data': '2030-01-07', 'horario_inicio': '09:00',
+        } | campos
+
+    def enviar(self, itens, **opcoes):
+        return self.client.post(
+            '/api/agendamentos/em-lote/', {'agendamentos': itens, **opcoes}, content_type='application/json'
+        )
+
+    def test_erros_por_item_e_conflitos(self):
+        Agendamento.objects.create(
+            usuario=self.usuario, profissional=self.profissional, data=date(2030, 1, 7), horario_inicio=time(8)
+        ).servicos.add(self.avaliacao)
+        resposta = self.enviar([
+            self.item(),
+            self.item(horario_inicio='10:00'),                  # Conflita com o item anterior (09:00-10:15).
+            self.item(horario_inicio='08:15'),                  # Conflita com o agendamento existente.
+            self.item(usuario=999),
+            self.item(servicos=[self.avaliacao.pk, 999]),
+            self.item(data='amanhã'),
+            self.item(horario_inicio='10:15', status='cancelado'),
+            self.item(horario_inicio='10:15'),
+        ])
+        self.assertEqual(resposta.status_code, 201)
+        corpo = resposta.json()
+        self.assertEqual((corpo['criados'], corpo['recusados']), (3, 5))
+        resultados = corpo['resultados']
+        self.assertEqual([indice for indice, resultado in enumerate(resultados) if 'id' in resultado], [0, 6, 7])
+        self.assertEqual(resultados[1]['erros'], {'horario_inicio': ['Horário já ocupado.']})
+        self.assertEqual(resultados[2]['erros'], {'horario_inicio': ['Horário já ocupado.']})
+        self.assertIn('usuario', resultados[3]['erros'])
+        self.assertIn('servicos', resultados[4]['erros'])
+        self.assertIn('data', resultados[5]['erros'])
+
+        criado = Agendamento.objects.get(pk=resultados[0]['id'])
+        self.assertEqual(set(criado.servicos.all()), {self.avaliacao, self.ortese})
+        self.assertEqual(estatisticas.divergencias(), [])
+
+        # Sem a verificação, o horário ocupado é aceito.
+        self.assertEqual(self.enviar([self.item()], verificar_conflitos=False).status_code, 201)
+
+    def test_tudo_ou_nada(self):
+        resposta = self.enviar([self.item(), self.item(usuario=999)], tudo_ou_nada=True)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(
+            resposta.json()['resultados'][0]['erros'], {'lote': ['Lote recusado por erros em outros itens.']}
+        )
+        self.assertFalse(Agendamento.objects.exists())
+        self.assertEqual(self.enviar([]).status_code, 400)
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        contagens = {}
+        for dia, tamanho in enumerate((1, 10, 50), start=1):
+            itens = [
+                self.item(data=f'2030-02-{dia:02d}', horario_inicio=None)
+                for _ in range(tamanho)
+            ]
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.enviar(itens).json()['criados'], tamanho)
+            contagens[tamanho] = len(consultas)
+        self.assertEqual(len(set(contagens.values())), 1, contagens)
+        self.assertEqual(estatisticas.divergencias(), [])
+
+
+class TotaisDoAgendamentoTests(TestCase):
+
+    def setUp(self):
+        self.agendamentos = criar_agendamentos(3)
+        # Totais: 230, 230 + 200 = 430 e sem serviços (zero).
+        self.agendamentos[1].servicos.add(
+            TratamentoPodologico.objects.create(nome='Laser', descricao='-', duracao=60, preco=200, tipo='Clínico')
+        )
+        self.agendamentos[2].servicos.clear()
+
+    def test_totais_calculados_no_banco(self):
+        totais = {
+            agendamento.pk: (agendamento.preco_total, agendamento.duracao_total)
+            for agendamento in Agendamento.objects.com_totais()
+        }
+        primeiro, segundo, sem_servicos = self.agendamentos
+        self.assertEqual(totais[primeiro.pk], (230, 75))
+        self.assertEqual(totais[segundo.pk], (430, 135))
+        self.assertEqual(totais[sem_servicos.pk], (0, 0))
+
+    def test_filtro_e_ordenacao_pelos_totais(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/agendamentos/', {
+                'inicio': '2024-12-01', 'fim': '2024-12-31', 'preco_total_min': '200', 'ordenacao': '-preco_total',
+            })
+        self.assertEqual([(item['id'], item['preco_total']) for item in resposta.json()['results']], [
+            (self.agendamentos[1].pk, '430.00'), (self.agendamentos[0].pk, '230.00'),
+        ])
+        principal = [consulta['sql'] for consulta in consultas if 'FROM "core_agendamento"' in consulta['sql']]
+        self.assertEqual(len(principal), 1)
+
+        # O cursor guarda o total e continua na mesma ordem.
+        for ordenacao, esperado in (('duracao_total', [0, 75, 135]), ('-preco_total', ['430.00', '230.00', '0.00'])):
+            vistos, resposta = [], self.client.get('/api/agendamentos/', {'ordenacao': ordenacao, 'tamanho': 1})
+            while True:
+                dados = resposta.json()
+                vistos += [item[ordenacao.lstrip('-')] for item in dados['results']]
+                if not dados['next']:
+                    break
+                resposta = self.client.get(dados['next'])
+            self.assertEqual(vistos, esperado)
+
+    def test_feedback_soma_servicos_sem_anotacao(self):
+        Feedback.objects.create(usuario=self.agendamentos[1].usuario, agendamento=self.agendamentos[1], nota=4)
+        item = self.client.get('/api/feedbacks/').json()['results'][0]
+        self.assertEqual((item['agendamento']['preco_total'], item['agendamento']['duracao_total']), ('430.00', 135))
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get('/api/agendamentos/', {'ordenacao': 'usuario'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/agendamentos/', {'preco_total_min': 'muito'}).status_code, 400)
+
+
+class IdadeDoUsuarioTests(TestCase):
+
+    def test_anotacao_igual_ao_calculo_em_python(self):
+        nascimentos = [date(2000, 2, 29), date(1960, 3, 1), date(2010, 2, 28), date(1999, 12, 31), None]
+        Usuario.objects.bulk_create([
+            Usuario(nome=str(nascimento), email='cliente@example.com', data_nasc=nascimento) for nascimento in nascimentos
+        ])
+        for hoje in (date(2025, 2, 28), date(2025, 3, 1), date(2024, 2, 29), date(2024, 12, 31)):
+            for usuario in Usuario.objects.com_idade(hoje):
+                esperado = idade_em(usuario.data_nasc, hoje) if usuario.data_nasc else None
+                self.assertEqual(usuario.idade, esperado, (usuario.data_nasc, hoje))
+                idade = usuario.idade
+                if idade is not None:
+                    self.assertTrue(Usuario.objects.idade_entre(idade, idade, hoje).filter(pk=usuario.pk).exists())
+                    self.assertFalse(Usuario.objects.idade_entre(idade + 1, None, hoje).filter(pk=usuario.pk).exists())
+        self.assertEqual(idade_em(date(2000, 2, 29), date(2025, 2, 28)), 24)
+        self.assertEqual(idade_em(date(2000, 2, 29), date(2025, 3, 1)), 25)
+
+    def test_filtros_ordenacao_e_distribuicao(self):
+        hoje = date.today()
+        for anos in (5, 17, 18, 45, 59, 60, 82):
+            Usuario.objects.create(nome=f'{anos} anos', email='cliente@example.com', data_nasc=anos_antes(hoje, anos))
+        Usuario.objects.create(nome='Sem data', email='cliente@example.com')
+
+        idosos = self.client.get('/api/usuarios/', {'faixa': 'idoso', 'ordering': '-idade'}).json()
+        self.assertEqual([usuario['idade'] for usuario in idosos], [82, 60])
+        intervalo = self.client.get('/api/usuarios/', {'idade_min': 17, 'idade_max': 45, 'ordering': 'idade'}).json()
+        self.assertEqual([usuario['idade'] for usuario in intervalo], [17, 18, 45])
+        self.assertEqual(self.client.get('/api/usuarios/', {'faixa': 'bebe'}).status_code, 400)
+
+        with self.assertNumQueries(1):
+            distribuicao = self.client.get('/api/usuarios/idades/').json()
+        self.assertEqual(
+            {item['faixa']: item['total'] for item in distribuicao},
+            {'pediatrico': 2, 'adulto': 3, 'idoso': 2, None: 1},
+        )
+
+    def test_filtro_do_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+        Usuario.objects.create(nome='Ana', email='ana@example.com', data_nasc=anos_antes(date.today(), 70))
+        Usuario.objects.create(nome='Bia', email='bia@example.com', data_nasc=anos_antes(date.today(), 8))
+        resposta = self.client.get('/admin/core/usuario/', {'faixa': 'pediatrico', 'o': '5'})
+        self.assertEqual([usuario.nome for usuario in resposta.context['cl'].result_list], ['Bia'])
+
+
+class AdminDeTabelasGrandesTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+
+    def test_consultas_por_pagina_do_changelist(self):
+        # Sessão, usuário, contagem limitada, página com joins e 4 buscas da hierarquia de datas.
+        for url in ('/admin/core/agendamento/', '/admin/core/feedback/'):
+            for quantidade in (1, 20):
+                criar_agendamentos(quantidade, com_feedback=True)
+                with self.assertNumQueries(8):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_contagem_limitada(self):
+        criar_agendamentos(5)
+        with mock.patch.object(ContagemLimitadaPaginator, 'limite', 3), CaptureQueriesContext(connection) as consultas:
+            todos = self.client.get('/admin/core/agendamento/').context['cl']
+            filtrados = self.client.get('/admin/core/agendamento/', {'status__exact': 'concluido'}).context['cl']
+        self.assertEqual(todos.result_count, Agendamento.objects.order_by('-pk').first().pk)
+        self.assertEqual(filtrados.result_count, 3)
+        self.assertIsNone(todos.full_result_count)
+        self.assertFalse([consulta for consulta in consultas if consulta['sql'].startswith('SELECT COUNT(*) AS')])
+
+    def test_hierarquia_de_datas_pelo_indice(self):
+        for agendamento, data in zip(criar_agendamentos(4), ['2022-03-10', '2023-07-01', '2023-07-20', '2024-12-02']):
+            Agendamento.objects.filter(pk=agendamento.pk).update(data=data)
+        with CaptureQueriesContext(connection) as consultas:
+            anos = self.client.get('/admin/core/agendamento/').content.decode()
+            meses = self.client.get('/admin/core/agendamento/', {'data__year': 2023}).content.decode()
+        for ano in (2022, 2023, 2024):
+            self.assertIn(f'?data__year={ano}"', anos)
+        self.assertIn('data__month=7', meses)
+        self.assertNotIn('data__month=3', meses)
+        self.assertFalse([consulta for consulta in consultas if 'DISTINCT' in consulta['sql']])
+
+    def test_formularios_usam_autocomplete(self):
+        criar_agendamentos(3, com_feedback=True)
+        for url in ('/admin/core/agendamento/add/', '/admin/core/feedback/add/'):
+            conteudo = self.client.get(url).content.decode()
+            self.assertIn('admin-autocomplete', conteudo)
+            self.assertNotIn('>Cliente</option>', conteudo)
+
+
+class InstrumentacaoTests(TestCase):
+
+    def medir(self, view, **configuracao):
+        with override_settings(**{'INSTRUMENTACAO': True} | configuracao):
+            middleware = InstrumentacaoMiddleware(view)
+        return middleware(RequestFactory().get('/api/agendamentos/'))
+
+    def test_server_timing_com_consultas_e_templates(self):
+        criar_agendamentos(3)
+
+        def view(request):
+            list(Agendamento.objects.all())
+            list(Usuario.objects.all())
+            return HttpResponse(Template('{% for i in itens %}{{ i }}{% endfor %}').render(Context({'itens': range(5000)})))
+
+        resposta = self.medir(view)
+        metricas = dict(item.split(';', 1) for item in resposta['Server-Timing'].split(', '))
+        self.assertIn('desc="2 consultas"', metricas['db'])
+        self.assertGreater(float(metricas['tpl'].removeprefix('dur=')), 0)
+
+    def test_log_de_requisicao_lenta_e_de_n_mais_1(self):
+        agendamentos = criar_agendamentos(4)
+
+        def view(request):
+            for agendamento in Agendamento.objects.all():
+                agendamento.usuario.nome
+            return HttpResponse()
+
+        with self.assertLogs('core.instrumentacao', 'WARNING') as logs:
+            self.medir(view, INSTRUMENTACAO_LIMITE_MS=0, INSTRUMENTACAO_REPETICOES=len(agendamentos))
+        lenta, repetidas = logs.records
+        dados = json.loads(lenta.getMessage().removeprefix('requisicao_lenta '))
+        self.assertEqual((dados['caminho'], dados['consultas']), ('/api/agendamentos/', 5))
+        self.assertEqual(len(dados['piores']), 5)
+        dados = json.loads(repetidas.getMessage().removeprefix('consultas_repetidas '))
+        self.assertEqual(dados['repetidas'][0]['vezes'], 4)
+        self.assertIn('FROM "core_usuario"', dados['repetidas'][0]['sql'])
+
+    def test_caminho_assincrono(self):
+        criar_agendamentos(2)
+
+        async def view(request):
+            return HttpResponse(str(await Agendamento.objects.acount()))
+
+        with override_settings(INSTRUMENTACAO=True):
+            middleware = InstrumentacaoMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        resposta = async_to_sync(middleware)(RequestFactory().get('/api/async/agendamentos/'))
+        self.assertEqual(resposta.content, b'2')
+        self.assertIn('desc="1 consultas"', resposta['Server-Timing'])
+
+    def test_desligada_sai_da_cadeia(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.medir(lambda request: HttpResponse(), INSTRUMENTACAO=False)
+
+
+class ArquivamentoTests(TestCase):
+
+    def setUp(self):
+        # criar_agendamentos usa 2024-12-02; com um ano de idade, o corte fica em 2025-01-01.
+        self.antigos = criar_agendamentos(3, com_feedback=True)
+        self.cancelado, self.pendente, self.recente = criar_agendamentos(3, status='pendente')
+        self.cancelado.cancelar()
+        self.recente.transicionar('concluido')
+        Agendamento.objects.filter(pk=self.recente.pk).update(data=date(2025, 6, 1))
+        estatisticas.reconstruir()
+
+    def arquivar(self, **opcoes):
+        return arquivamento.arquivar(hoje=date(2026, 1, 1), idade=365, pausa=0, **opcoes)
+
+    def test_move_finalizados_antigos_sem_alterar_os_totais(self):
+        dashboard = list(EstatisticaDiaria.objects.order_by('data', 'profissional').values())
+        self.assertEqual(self.arquivar(lote=2), 4)
+        self.assertEqual(set(Agendamento.objects.values_list('pk', flat=True)), {self.pendente.pk, self.recente.pk})
+        self.assertEqual(
+            set(AgendamentoArquivado.objects.values_list('pk', flat=True)),
+            {agendamento.pk for agendamento in self.antigos} | {self.cancelado.pk},
+        )
+        self.assertFalse(Feedback.objects.exists())
+        self.assertEqual(FeedbackArquivado.objects.count(), 3)
+        arquivado = AgendamentoArquivado.objects.get(pk=self.antigos[0].pk)
+        self.assertEqual((arquivado.preco_total, arquivado.duracao_total, arquivado.servicos.count()), (230, 75, 2))
+
+        # Estatísticas e avaliações continuam contando o histórico.
+        self.assertEqual(list(EstatisticaDiaria.objects.order_by('data', 'profissional').values()), dashboard)
+        self.assertEqual(estatisticas.divergencias(), [])
+        self.assertEqual(avaliacoes.divergencias(), [])
+        self.assertEqual(self.arquivar(), 0)
+
+        # Excluir o cliente leva o histórico junto e desconta os totais.
+        self.antigos[0].usuario.delete()
+        self.assertEqual(estatisticas.divergencias(), [])
+        self.assertEqual(avaliacoes.divergencias(), [])
+
+    def test_historico_so_quando_pedido(self):
+        self.arquivar()
+        ids = [item['id'] for item in self.client.get('/api/agendamentos/').json()['results']]
+        self.assertEqual(sorted(ids), sorted([self.pendente.pk, self.recente.pk]))
+
+        usuario = self.antigos[1].usuario_id
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/agendamentos-arquivados/', {'usuario': usuario})
+        self.assertEqual(resposta.status_code, 200)
+        [item] = resposta.json()['results']
+        self.assertEqual((item['id'], item['preco_total'], item['feedback']['nota']), (self.antigos[1].pk, '230.00', 5))
+        self.assertLessEqual(len(consultas), 6)
+        sem_feedback = self.client.get(f'/api/agendamentos-arquivados/{self.cancelado.pk}/').json()
+        self.assertIsNone(sem_feedback['feedback'])
+        self.assertEqual(self.client.get(f'/api/agendamentos/{self.cancelado.pk}/').status_code, 404)
+
+    def test_exportacao_inclui_os_arquivados_com_o_preco_congelado(self):
+        self.arquivar()
+        TratamentoPodologico.objects.update(preco=1)
+        resposta = self.client.get('/api/agendamentos/exportar/', {'formato': 'jsonl', 'fim': '2024-12-31'})
+        registros = [json.loads(linha) for linha in b''.join(resposta.streaming_content).splitlines()]
+        self.assertEqual(
+            [registro['id'] for registro in registros],
+            sorted([agendamento.pk for agendamento in self.antigos] + [self.cancelado.pk, self.pendente.pk]),
+        )
+        arquivado = next(registro for registro in registros if registro['id'] == self.antigos[0].pk)
+        self.assertEqual((arquivado['preco_total'], len(arquivado['servicos'])), ('230.00', 2))
+
+        saida = StringIO()
+        call_command('exportar_agendamentos', '--formato', 'csv', '--status', 'cancelado', stdout=saida)
+        self.assertEqual(len(saida.getvalue().splitlines()), 2)
+        with self.assertRaises(CommandError):
+            call_command('exportar_agendamentos', '--status', 'qualquer', stdout=saida)
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command('arquivar_agendamentos', '--idade-dias', '0', stdout=saida)
+        self.assertIn('5 agendamento(s)', saida.getvalue())
+        self.assertEqual(list(Agendamento.objects.values_list('pk', flat=True)), [self.pendente.pk])
+
+
+class DadosSinteticosTests(TestCase):
+
+    def gerar(self):
+        return dados_sinteticos.gerar(
+            usuarios=30, profissionais=4, tratamentos=5, agendamentos=200, anos=1, lote=64, hoje=date(2024, 12, 2)
+        )
+
+    def retrato(self):
+        return (
+            list(Agendamento.objects.order_by('pk').values_list('data', 'horario_inicio', 'status')),
+            list(Feedback.objects.order_by('pk').values_list('nota', 'data')),
+            sorted(Agendamento.servicos.through.objects.values_list('tratamentopodologico__nome', flat=True)),
+        )
+
+    def test_base_consistente_e_reproduzivel(self):
+        criados = self.gerar()
+        self.assertEqual((criados['agendamentos'], Agendamento.objects.count()), (200, 200))
+        self.assertEqual(criados['feedbacks'], Feedback.objects.count())
+        self.assertFalse(Feedback.objects.exclude(agendamento__status='concluido').exists())
+        self.assertFalse(Agendamento.objects.filter(servicos__isnull=True).exists())
+        # O estado derivado, que o bulk_create não atualiza, foi refeito.
+        self.assertEqual(estatisticas.divergencias(), [])
+        self.assertEqual(avaliacoes.divergencias(), [])
+
+        primeiro = self.retrato()
+        for modelo in (Feedback, Agendamento, Usuario, ProfissionalDePodologia, TratamentoPodologico, Disponibilidade):
+            modelo.objects.all().delete()
+        self.gerar()
+        self.assertEqual(self.retrato(), primeiro)
+
+
+class EnviadorDeTeste:
+
+    def __init__(self, falhas=0):
+        self.enviadas = []
+        self.falhas = falhas
+
+    def enviar(self, mensagem):
+        if self.falhas:
+            self.falhas -= 1
+            raise ConnectionError("provedor fora do ar")
+        self.enviadas.append(mensagem)
+
+
+class LembretesTests(TestCase):
+
+    def setUp(self):
+        self.agora = timezone.make_aware(datetime(2030, 1, 7, 10, 0))
+        self.usuario = Usuario.objects.create(nome='Cliente', email='cliente@example.com')
+        self.profissional = ProfissionalDePodologia.objects.create(
+            nome='Ana', especializacao='-', especialidade='-', email='ana@example.com'
+        )
+
+    def agendar(self, data, horario, status='pendente'):
+        return Agendamento.objects.create(
+            usuario=self.usuario, profissional=self.profissional, data=data, horario_inicio=horario, status=status
+        )
+
+    def test_varredura_idempotente(self):
+        amanha = self.agendar(date(2030, 1, 8), time(15))
+        em_uma_hora = self.agendar(date(2030, 1, 7), time(11))
+        self.agendar(date(2030, 1, 8), time(9), status='cancelado')
+        self.agendar(date(2030, 1, 7), time(9))  # já passou
+        self.agendar(date(2030, 1, 20), time(9))  # além da janela
+
+        self.assertEqual(lembretes.varrer(self.agora, lote=1), 3)
+        self.assertEqual(lembretes.varrer(self.agora, lote=1), 0)
+        self.assertEqual(
+            sorted(Lembrete.objects.values_list('agendamento_id', 'tipo')),
+            sorted([(amanha.pk, 'vespera'), (amanha.pk, 'proximo'), (em_uma_hora.pk, 'proximo')]),
+        )
+
+    def test_envio_unico_e_descarte_de_remarcados(self):
+        agendamento = self.agendar(date(2030, 1, 7), time(11))
+        remarcado = self.agendar(date(2030, 1, 7), time(11, 30))
+        lembretes.varrer(self.agora)
+        remarcado.horario_inicio = time(16)
+        remarcado.save()
+
+        enviador = EnviadorDeTeste()
+        resultado = lembretes.enviar_pendentes(self.agora, enviador=enviador)
+        self.assertEqual(resultado, {'enviados': 1, 'descartados': 1, 'falhas': 0})
+        self.assertEqual([mensagem['agendamento'] for mensagem in enviador.enviadas], [agendamento.pk])
+        self.assertIn('07/01/2030 às 11:00', enviador.enviadas[0]['texto'])
+        self.assertEqual(lembretes.enviar_pendentes(self.agora, enviador=enviador)['enviados'], 0)
+
+        # O horário novo ganha o seu lembrete.
+        self.assertEqual(lembretes.varrer(self.agora), 1)
+        self.assertEqual(Lembrete.objects.get(status='pendente').agendamento, remarcado)
+
+    def test_falha_tenta_de_novo_com_espera_crescente(self):
+        self.agendar(date(2030, 1, 7), time(11))
+        lembretes.varrer(self.agora)
+        enviador = EnviadorDeTeste(falhas=lembretes.TENTATIVAS)
+        esperas = []
+        agora = self.agora
+        for tentativa in range(1, lembretes.TENTATIVAS + 1):
+            with self.assertLogs('core.lembretes', 'WARNING'):
+                self.assertEqual(lembretes.enviar_pendentes(agora, enviador=enviador)['falhas'], 1)
+            lembrete = Lembrete.objects.get()
+            self.assertEqual(lembrete.tentativas, tentativa)
+            esperas.append(lembrete.executar_em - agora)
+            agora = lembrete.executar_em
+        self.assertEqual(lembrete.status, 'falhou')
+        self.assertIn('provedor fora do ar', lembrete.ultimo_erro)
+        self.assertEqual(esperas, sorted(esperas))
+        self.assertEqual(enviador.enviadas, [])
+
+    def test_reivindicacao_vencida_volta_para_a_fila(self):
+        self.agendar(date(2030, 1, 7), time(11))
+        lembretes.varrer(self.agora)
+        # Um worker reivindicou e morreu antes de registrar o envio.
+        Lembrete.objects.update(status='enviando', trava='outro', executar_em=self.agora + lembretes.PRAZO)
+        enviador = EnviadorDeTeste()
+        self.assertEqual(lembretes.enviar_pendentes(self.agora, enviador=enviador)['enviados'], 0)
+        self.assertEqual(lembretes.enviar_pendentes(self.agora + lembretes.PRAZO, enviador=enviador)['enviados'], 1)
+        self.assertEqual(Lembrete.objects.get().status, 'enviado')
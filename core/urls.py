@@ -6,16 +6,17 @@ from . import views
 # Roteador para as APIs
 router = DefaultRouter()
 router.register(r'usuarios', views.UsuarioViewSet, basename='usuario')
-router.register(r'relatorios', views.RelatorioProgressoViewSet, basename='relatorio')
-router.register(r'atividades', views.JogoAtividadeViewSet, basename='atividade')
-router.register(r'feedbacks', views.FeedbackResponsavelViewSet, basename='feedback')
-router.register(r'agendamentos', views.AgendamentoNotificacaoViewSet, basename='agendamento')
+router.register(r'profissionais', views.ProfissionalDePodologiaViewSet, basename='profissional')
+router.register(r'tratamentos', views.TratamentoPodologicoViewSet, basename='tratamento')
+router.register(r'feedbacks', views.FeedbackViewSet, basename='feedback')
+router.register(r'agendamentos', views.AgendamentoViewSet, basename='agendamento')
+router.register(r'agendamentos-arquivados', views.AgendamentoArquivadoViewSet, basename='agendamento-arquivado')
+router.register(r'reservas', views.ReservaViewSet, basename='reserva')
+router.register(r'estatisticas', views.EstatisticaDiariaViewSet, basename='estatistica')
 
 urlpatterns = [
     path('', views.home, name='home'),  # Página inicial
     path('dashboard/', views.dashboard, name='dashboard'),
-    path('relatorios/', views.relatorios, name='relatorios'),
-    path('relatorios/adicionar/', views.adicionar_relatorio, name='adicionar_relatorio'),
 
     # Rotas para Feedbacks
     path('feedbacks/', views.listar_feedbacks, name='listar_feedbacks'),
@@ -34,6 +35,14 @@ urlpatterns = [
     # Login
     path('login/', views.login_view, name='login'),
 
+    # Leitura assíncrona (ASGI) das mesmas listagens
+    path('api/async/agendamentos/', views.AgendamentoLeituraView.as_view(), name='agendamentos_async'),
+    path('api/async/agendamentos/<int:pk>/', views.AgendamentoLeituraView.as_view(), name='agendamento_async'),
+    path('api/async/feedbacks/', views.FeedbackLeituraView.as_view(), name='feedbacks_async'),
+    path('api/async/feedbacks/<int:pk>/', views.FeedbackLeituraView.as_view(), name='feedback_async'),
+    path('api/async/profissionais/', views.ProfissionalLeituraView.as_view(), name='profissionais_async'),
+    path('api/async/profissionais/<int:pk>/', views.ProfissionalLeituraView.as_view(), name='profissional_async'),
+
     # Inclui as rotas do roteador para as APIs
     path('api/', include(router.urls)),
 ]
@@ -1,10 +1,40 @@
-from rest_framework import viewsets
+from functools import partial
+
+from rest_framework import filters, mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
-from .models import Usuario, RelatorioProgresso, JogoAtividade, FeedbackResponsavel, AgendamentoNotificacao, FeedbackResponsavel
-from .serializers import UsuarioSerializer, RelatorioProgressoSerializer, JogoAtividadeSerializer, FeedbackResponsavelSerializer, AgendamentoNotificacaoSerializer
-from .forms import FeedbackResponsavelForm, RelatorioProgressoForm, AgendamentoNotificacaoForm
+from django.views import View
+from . import catalogo, escrita, geolocalizacao, importacao, reservas
+from .agenda import proximos_horarios_livres
+from .busca import buscar
+from .consultas import otimizar_queryset
+from .exportacao import CONTENT_TYPES, agendamentos_para_exportar, exportar
+from .paginacao import AgendamentoPagination, FeedbackPagination
+from .models import (
+    Usuario, ProfissionalDePodologia, TratamentoPodologico, Agendamento, Feedback, Reserva, EstatisticaDiaria,
+    AgendamentoArquivado, Recomendacao
+)
+from .serializers import (
+    UsuarioSerializer, ProfissionalDePodologiaSerializer, TratamentoPodologicoSerializer, AgendamentoSerializer,
+    FeedbackSerializer, HorariosLivresParametrosSerializer, HorarioLivreSerializer, ExportacaoParametrosSerializer,
+    TransicoesEmLoteSerializer, BuscaParametrosSerializer, ReservaSerializer, EstatisticasParametrosSerializer,
+    EstatisticaDiariaSerializer, AgendamentoFiltrosSerializer, UsuarioFiltrosSerializer, SelecaoDeCampos,
+    AgendamentosEmLoteSerializer, AgendamentoEmLoteItemSerializer, AgendamentoArquivadoSerializer,
+    AgendamentoArquivadoFiltrosSerializer, ProfissionalProximoSerializer, ProximosParametrosSerializer,
+    ProfissionalRecomendadoSerializer, RecomendacoesParametrosSerializer
+)
+from .forms import FeedbackForm, AgendamentoForm
+
+FEEDBACKS_POR_PAGINA = 50
 
 # Views para renderizar os templates
 
@@ -36,22 +66,15 @@ def dashboard(request):
     """
     return render(request, 'dashboard.html')
 
-@login_required
-def relatorios(request):
-    """
-    View para a página de relatórios de progresso.
-    Exibe todos os relatórios de progresso para o usuário atual.
-    """
-    relatorios = RelatorioProgresso.objects.filter(usuario=request.user)
-    return render(request, 'relatorios.html', {'relatorios': relatorios})
-
 @login_required
 def feedbacks(request):
     """
     View para a página de feedbacks dos responsáveis.
     Exibe todos os feedbacks fornecidos para o usuário atual.
     """
-    feedbacks = FeedbackResponsavel.objects.filter(usuario=request.user)
+    feedbacks = Feedback.objects.filter(usuario__user=request.user).select_related(
+        'usuario', 'agendamento__profissional'
+    )
     return render(request, 'feedbacks.html', {'feedbacks': feedbacks})
 
 @login_required
@@ -60,68 +83,146 @@ def agendamentos(request):
     View para a página de agendamentos.
     Exibe todos os agendamentos para o usuário atual.
     """
-    agendamentos = AgendamentoNotificacao.objects.filter(usuario=request.user)
+    agendamentos = Agendamento.objects.filter(usuario__user=request.user)
     return render(request, 'agendamentos.html', {'agendamentos': agendamentos})
 
 def listar_feedbacks(request):
-    feedbacks = FeedbackResponsavel.objects.all()
-    return render(request, 'feedback/listar_feedbacks.html', {'feedbacks': feedbacks})
+    feedbacks = Feedback.objects.select_related('usuario', 'agendamento__profissional').order_by('-data', '-id')
+    pagina = Paginator(feedbacks, FEEDBACKS_POR_PAGINA).get_page(request.GET.get('pagina'))
+    return render(request, 'feedback/listar_feedbacks.html', {'feedbacks': pagina, 'pagina': pagina})
 
 def adicionar_feedback(request):
     if request.method == 'POST':
-        form = FeedbackResponsavelForm(request.POST)
+        form = FeedbackForm(request.POST)
         if form.is_valid():
-            form.save()
+            escrita.executar(form.save)
             return redirect('listar_feedbacks')
     else:
-        form = FeedbackResponsavelForm()
+        form = FeedbackForm()
     return render(request, 'feedback/adicionar_feedback.html', {'form': form})
 
 def editar_feedback(request, pk):
-    feedback = get_object_or_404(FeedbackResponsavel, pk=pk)
+    feedback = get_object_or_404(Feedback, pk=pk)
     if request.method == 'POST':
-        form = FeedbackResponsavelForm(request.POST, instance=feedback)
+        form = FeedbackForm(request.POST, instance=feedback)
         if form.is_valid():
-            form.save()
+            escrita.executar(form.save)
             return redirect('listar_feedbacks')
     else:
-        form = FeedbackResponsavelForm(instance=feedback)
+        form = FeedbackForm(instance=feedback)
     return render(request, 'feedback/editar_feedback.html', {'form': form})
 
 def excluir_feedback(request, pk):
-    feedback = get_object_or_404(FeedbackResponsavel, pk=pk)
+    feedback = get_object_or_404(Feedback, pk=pk)
     if request.method == 'POST':
-        feedback.delete()
+        escrita.executar(feedback.delete)
         return redirect('listar_feedbacks')
     return render(request, 'feedback/excluir_feedback.html', {'feedback': feedback})
 
-@login_required
-def adicionar_relatorio(request):
-    if request.method == 'POST':
-        form = RelatorioProgressoForm(request.POST)
-        if form.is_valid():
-            form.save()
-            return redirect('relatorios')  # Redireciona para a lista de relatórios após adicionar
-    else:
-        form = RelatorioProgressoForm()
-    return render(request, 'relatorios/adicionar_relatorio.html', {'form': form})
-
 @login_required
 def adicionar_agendamento(request):
     """
     View para adicionar um novo agendamento.
     """
     if request.method == 'POST':
-        form = AgendamentoNotificacaoForm(request.POST)
+        form = AgendamentoForm(request.POST)
         if form.is_valid():
-            form.save()
+            escrita.executar(form.save)
             return redirect('agendamentos')  # Redireciona para a lista de agendamentos após adicionar
     else:
-        form = AgendamentoNotificacaoForm()
+        form = AgendamentoForm()
     return render(request, 'agendamentos/adicionar_agendamento.html', {'form': form})
 
 # ViewSets para API
 
+class QuerysetOtimizadoMixin:
+    """
+    Monta o queryset do ViewSet a partir da árvore do serializer
+    (select_related/prefetch_related), evitando consultas N+1. O serializer
+    recebe a requisição, então só entram as relações pedidas em ?fields=/?expand=.
+    """
+    def get_queryset(self):
+        return otimizar_queryset(super().get_queryset(), self.get_serializer())
+
+def filtrar_por_avaliacao(queryset, request):
+    """
+    Aplica ``?avaliacao_minima=4`` (média das avaliações) a um queryset de profissionais.
+    """
+    avaliacao_minima = request.query_params.get('avaliacao_minima')
+    if avaliacao_minima:
+        try:
+            queryset = queryset.filter(avaliacao_media__gte=float(avaliacao_minima))
+        except ValueError:
+            raise ValidationError({'avaliacao_minima': ['Informe um número.']})
+    return queryset
+
+def filtrar_agendamentos(queryset, request):
+    """
+    Anota os totais dos serviços e aplica os filtros da listagem de
+    agendamentos, todos em SQL. Ex.: agendamentos acima de R$ 300 no mês:
+    ?inicio=2024-12-01&fim=2024-12-31&preco_total_min=300&ordenacao=-preco_total
+
+    Os totais (duas subconsultas por linha) só são anotados se aparecem na
+    resposta, nos filtros ou na ordenação.
+    """
+    parametros = AgendamentoFiltrosSerializer(data=request.query_params)
+    parametros.is_valid(raise_exception=True)
+    dados = parametros.validated_data
+    totais = {'preco_total', 'duracao_total'}
+    selecao = SelecaoDeCampos.da_requisicao(request)
+    if (
+        selecao is None or not selecao.campos or totais & selecao.campos.keys()
+        or request.query_params.get('ordenacao', '').lstrip('-') in totais
+        or any(dados.get(f'{total}_{limite}') is not None for total in totais for limite in ('min', 'max'))
+    ):
+        queryset = queryset.com_totais()
+    filtros = {
+        'data__gte': dados.get('inicio'),
+        'data__lte': dados.get('fim'),
+        'status': dados.get('status'),
+        'preco_total__gte': dados.get('preco_total_min'),
+        'preco_total__lte': dados.get('preco_total_max'),
+        'duracao_total__gte': dados.get('duracao_total_min'),
+        'duracao_total__lte': dados.get('duracao_total_max'),
+    }
+    return queryset.filter(**{lookup: valor for lookup, valor in filtros.items() if valor is not None})
+
+class CatalogoEmCacheMixin:
+    """
+    Serve listagem e detalhe do cache do catálogo ``catalogo``, com ETag e 304
+    (ver ``core.catalogo``).
+    """
+    catalogo = None
+
+    def list(self, request, *args, **kwargs):
+        return catalogo.responder(self.catalogo, request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return catalogo.responder(self.catalogo, request, partial(super().retrieve, request, *args, **kwargs))
+
+class EscritaEmFilaMixin:
+    """
+    Grava criações, edições e exclusões pela fila de escrita do SQLite (ver
+    ``core.escrita``), em vez de disputar o lock do banco.
+    """
+    def perform_create(self, serializer):
+        escrita.executar(super().perform_create, serializer)
+
+    def perform_update(self, serializer):
+        escrita.executar(super().perform_update, serializer)
+
+    def perform_destroy(self, instance):
+        escrita.executar(super().perform_destroy, instance)
+
+class OrdenacaoPorIdadeFilter(filters.OrderingFilter):
+    """
+    Ordena ``idade`` pela data de nascimento, ao contrário, que tem índice
+    (ordenar pela expressão anotada calcularia a idade de todas as linhas).
+    """
+    def get_ordering(self, request, queryset, view):
+        invertida = {'idade': '-data_nasc', '-idade': 'data_nasc'}
+        return [invertida.get(campo, campo) for campo in super().get_ordering(request, queryset, view) or []] or None
+
 class UsuarioViewSet(viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD no modelo Usuario.
@@ -129,35 +230,397 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     """
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
+    filter_backends = [OrdenacaoPorIdadeFilter]
+    ordering_fields = ['nome', 'idade']
+
+    def get_queryset(self):
+        """
+        Anota a idade no SQL e aceita ?faixa=idoso ou ?idade_min=60&idade_max=80.
+        """
+        parametros = UsuarioFiltrosSerializer(data=self.request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        queryset = super().get_queryset().com_idade()
+        if 'faixa' in dados:
+            queryset = queryset.faixa_etaria(dados['faixa'])
+        if 'idade_min' in dados or 'idade_max' in dados:
+            queryset = queryset.idade_entre(dados.get('idade_min'), dados.get('idade_max'))
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def idades(self, request):
+        """
+        Quantidade de pacientes por faixa etária, agregada no banco.
+        """
+        totais = Usuario.objects.distribuicao_por_faixa()
+        faixas = [
+            {'faixa': faixa, 'descricao': descricao, 'total': totais[faixa]}
+            for faixa, descricao in Usuario.FAIXAS_ETARIAS
+        ]
+        faixas.append({'faixa': None, 'descricao': 'Sem data de nascimento', 'total': totais[None]})
+        return Response(faixas)
+
+    @action(detail=True, methods=['get'])
+    def recomendacoes(self, request, pk=None):
+        """
+        Os ``k`` profissionais recomendados ao cliente, pré-calculados por
+        ``manage.py gerar_recomendacoes``. Sem histórico, os mais bem
+        avaliados (``origem`` = ``populares``).
+        Ex.: /api/usuarios/1/recomendacoes/?k=5
+        """
+        parametros = RecomendacoesParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        k = parametros.validated_data['k']
+        serializer = ProfissionalRecomendadoSerializer(context=self.get_serializer_context())
+        aprovados = otimizar_queryset(ProfissionalDePodologia.objects.filter(aprovado=True), serializer)
 
-class RelatorioProgressoViewSet(viewsets.ModelViewSet):
+        recomendacao = Recomendacao.objects.filter(usuario_id=pk).first()
+        if recomendacao is None:
+            get_object_or_404(Usuario.objects.only('pk'), pk=pk)
+            profissionais = list(aprovados.order_by('-avaliacao_media', 'id')[:k])
+            for profissional in profissionais:
+                profissional.pontuacao = None
+            origem, gerada_em = 'populares', None
+        else:
+            # Quem deixou de ser aprovado depois da geração fica de fora.
+            pontuacoes = dict(zip(recomendacao.profissionais, recomendacao.pontuacoes))
+            ids = recomendacao.profissionais[:k]
+            por_id = aprovados.in_bulk(ids)
+            profissionais = [por_id[profissional_id] for profissional_id in ids if profissional_id in por_id]
+            for profissional in profissionais:
+                profissional.pontuacao = pontuacoes[profissional.pk]
+            origem, gerada_em = 'historico', recomendacao.gerada_em
+        return Response({
+            'origem': origem,
+            'gerada_em': gerada_em,
+            'profissionais': ProfissionalRecomendadoSerializer(
+                profissionais, many=True, context=self.get_serializer_context()
+            ).data,
+        })
+
+class ProfissionalDePodologiaViewSet(CatalogoEmCacheMixin, QuerysetOtimizadoMixin, viewsets.ModelViewSet):
+    """
+    ViewSet para operações CRUD no modelo ProfissionalDePodologia.
+    Também expõe a consulta de horários livres da agenda.
+    """
+    catalogo = 'profissionais'
+    queryset = ProfissionalDePodologia.objects.all()
+    serializer_class = ProfissionalDePodologiaSerializer
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['nome', 'avaliacao_media', 'avaliacoes_total']
+
+    def get_queryset(self):
+        """
+        Aceita ?avaliacao_minima=4 para filtrar pela média das avaliações.
+        """
+        return filtrar_por_avaliacao(super().get_queryset(), self.request)
+
+    @action(detail=False, methods=['get'], url_path='horarios-livres')
+    def horarios_livres(self, request):
+        """
+        Próximos horários livres dos profissionais aprovados para os serviços informados.
+        Ex.: /api/profissionais/horarios-livres/?servicos=1&servicos=3&quantidade=5
+        """
+        parametros = HorariosLivresParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        horarios = proximos_horarios_livres(
+            dados['servicos'],
+            quantidade=dados['quantidade'],
+            inicio=dados.get('inicio'),
+            dias=dados['dias'],
+            profissionais=dados.get('profissional'),
+        )
+        if horarios is None:
+            return Response({'servicos': ['Serviço inexistente.']}, status=400)
+        return Response(HorarioLivreSerializer(horarios, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        Busca textual (FTS5) entre os profissionais aprovados, por relevância.
+        Ex.: /api/profissionais/buscar/?q=TEA infantil centro
+        """
+        parametros = BuscaParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        profissionais = buscar(self.get_queryset(), dados['q'], dados['limite'])
+        return Response(self.get_serializer(profissionais, many=True).data)
+
+    @action(detail=False, methods=['get'], serializer_class=ProfissionalProximoSerializer)
+    def proximos(self, request):
+        """
+        Os ``k`` profissionais aprovados mais próximos de um ponto ou bairro,
+        com a distância em km; ?dia=sabado deixa só quem atende nesse dia.
+        Ex.: /api/profissionais/proximos/?bairro=Centro&k=5&dia=sabado
+        """
+        parametros = ProximosParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        profissionais = geolocalizacao.proximos(
+            self.get_queryset(), dados['origem'], k=dados['k'], raio_km=dados['raio_km'], dia=dados.get('dia'),
+        )
+        return Response(self.get_serializer(profissionais, many=True).data)
+
+class TratamentoPodologicoViewSet(CatalogoEmCacheMixin, viewsets.ModelViewSet):
+    """
+    ViewSet para operações CRUD no modelo TratamentoPodologico.
+    Usado para gerenciar o catálogo de tratamentos.
+    """
+    catalogo = 'tratamentos'
+    queryset = TratamentoPodologico.objects.all()
+    serializer_class = TratamentoPodologicoSerializer
+
+class AgendamentoViewSet(EscritaEmFilaMixin, QuerysetOtimizadoMixin, viewsets.ModelViewSet):
+    """
+    ViewSet para operações CRUD no modelo Agendamento.
+    Usado para gerenciar os agendamentos dos atendimentos.
+    """
+    queryset = Agendamento.objects.all()
+    serializer_class = AgendamentoSerializer
+    pagination_class = AgendamentoPagination
+
+    def get_queryset(self):
+        """
+        Inclui ``preco_total`` e ``duracao_total`` e aceita os filtros de
+        ``filtrar_agendamentos``; ?ordenacao=-preco_total ordena pelos totais.
+        """
+        return filtrar_agendamentos(super().get_queryset(), self.request)
+
+    @action(detail=False, methods=['post'])
+    def transicionar(self, request):
+        """
+        Muda o status de vários agendamentos, com um UPDATE por status de destino.
+        Ex.: {"transicoes": [{"status": "concluido", "ids": [1, 2, 3]}, {"status": "cancelado", "ids": [4]}]}
+        """
+        entrada = TransicoesEmLoteSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        resultados = escrita.executar(Agendamento.objects.transicionar_em_lote, {
+            transicao['status']: transicao['ids'] for transicao in entrada.validated_data['transicoes']
+        })
+        return Response({
+            'resultados': [{'id': pk, 'resultado': resultado} for pk, resultado in resultados.items()]
+        })
+
+    @action(detail=False, methods=['post'], url_path='em-lote')
+    def em_lote(self, request):
+        """
+        Cria até 10 mil agendamentos em uma requisição, com os serviços, em
+        poucos INSERTs (ver ``core.importacao``). Responde um resultado por
+        item, na ordem enviada; 201 se algum foi criado, 400 se nenhum.
+        Ex.: {"agendamentos": [{"usuario": 1, "profissional": 2, "servicos": [3, 4],
+              "data": "2025-03-10", "horario_inicio": "09:00"}], "tudo_ou_nada": false}
+        """
+        entrada = AgendamentosEmLoteSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        dados = entrada.validated_data
+        itens, erros = [], {}
+        # Uma instância para o lote: montar os campos do serializer a cada item custaria mais que validá-lo.
+        formato = AgendamentoEmLoteItemSerializer()
+        for indice, item in enumerate(dados['agendamentos']):
+            try:
+                itens.append((indice, formato.run_validation(item)))
+            except ValidationError as erro:
+                erros[indice] = erro.detail
+        resultados = [(None, None)] * len(itens)
+        if itens and not (dados['tudo_ou_nada'] and erros):
+            resultados = escrita.executar(
+                importacao.criar_agendamentos, [item for _, item in itens],
+                verificar_conflitos=dados['verificar_conflitos'], tudo_ou_nada=dados['tudo_ou_nada'],
+            )
+        criados = {}
+        for (indice, _), (pk, erro) in zip(itens, resultados):
+            if pk is not None:
+                criados[indice] = pk
+            elif erro is not None:
+                erros[indice] = erro
+        recusado = {'lote': ["Lote recusado por erros em outros itens."]}
+        resultados = [
+            {'indice': indice, 'id': criados[indice]} if indice in criados
+            else {'indice': indice, 'erros': erros.get(indice, recusado)}
+            for indice in range(len(dados['agendamentos']))
+        ]
+        return Response({
+            'criados': len(criados), 'recusados': len(resultados) - len(criados), 'resultados': resultados,
+        }, status=201 if criados else 400)
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta o histórico em CSV ou JSONL, em streaming, incluindo os agendamentos arquivados do período.
+        Ex.: /api/agendamentos/exportar/?formato=jsonl&inicio=2024-11-01&fim=2024-11-30
+        """
+        parametros = ExportacaoParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        filtros = (dados.get('inicio'), dados.get('fim'), dados.get('status'))
+        queryset = agendamentos_para_exportar(*filtros)
+        arquivados = agendamentos_para_exportar(*filtros, modelo=AgendamentoArquivado)
+        resposta = StreamingHttpResponse(
+            exportar(queryset, dados['formato'], arquivados=arquivados), content_type=CONTENT_TYPES[dados['formato']]
+        )
+        resposta['Content-Disposition'] = f'attachment; filename="agendamentos.{dados["formato"]}"'
+        return resposta
+
+class ReservaViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     """
-    ViewSet para operações CRUD no modelo RelatorioProgresso.
-    Usado para gerenciar relatórios de progresso.
+    Reserva de horário em dois passos: POST retém o horário por alguns
+    minutos e ``confirmar`` cria o agendamento. DELETE desiste da reserva.
+    Horário ocupado ou reserva vencida respondem 409.
     """
-    queryset = RelatorioProgresso.objects.all()
-    serializer_class = RelatorioProgressoSerializer
+    queryset = Reserva.objects.all()
+    serializer_class = ReservaSerializer
+
+    def create(self, request):
+        entrada = self.get_serializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        dados = entrada.validated_data
+        try:
+            reserva = escrita.executar(
+                reservas.reservar, dados['profissional'].pk, dados['usuario'].pk, dados['data'],
+                dados['horario_inicio'], [servico.pk for servico in dados['servicos']],
+            )
+        except reservas.HorarioIndisponivel as erro:
+            return Response({'detail': str(erro)}, status=409)
+        return Response(self.get_serializer(reserva).data, status=201)
+
+    def destroy(self, request, pk=None):
+        if not escrita.executar(reservas.liberar, pk):
+            return Response({'detail': 'Reserva inexistente ou já confirmada.'}, status=404)
+        return Response(status=204)
 
-class JogoAtividadeViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'])
+    def confirmar(self, request, pk=None):
+        try:
+            agendamento = escrita.executar(reservas.confirmar, pk)
+        except reservas.ReservaExpirada as erro:
+            return Response({'detail': str(erro)}, status=409)
+        serializer = AgendamentoSerializer(context=self.get_serializer_context())
+        agendamento = otimizar_queryset(Agendamento.objects.all(), serializer).get(pk=agendamento.pk)
+        return Response(
+            AgendamentoSerializer(agendamento, context=self.get_serializer_context()).data,
+            status=201,
+        )
+
+class AgendamentoArquivadoViewSet(QuerysetOtimizadoMixin, viewsets.ReadOnlyModelViewSet):
     """
-    ViewSet para operações CRUD no modelo JogoAtividade.
-    Usado para gerenciar atividades e pontuações dos usuários.
+    Histórico arquivado (ver ``core.arquivamento``), consultado só por aqui:
+    as listagens de agendamentos não leem a tabela arquivada.
+    Ex.: /api/agendamentos-arquivados/?usuario=12&inicio=2022-01-01&fim=2022-12-31
     """
-    queryset = JogoAtividade.objects.all()
-    serializer_class = JogoAtividadeSerializer
+    queryset = AgendamentoArquivado.objects.all()
+    serializer_class = AgendamentoArquivadoSerializer
+    pagination_class = AgendamentoPagination
+
+    def get_queryset(self):
+        parametros = AgendamentoArquivadoFiltrosSerializer(data=self.request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        # Os totais são colunas da tabela arquivada: os mesmos filtros, sem subconsultas.
+        filtros = {
+            'usuario_id': dados.get('usuario'),
+            'profissional_id': dados.get('profissional'),
+            'data__gte': dados.get('inicio'),
+            'data__lte': dados.get('fim'),
+            'status': dados.get('status'),
+            'preco_total__gte': dados.get('preco_total_min'),
+            'preco_total__lte': dados.get('preco_total_max'),
+            'duracao_total__gte': dados.get('duracao_total_min'),
+            'duracao_total__lte': dados.get('duracao_total_max'),
+        }
+        return super().get_queryset().filter(
+            **{lookup: valor for lookup, valor in filtros.items() if valor is not None}
+        )
+
+class EstatisticaDiariaViewSet(viewsets.GenericViewSet):
+    """
+    Série diária do dashboard, lida só da tabela de estatísticas (uma linha
+    por dia com movimento). Sem ``profissional``, devolve a clínica toda.
+    Ex.: /api/estatisticas/?inicio=2024-01-01&fim=2024-12-31&profissional=3
+    """
+    queryset = EstatisticaDiaria.objects.all()
+    serializer_class = EstatisticaDiariaSerializer
+
+    def list(self, request):
+        parametros = EstatisticasParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        linhas = self.get_queryset().filter(
+            data__range=(dados['inicio'], dados['fim']), profissional_id=dados.get('profissional')
+        ).order_by('data')
+        return Response(self.get_serializer(linhas, many=True).data)
 
-class FeedbackResponsavelViewSet(viewsets.ModelViewSet):
+class FeedbackViewSet(EscritaEmFilaMixin, QuerysetOtimizadoMixin, viewsets.ModelViewSet):
     """
-    ViewSet para operações CRUD no modelo FeedbackResponsavel.
-    Permite aos responsáveis fornecer e gerenciar feedbacks.
+    ViewSet para operações CRUD no modelo Feedback.
+    Permite aos clientes avaliar os atendimentos concluídos.
     """
-    queryset = FeedbackResponsavel.objects.all()
-    serializer_class = FeedbackResponsavelSerializer
+    queryset = Feedback.objects.all()
+    serializer_class = FeedbackSerializer
+    pagination_class = FeedbackPagination
 
-class AgendamentoNotificacaoViewSet(viewsets.ModelViewSet):
+# Views assíncronas (ASGI) de leitura
+#
+# Versões somente leitura das listagens e detalhes de agendamentos, feedbacks
+# e profissionais, com o ORM assíncrono. Enquanto a consulta roda, o worker
+# ASGI atende outras requisições. A serialização usa os mesmos serializers da
+# API, sobre objetos já carregados com select_related/prefetch_related, e não
+# acessa o banco; qualquer consulta tardia falharia com SynchronousOnlyOperation.
+
+class LeituraAssincronaView(View):
     """
-    ViewSet para operações CRUD no modelo AgendamentoNotificacao.
-    Usado para gerenciar agendamentos e notificações.
+    Listagem (``GET /``) e detalhe (``GET /<pk>/``) assíncronos, com as
+    mesmas respostas JSON do ViewSet correspondente.
     """
-    queryset = AgendamentoNotificacao.objects.all()
-    serializer_class = AgendamentoNotificacaoSerializer
+    queryset = None
+    serializer_class = None
+    pagination_class = None
+
+    def get_queryset(self, request):
+        return otimizar_queryset(self.queryset.all(), self.serializer_class(context={'request': request}))
+
+    def responder(self, dados, status=200):
+        return HttpResponse(JSONRenderer().render(dados), content_type='application/json', status=status)
+
+    async def get(self, request, pk=None):
+        request = Request(request)
+        contexto = {'request': request}
+        try:
+            queryset = self.get_queryset(request)
+            if pk is not None:
+                objeto = await queryset.aget(pk=pk)
+                return self.responder(self.serializer_class(objeto, context=contexto).data)
+            if self.pagination_class is None:
+                itens = [objeto async for objeto in queryset.aiterator(chunk_size=2000)]
+                return self.responder(self.serializer_class(itens, many=True, context=contexto).data)
+            paginador = self.pagination_class()
+            itens = await paginador.apaginate_queryset(queryset, request)
+            dados = self.serializer_class(itens, many=True, context=contexto).data
+            return self.responder(paginador.dados_paginados(dados))
+        except ObjectDoesNotExist:
+            return self.responder({'detail': 'Não encontrado.'}, status=404)
+        except APIException as erro:
+            return self.responder(erro.detail if isinstance(erro.detail, dict) else {'detail': erro.detail},
+                                  status=erro.status_code)
+
+class AgendamentoLeituraView(LeituraAssincronaView):
+    queryset = Agendamento.objects.all()
+    serializer_class = AgendamentoSerializer
+    pagination_class = AgendamentoPagination
+
+    def get_queryset(self, request):
+        return filtrar_agendamentos(super().get_queryset(request), request)
+
+class FeedbackLeituraView(LeituraAssincronaView):
+    queryset = Feedback.objects.all()
+    serializer_class = FeedbackSerializer
+    pagination_class = FeedbackPagination
+
+class ProfissionalLeituraView(LeituraAssincronaView):
+    queryset = ProfissionalDePodologia.objects.all()
+    serializer_class = ProfissionalDePodologiaSerializer
+    ordering_fields = ProfissionalDePodologiaViewSet.ordering_fields
+
+    def get_queryset(self, request):
+        queryset = filtrar_por_avaliacao(super().get_queryset(request), request)
+        return filters.OrderingFilter().filter_queryset(request, queryset, self)
@@ -27,10 +27,12 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'core',
+    'rest_framework',
     'widget_tweaks',
 ]
 
 MIDDLEWARE = [
+    'core.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +87,38 @@ WSGI_APPLICATION = 'podologia.wsgi.application'
 # }
 
 
+# PRAGMAs aplicados a cada nova conexão SQLite: WAL deixa leitores e o
+# escritor trabalharem ao mesmo tempo, synchronous=NORMAL é seguro com WAL,
+# busy_timeout espera o lock em vez de falhar, e mmap/cache reduzem leituras.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "cache_size": -32000,  # em KiB
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "mydatabase",
+        # Conexões persistentes, verificadas antes de reaproveitar.
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Pega o lock de escrita no início da transação: evita o
+            # "database is locked" imediato de quem tenta promover um lock de leitura.
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+            "init_command": ";".join(f"PRAGMA {nome}={valor}" for nome, valor in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
+# Serializa as escritas do processo em uma thread escritora (core.escrita).
+SQLITE_FILA_DE_ESCRITA = True
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -135,6 +162,53 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),  # Defina a pasta onde seus arquivos estáticos estão localizados
 ]
 
+# Arquivos enviados (fotos) e suas variantes reduzidas
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Cache das respostas de catálogo (core.catalogo). A memória local vale por
+# processo; com vários workers use FileBasedCache (ou Redis) para que a troca
+# de versão feita por um processo seja vista pelos demais.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'podologia',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Threads que geram as miniaturas das fotos fora da requisição (core.imagens)
+IMAGENS_WORKERS = 2
+
+# Server-Timing e logs de requisições lentas e de N+1 (core.instrumentacao).
+# Ferramenta de diagnóstico: ligue só para investigar. Desligada, o middleware
+# sai da cadeia e não custa nada.
+INSTRUMENTACAO = False
+INSTRUMENTACAO_LIMITE_MS = 500
+INSTRUMENTACAO_PIORES_CONSULTAS = 5
+INSTRUMENTACAO_REPETICOES = 5
+
+# Lembretes dos agendamentos (core.lembretes): um processo dedicado
+# (manage.py processar_lembretes) varre a agenda e envia pelo enviador abaixo
+# (EnviadorConsole ou EnviadorArquivo, que grava em LEMBRETES_ARQUIVO).
+# LEMBRETES_EM_PROCESSO liga uma thread em cada processo do servidor (wsgi.py/
+# asgi.py); só serve para um servidor de processo único.
+LEMBRETES_EM_PROCESSO = False
+LEMBRETES_ENVIADOR = 'core.lembretes.EnviadorConsole'
+LEMBRETES_ARQUIVO = os.path.join(BASE_DIR, 'lembretes.jsonl')
+
+# Arquivamento (core.arquivamento): agendamentos concluídos ou cancelados há
+# mais de ARQUIVAMENTO_IDADE_DIAS dias vão para as tabelas arquivadas, em
+# lotes, por manage.py arquivar_agendamentos agendado no cron (uma execução
+# por vez). ARQUIVAMENTO_EM_PROCESSO liga uma thread em cada processo do
+# servidor; só serve para um servidor de processo único.
+ARQUIVAMENTO_EM_PROCESSO = False
+ARQUIVAMENTO_IDADE_DIAS = 365
+
+# Tabela de centróides dos bairros (core.geolocalizacao), em CSV com as colunas
+# bairro, latitude e longitude. Sem ela, vale core/dados/bairros.csv.
+# GEOLOCALIZACAO_BAIRROS = os.path.join(BASE_DIR, 'bairros.csv')
+
 # URL de redirecionamento para login
 LOGIN_URL = '/login/'
 
@@ -1,9 +1,14 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
 # Padrões de URL para o projeto
 urlpatterns = [
     path('admin/', admin.site.urls),  # URL para a área de administração do Django
-    # path('', include('core.urls')),  # Inclui as URLs do app core, incluindo a página inicial
+    path('', include('core.urls')),  # Inclui as URLs do app core, incluindo a página inicial
 
 ]
+
+# Serve as fotos enviadas durante o desenvolvimento
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
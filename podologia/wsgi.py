@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'podologia.settings')
 
 application = get_wsgi_application()
+
+# Threads opcionais dos lembretes e do arquivamento, só com LEMBRETES_EM_PROCESSO/ARQUIVAMENTO_EM_PROCESSO
+# (desligados por padrão): cada worker do servidor iniciaria as suas. Com mais de um processo, rode
+# manage.py processar_lembretes e arquivar_agendamentos uma vez só, fora do servidor.
+from core import arquivamento, lembretes  # noqa: E402
+
+lembretes.iniciar()
+arquivamento.iniciar()